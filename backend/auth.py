@@ -1,46 +1,255 @@
 """Auth utilities: JWT encoding/decoding, password hashing, FastAPI dependency."""
 from __future__ import annotations
 
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Optional
 
 import bcrypt
 import jwt
 from fastapi import Cookie, HTTPException, status
 
-from backend.config import SECRET_KEY, JWT_ALGORITHM, JWT_EXPIRE_DAYS
+from backend import storage
+from backend.config import (
+    AUTH_HASH_QUEUE_TIMEOUT_MS, AUTH_HASH_WORKERS, AUTH_SESSION_CACHE_MAX_ENTRIES, JWT_ALGORITHM,
+    JWT_EXPIRE_DAYS, SECRET_KEY,
+)
+from backend.models import Player
 
 
-def hash_password(plain: str) -> str:
+# ── Password hashing ──────────────────────────────────────────────────────────
+#
+# One bcrypt call takes 100–250 ms of CPU by design. Run on the event loop it
+# would stall every WebSocket and race tick for that long, so it runs on a
+# pool of AUTH_HASH_WORKERS threads (bcrypt releases the GIL while hashing).
+# A caller that can't get a thread within AUTH_HASH_QUEUE_TIMEOUT_MS gets a
+# 503: under a login burst, queueing longer only makes every login slow.
+
+_hash_executor: ThreadPoolExecutor | None = None
+_hash_slots: asyncio.Semaphore | None = None  # one per thread; held until the hash finishes
+_hash_counters = {"waiting": 0, "in_flight": 0, "max_waiting": 0, "completed": 0, "rejected": 0}
+_hash_wait = {"total": 0.0, "max": 0.0}
+
+
+def _hashpw(plain: str) -> str:
     return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
 
 
-def verify_password(plain: str, hashed: str) -> bool:
+def _checkpw(plain: str, hashed: str) -> bool:
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
 
+def _get_hash_executor() -> tuple[ThreadPoolExecutor, asyncio.Semaphore]:
+    global _hash_executor, _hash_slots
+    if _hash_executor is None:
+        _hash_executor = ThreadPoolExecutor(max_workers=AUTH_HASH_WORKERS, thread_name_prefix="auth-hash")
+        _hash_slots = asyncio.Semaphore(AUTH_HASH_WORKERS)
+    return _hash_executor, _hash_slots
+
+
+async def _run_hash(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a bcrypt call on the hashing pool; 503 if no thread frees up in time."""
+    executor, slots = _get_hash_executor()
+    _hash_counters["waiting"] += 1
+    _hash_counters["max_waiting"] = max(_hash_counters["max_waiting"], _hash_counters["waiting"])
+    t0 = time.perf_counter()
+    try:
+        await asyncio.wait_for(slots.acquire(), AUTH_HASH_QUEUE_TIMEOUT_MS / 1000)
+    except asyncio.TimeoutError:
+        _hash_counters["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins at once, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        _hash_counters["waiting"] -= 1
+    waited = time.perf_counter() - t0
+    _hash_wait["total"] += waited
+    _hash_wait["max"] = max(_hash_wait["max"], waited)
+    _hash_counters["in_flight"] += 1
+    loop = asyncio.get_running_loop()
+    job = executor.submit(fn, *args)
+
+    def done() -> None:
+        _hash_counters["in_flight"] -= 1
+        _hash_counters["completed"] += 1
+        slots.release()
+
+    # Released when the thread is done, not when the caller stops waiting: a
+    # disconnected client's hash still occupies its thread. The callback is on
+    # the executor's future (cancelling the caller never cancels that one) and
+    # hops back to the loop, which owns the counters and the semaphore.
+    def finished(_: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(done)
+        except RuntimeError:
+            pass  # loop already closed (shutdown); nothing left to release
+
+    job.add_done_callback(finished)
+    return await asyncio.shield(asyncio.wrap_future(job))
+
+
+async def hash_password(plain: str) -> str:
+    return await _run_hash(_hashpw, plain)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    return await _run_hash(_checkpw, plain, hashed)
+
+
+def hash_stats() -> dict:
+    started = _hash_counters["completed"] + _hash_counters["in_flight"]
+    return {
+        "workers": AUTH_HASH_WORKERS,
+        **_hash_counters,
+        "avg_wait_ms": round(_hash_wait["total"] / started * 1000, 1) if started else None,
+        "max_wait_ms": round(_hash_wait["max"] * 1000, 1),
+    }
+
+
+def shutdown_hash_workers() -> None:
+    """Stop the hashing threads (app shutdown)."""
+    global _hash_executor, _hash_slots
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=True, cancel_futures=True)
+        _hash_executor = _hash_slots = None
+
+
+# ── Tokens ────────────────────────────────────────────────────────────────────
+
+
 def create_token(player_id: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(days=JWT_EXPIRE_DAYS)
     return jwt.encode({"sub": player_id, "exp": expire}, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def decode_token(token: str) -> Optional[str]:
+def _decode_claims(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload.get("sub")
+        return jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
     except jwt.PyJWTError:
         return None
 
 
-async def get_current_player(session: Optional[str] = Cookie(default=None)):
+def decode_token(token: str) -> Optional[str]:
+    claims = _decode_claims(token)
+    return claims.get("sub") if claims else None
+
+
+# ── Sessions ──────────────────────────────────────────────────────────────────
+#
+# get_current_player runs on every authenticated request, and verifying the
+# JWT costs more than everything else it does. A token that verified once is
+# remembered until it expires; tokens can't be revoked early, so nothing else
+# invalidates them. The Player each one resolves to is kept too, dropped
+# whenever storage saves that player, in this process or (through the
+# journal) another one.
+
+class _SessionCache:
+    """LRUs of verified token → (player_id, expiry) and player_id → Player."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._tokens: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._players: OrderedDict[str, Player] = OrderedDict()
+        self.version = 0  # bumped by every invalidation
+        self.token_hits = 0
+        self.token_misses = 0
+        self.player_hits = 0
+        self.player_misses = 0
+        self.invalidations = 0
+
+    def player_id(self, token: str) -> Optional[str]:
+        entry = self._tokens.get(token)
+        if entry is not None and entry[1] <= time.time():
+            del self._tokens[token]
+            entry = None
+        if entry is None:
+            self.token_misses += 1
+            return None
+        self._tokens.move_to_end(token)
+        self.token_hits += 1
+        return entry[0]
+
+    def remember_token(self, token: str, player_id: str, expires: float) -> None:
+        self._put(self._tokens, token, (player_id, expires))
+
+    def player(self, player_id: str) -> Optional[Player]:
+        player = self._players.get(player_id)
+        if player is None:
+            self.player_misses += 1
+            return None
+        self._players.move_to_end(player_id)
+        self.player_hits += 1
+        return player
+
+    def remember_player(self, player: Player, version: int) -> None:
+        if version == self.version:  # else it may have been saved while we loaded it
+            self._put(self._players, player.id, player)
+
+    def forget_player(self, player_id: Optional[str]) -> None:
+        """Storage listener: None means any player may have changed."""
+        self.version += 1
+        self.invalidations += 1
+        if player_id is None:
+            self._players.clear()
+        else:
+            self._players.pop(player_id, None)
+
+    def _put(self, entries: OrderedDict, key: str, value) -> None:
+        if self.max_entries <= 0:
+            return
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        token_lookups = self.token_hits + self.token_misses
+        player_lookups = self.player_hits + self.player_misses
+        return {
+            "tokens": len(self._tokens),
+            "players": len(self._players),
+            "max_entries": self.max_entries,
+            "token_hits": self.token_hits,
+            "token_misses": self.token_misses,
+            "player_hits": self.player_hits,
+            "player_misses": self.player_misses,
+            "invalidations": self.invalidations,
+            "token_hit_rate": round(self.token_hits / token_lookups, 4) if token_lookups else None,
+            "player_hit_rate": round(self.player_hits / player_lookups, 4) if player_lookups else None,
+        }
+
+
+_sessions = _SessionCache(AUTH_SESSION_CACHE_MAX_ENTRIES)
+storage.on_player_change(_sessions.forget_player)
+
+
+def session_stats() -> dict:
+    return _sessions.stats()
+
+
+async def get_current_player(session: Optional[str] = Cookie(default=None)) -> Player:
     """FastAPI dependency — raises 401 if not authenticated."""
     if not session:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    player_id = decode_token(session)
-    if not player_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    from backend.storage import load_player
-    player = await load_player(player_id)
-    if not player:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Player not found")
+    storage.sync()  # other processes' saves invalidate players here
+    player_id = _sessions.player_id(session)
+    if player_id is None:
+        claims = _decode_claims(session)
+        if not claims or not claims.get("sub"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        player_id = claims["sub"]
+        _sessions.remember_token(session, player_id, claims.get("exp", math.inf))
+    player = _sessions.player(player_id)
+    if player is None:
+        version = _sessions.version
+        player = await storage.load_player(player_id)
+        if not player:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Player not found")
+        _sessions.remember_player(player, version)
     return player
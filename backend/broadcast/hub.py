@@ -0,0 +1,219 @@
+"""Unix-domain-socket broadcast hub — selected with BROADCAST_BACKEND=hub.
+
+Lets several server processes (uvicorn --workers N) share live races without
+an external broker. Every process keeps its own RaceBroadcaster for the
+WebSockets it accepted; a message published in any process reaches all of
+them through one hub process:
+
+  publisher ──► hub ──► every other process ──► its RaceBroadcaster ──► its sockets
+
+Whichever process first takes the lock next to BROADCAST_HUB_SOCKET binds the
+socket and is the hub (it also serves WebSockets as usual); the rest connect
+as peers. If the hub process exits, its lock is released and the first peer
+to notice takes over.
+
+Wire format, both directions: uint32 length + JSON {"race_id": ..., "message": {...}}.
+The publisher serializes each message once and the hub relays the bytes as
+they are; each process parses them once before its own per-protocol encoding.
+A peer that stops reading is disconnected once BROADCAST_HUB_MAX_BUFFER bytes
+are waiting for it, and reconnects by itself. Messages published while no hub
+is reachable reach local subscribers only.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+from pathlib import Path
+
+from backend.broadcast.race_broadcaster import RaceBroadcaster, Subscription
+from backend.config import BROADCAST_HUB_MAX_BUFFER
+
+log = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct("<I")
+_MAX_FRAME = 64 * 1024 * 1024   # larger than any real message; guards against garbage
+_RETRY_SECONDS = 0.2
+
+
+def encode_frame(race_id: str, message: dict) -> bytes:
+    payload = json.dumps({"race_id": race_id, "message": message}, separators=(",", ":")).encode()
+    return _LENGTH.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    """The next whole frame (length prefix included), or None at end of stream."""
+    try:
+        prefix = await reader.readexactly(_LENGTH.size)
+        (length,) = _LENGTH.unpack(prefix)
+        if length > _MAX_FRAME:
+            raise ValueError(f"Hub frame of {length} bytes")
+        return prefix + await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+
+
+class HubBroadcaster:
+    """RaceBroadcaster interface; local delivery plus the cross-process hub."""
+
+    def __init__(self, local: RaceBroadcaster, path: Path, max_buffer: int = BROADCAST_HUB_MAX_BUFFER):
+        self.local = local
+        self._path = path
+        self._lock_path = path.with_name(path.name + ".lock")
+        self._max_buffer = max_buffer
+        self._role = "connecting"  # → "hub" or "peer"
+        self._lock_fd: int | None = None
+        self._server: asyncio.AbstractServer | None = None
+        self._peers: set[asyncio.StreamWriter] = set()
+        self._peer_tasks: set[asyncio.Task] = set()
+        self._hub: asyncio.StreamWriter | None = None
+        self._task: asyncio.Task | None = None
+        self._stats = {
+            "published": 0,      # broadcast() calls in this process
+            "received": 0,       # messages from other processes delivered here
+            "relayed": 0,        # frames the hub wrote to peers
+            "local_only": 0,     # published with no hub reachable
+            "peers_dropped": 0,  # slow peers the hub disconnected
+            "connects": 0,       # times this process became hub or joined one
+        }
+
+    # ── RaceBroadcaster interface ─────────────────────────────────────────────
+
+    def subscribe(self, race_id: str, protocol: int = 1, roster: list[str] | None = None) -> Subscription:
+        return self.local.subscribe(race_id, protocol, roster)
+
+    def unsubscribe(self, race_id: str, sub: Subscription) -> None:
+        self.local.unsubscribe(race_id, sub)
+
+    def subscriber_count(self, race_id: str) -> int:
+        return self.local.subscriber_count(race_id)
+
+    async def broadcast(self, race_id: str, message: dict) -> None:
+        self._stats["published"] += 1
+        frame = encode_frame(race_id, message)
+        if self._role == "hub":
+            self._relay(frame, exclude=None)
+        elif self._hub is not None and self._hub.transport.get_write_buffer_size() < self._max_buffer:
+            self._hub.write(frame)  # the hub relays it to everyone else
+        else:
+            self._stats["local_only"] += 1
+        await self.local.broadcast(race_id, message)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for writer in list(self._peers) + ([self._hub] if self._hub else []):
+            writer.close()
+        await asyncio.gather(*self._peer_tasks, return_exceptions=True)
+        self._peers.clear()
+        self._hub = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            self._path.unlink(missing_ok=True)
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # releases the flock
+            self._lock_fd = None
+        self._role = "connecting"
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "hub": {"role": self._role, "peers": len(self._peers), **self._stats},
+        }
+
+    # ── Hub / peer ────────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        while True:
+            if self._take_lock():
+                await self._serve()
+                return  # the hub stays hub until stop()
+            try:
+                reader, writer = await asyncio.open_unix_connection(str(self._path))
+            except OSError:
+                await asyncio.sleep(_RETRY_SECONDS)  # the new hub hasn't bound yet
+                continue
+            self._hub, self._role = writer, "peer"
+            self._stats["connects"] += 1
+            log.info("Broadcast hub: connected as peer (pid %d)", os.getpid())
+            try:
+                while (frame := await read_frame(reader)) is not None:
+                    await self._deliver(frame)
+            except (OSError, ValueError) as exc:
+                # Socket error or a corrupt length prefix: the stream can't be resynced
+                log.warning("Broadcast hub: dropping the hub connection (%s), reconnecting", exc)
+                failed = True
+            else:
+                log.warning("Broadcast hub: lost the hub, reconnecting")
+                failed = False
+            finally:
+                self._hub, self._role = None, "connecting"
+                writer.close()
+            if failed:
+                await asyncio.sleep(_RETRY_SECONDS)
+
+    def _take_lock(self) -> bool:
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _serve(self) -> None:
+        self._path.unlink(missing_ok=True)  # left by a hub that died; we hold the lock
+        self._server = await asyncio.start_unix_server(self._serve_peer, path=str(self._path))
+        self._role = "hub"
+        self._stats["connects"] += 1
+        log.info("Broadcast hub: serving %s (pid %d)", self._path, os.getpid())
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._peers.add(writer)
+        self._peer_tasks.add(task)
+        try:
+            while (frame := await read_frame(reader)) is not None:
+                self._relay(frame, exclude=writer)
+                await self._deliver(frame)
+        except (OSError, ValueError) as exc:
+            log.warning("Broadcast hub: dropping a peer (%s); it reconnects", exc)
+        finally:
+            self._peers.discard(writer)
+            self._peer_tasks.discard(task)
+            writer.close()
+
+    def _relay(self, frame: bytes, exclude: asyncio.StreamWriter | None) -> None:
+        for writer in list(self._peers):
+            if writer is exclude:
+                continue
+            if writer.transport.get_write_buffer_size() >= self._max_buffer:
+                log.warning("Broadcast hub: dropping a peer %d bytes behind", writer.transport.get_write_buffer_size())
+                self._stats["peers_dropped"] += 1
+                self._peers.discard(writer)
+                writer.transport.abort()
+                continue
+            writer.write(frame)
+            self._stats["relayed"] += 1
+
+    async def _deliver(self, frame: bytes) -> None:
+        try:
+            payload = json.loads(frame[_LENGTH.size:])
+            await self.local.broadcast(payload["race_id"], payload["message"])
+        except Exception:
+            log.exception("Broadcast hub: could not deliver a frame")
+            return
+        self._stats["received"] += 1
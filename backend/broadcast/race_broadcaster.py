@@ -1,37 +1,331 @@
 """
 In-memory fan-out broadcaster.
 
-race_id → list of asyncio.Queue — one queue per connected WebSocket client.
-The scheduler job pushes events in; each WebSocket handler drains its own queue.
+race_id → subscribers, one bounded frame buffer per connected WebSocket client.
+The scheduler job pushes events in; each WebSocket handler drains its own buffer.
+
+Messages are serialized here, once, not by each handler: subscribers are
+grouped by wire protocol (and, for the indexed protocols, by the roster they
+were sent in race_init), each group's frames are encoded once per message,
+and every buffer receives the same ready-to-send Frame. A handler only calls
+send_text / send_bytes.
+
+A client that reads slower than ticks arrive keeps only the latest
+WS_BUFFER_FRAMES ticks; the oldest are dropped. Protocol 2 deltas can't skip
+a frame, so those clients drop every buffered tick instead and resync from a
+key frame. Control frames (status, roster, finished) are never dropped. A
+client that drops WS_LAG_LIMIT_FRAMES ticks without once catching up is sent
+an error and disconnected — the viewer reconnects and resumes from race_init.
+
+BROADCAST_BACKEND=hub wraps this in hub.HubBroadcaster so that several
+server processes share the same races.
 """
 from __future__ import annotations
 
 import asyncio
-from collections import defaultdict
+import json
+import time
+from collections import deque
+from typing import NamedTuple
+
+from backend.broadcast.tick_codec import BinaryTickEncoder, DeltaTickEncoder
+from backend.config import BROADCAST_BACKEND, BROADCAST_HUB_SOCKET, WS_BUFFER_FRAMES, WS_LAG_LIMIT_FRAMES
+
+
+class Frame(NamedTuple):
+    data: str | bytes     # str → text message, bytes → binary message
+    final: bool = False   # last frame for this client; the handler closes after it
+    tick: bool = False    # carries tick data — may be dropped for a slow client
+
+
+def encode_json(message: dict) -> str:
+    """JSON text exactly as Starlette's send_json would produce it."""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+_LAG_FRAME = Frame(encode_json({"type": "error", "detail": "Too far behind the live race"}), final=True)
+
+
+class Subscription:
+    """One connected client: its frame buffer plus what the broadcaster needs to encode for it."""
+
+    def __init__(self, protocol: int, roster: tuple[str, ...], max_ticks: int = WS_BUFFER_FRAMES):
+        self.protocol = protocol
+        self.roster = roster
+        # Next tick goes out as roster + key frame (new client, or resyncing); protocol 1 is all key frames
+        self.needs_key = protocol != 1
+        self.dropped = 0       # tick frames dropped, in total
+        self.behind = 0        # tick frames dropped since the buffer last ran empty
+        self._frames: deque[Frame] = deque()
+        self._ticks = 0        # tick frames in _frames
+        self._max_ticks = max_ticks
+        self._ready = asyncio.Event()
+
+    @property
+    def depth(self) -> int:
+        return len(self._frames)
+
+    def put(self, frame: Frame) -> None:
+        if not frame.tick:
+            self._append(frame)
+        elif self.needs_key:
+            # Resyncing protocol 2: deltas before the next key frame can't be decoded
+            self._drop(1)
+        elif self._ticks < self._max_ticks:
+            self._append(frame)
+        elif self.protocol == 2:
+            self._drop(self._ticks + 1)
+            self._frames = deque(f for f in self._frames if not f.tick)
+            self._ticks = 0
+            self.needs_key = True
+        else:
+            for i, f in enumerate(self._frames):
+                if f.tick:
+                    del self._frames[i]
+                    break
+            self._ticks -= 1
+            self._drop(1)
+            self._append(frame)
+
+    def close(self, frame: Frame) -> None:
+        """Replace whatever is buffered with one last frame."""
+        self._frames = deque([frame])
+        self._ticks = 0
+        self._ready.set()
+
+    async def get(self) -> Frame:
+        while not self._frames:
+            self._ready.clear()
+            await self._ready.wait()
+        frame = self._frames.popleft()
+        self._ticks -= frame.tick
+        if not self._frames:
+            self.behind = 0
+        return frame
+
+    def _append(self, frame: Frame) -> None:
+        self._frames.append(frame)
+        self._ticks += frame.tick
+        self._ready.set()
+
+    def _drop(self, n: int) -> None:
+        self.dropped += n
+        self.behind += n
+
+
+class _Group:
+    """Subscribers that get byte-identical frames, and their shared tick encoder."""
+
+    def __init__(self, protocol: int, roster: tuple[str, ...]):
+        self.subs: list[Subscription] = []
+        self.roster_frame: Frame | None = None  # the encoder's last roster frame, serialized
+        if protocol == 2:
+            self.encoder: DeltaTickEncoder | BinaryTickEncoder | None = DeltaTickEncoder(list(roster))
+        elif protocol == 3:
+            self.encoder = BinaryTickEncoder(list(roster))
+        else:
+            self.encoder = None
+
+
+class _Race:
+    """A race's subscriber groups and its backpressure counters."""
+
+    def __init__(self) -> None:
+        self.groups: dict[tuple, _Group] = {}
+        self.dropped = 0
+        self.resyncs = 0
+        self.lag_disconnects = 0
+
+    def subs(self) -> list[Subscription]:
+        return [s for g in self.groups.values() for s in g.subs]
+
+
+def _group_key(protocol: int, roster: tuple[str, ...]) -> tuple:
+    return (protocol, roster) if protocol != 1 else (1,)
+
+
+def _serialize(frame: dict | bytes) -> str | bytes:
+    return frame if isinstance(frame, bytes) else encode_json(frame)
 
 
 class RaceBroadcaster:
     def __init__(self) -> None:
-        self._queues: dict[str, list[asyncio.Queue]] = defaultdict(list)
+        self._races: dict[str, _Race] = {}
+        self._stats = {
+            "broadcasts": 0,
+            "frames_encoded": 0,
+            "frames_delivered": 0,
+            "frames_dropped": 0,
+            "resyncs": 0,
+            "lag_disconnects": 0,
+            "encode_seconds": 0.0,
+            "encode_max_ms": 0.0,
+            "fanout_seconds": 0.0,
+            "fanout_max_ms": 0.0,
+        }
 
-    def subscribe(self, race_id: str) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue()
-        self._queues[race_id].append(q)
-        return q
+    def subscribe(self, race_id: str, protocol: int = 1, roster: list[str] | None = None) -> Subscription:
+        """Register a client. ``roster`` is the entrants' car ids it was sent (protocols 2/3)."""
+        roster_ids = tuple(roster or ())
+        race = self._races.setdefault(race_id, _Race())
+        key = _group_key(protocol, roster_ids)
+        group = race.groups.get(key)
+        if group is None:
+            group = race.groups[key] = _Group(protocol, roster_ids)
+        sub = Subscription(protocol, roster_ids)
+        group.subs.append(sub)
+        return sub
 
-    def unsubscribe(self, race_id: str, q: asyncio.Queue) -> None:
+    def unsubscribe(self, race_id: str, sub: Subscription) -> None:
+        race = self._races.get(race_id)
+        if race is None:
+            return
+        key = _group_key(sub.protocol, sub.roster)
+        group = race.groups.get(key)
+        if group is None:
+            return
         try:
-            self._queues[race_id].remove(q)
+            group.subs.remove(sub)
         except ValueError:
             pass
+        if not group.subs:
+            del race.groups[key]
+        if not race.groups:
+            del self._races[race_id]
 
     async def broadcast(self, race_id: str, message: dict) -> None:
-        for q in list(self._queues[race_id]):
-            await q.put(message)
+        race = self._races.get(race_id)
+        if race is None:
+            return
+        final = message.get("type") == "finished"
+        t0 = time.perf_counter()
+        # (subscribers, frames) pairs — every frame serialized exactly once
+        deliveries: list[tuple[list[Subscription], list[Frame]]] = []
+        n_encoded = 0
+        if message.get("type") != "tick":
+            frame = Frame(encode_json(message), final)
+            n_encoded = 1
+            deliveries.append((race.subs(), [frame]))
+        else:
+            shared_v1: Frame | None = None
+            for group in race.groups.values():
+                if group.encoder is None:
+                    if shared_v1 is None:
+                        shared_v1 = Frame(encode_json(message), tick=True)
+                        n_encoded += 1
+                    deliveries.append((group.subs, [shared_v1]))
+                    continue
+                frames = [
+                    Frame(_serialize(f), tick=not (isinstance(f, dict) and f["type"] == "roster"))
+                    for f in group.encoder.encode(message)
+                ]
+                n_encoded += len(frames)
+                if len(frames) > 1:  # the roster changed on this tick
+                    group.roster_frame = frames[0]
+                new = [s for s in group.subs if s.needs_key]
+                if new:
+                    join = self._join_frames(group, message, frames)
+                    n_encoded += isinstance(group.encoder, DeltaTickEncoder)
+                    deliveries.append(([s for s in group.subs if not s.needs_key], frames))
+                    deliveries.append((new, join))
+                    for s in new:
+                        s.needs_key = False
+                else:
+                    deliveries.append((group.subs, frames))
+        t1 = time.perf_counter()
+
+        delivered = dropped = resyncs = 0
+        lagging: list[Subscription] = []
+        for subs, frames in deliveries:
+            for sub in subs:
+                was_dropped, was_resyncing = sub.dropped, sub.needs_key
+                for frame in frames:
+                    sub.put(frame)
+                delivered += len(frames)
+                dropped += sub.dropped - was_dropped
+                resyncs += sub.needs_key and not was_resyncing
+                if sub.behind >= WS_LAG_LIMIT_FRAMES:
+                    lagging.append(sub)
+        t2 = time.perf_counter()
+
+        for sub in lagging:
+            sub.close(_LAG_FRAME)
+            self.unsubscribe(race_id, sub)
+        race.dropped += dropped
+        race.resyncs += resyncs
+        race.lag_disconnects += len(lagging)
+
+        stats = self._stats
+        stats["broadcasts"] += 1
+        stats["frames_encoded"] += n_encoded
+        stats["frames_delivered"] += delivered
+        stats["frames_dropped"] += dropped
+        stats["resyncs"] += resyncs
+        stats["lag_disconnects"] += len(lagging)
+        stats["encode_seconds"] += t1 - t0
+        stats["encode_max_ms"] = max(stats["encode_max_ms"], (t1 - t0) * 1000)
+        stats["fanout_seconds"] += t2 - t1
+        stats["fanout_max_ms"] = max(stats["fanout_max_ms"], (t2 - t1) * 1000)
+
+    @staticmethod
+    def _join_frames(group: _Group, message: dict, frames: list[Frame]) -> list[Frame]:
+        """Frames for clients on their first tick, or resyncing: the current roster,
+        and a key frame in place of a delta (protocol 2) so they can decode from here."""
+        out = [group.roster_frame] if group.roster_frame is not None else []
+        if isinstance(group.encoder, DeltaTickEncoder):
+            out.append(Frame(encode_json(group.encoder.keyframe(message)), tick=True))
+        else:
+            out.append(frames[-1])
+        return out
 
     def subscriber_count(self, race_id: str) -> int:
-        return len(self._queues[race_id])
+        race = self._races.get(race_id)
+        return len(race.subs()) if race else 0
+
+    async def start(self) -> None:
+        """Nothing to connect in-process (see hub.HubBroadcaster)."""
+
+    async def stop(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        s = self._stats
+        n = s["broadcasts"] or 1
+        races = {}
+        for race_id, race in self._races.items():
+            depths = [sub.depth for sub in race.subs()]
+            races[race_id] = {
+                "subscribers": len(depths),
+                "queued_frames": sum(depths),
+                "max_queue_depth": max(depths, default=0),
+                "frames_dropped": race.dropped,
+                "resyncs": race.resyncs,
+                "lag_disconnects": race.lag_disconnects,
+            }
+        return {
+            "subscribers": sum(r["subscribers"] for r in races.values()),
+            "broadcasts": s["broadcasts"],
+            "frames_encoded": s["frames_encoded"],
+            "frames_delivered": s["frames_delivered"],
+            "frames_dropped": s["frames_dropped"],
+            "resyncs": s["resyncs"],
+            "lag_disconnects": s["lag_disconnects"],
+            "encode_avg_ms": round(s["encode_seconds"] / n * 1000, 4),
+            "encode_max_ms": round(s["encode_max_ms"], 4),
+            "fanout_avg_ms": round(s["fanout_seconds"] / n * 1000, 4),
+            "fanout_max_ms": round(s["fanout_max_ms"], 4),
+            "races": races,
+        }
+
+
+def _make_broadcaster(name: str):
+    if name == "memory":
+        return RaceBroadcaster()
+    if name == "hub":
+        from backend.broadcast.hub import HubBroadcaster
+        return HubBroadcaster(RaceBroadcaster(), BROADCAST_HUB_SOCKET)
+    raise ValueError(f"Unknown BROADCAST_BACKEND: {name!r} (expected 'memory' or 'hub')")
 
 
 # Singleton — imported directly by main.py and scheduler/jobs.py
-broadcaster = RaceBroadcaster()
+broadcaster = _make_broadcaster(BROADCAST_BACKEND)
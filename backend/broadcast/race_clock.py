@@ -0,0 +1,138 @@
+"""
+Shared race clock.
+
+One task drives every running race. Tick deadlines sit on a single monotonic
+grid (origin + k × RACE_TICK_INTERVAL_MS); a race starts on the next grid slot
+and its n-th tick is due n slots later, whatever the broadcasts before it
+cost. Time spent broadcasting never pushes later ticks back, so a race lasts
+n_ticks × interval of wall-clock time however many run at once.
+
+When the loop wakes late (a slow broadcast, a busy event loop) each race
+sends the ticks it owes, at most RACE_CLOCK_MAX_CATCH_UP in one burst; any
+older than that are skipped so the race gets back onto the grid instead of
+drifting.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import Iterable, Iterator
+
+from backend.broadcast.race_broadcaster import broadcaster
+from backend.config import RACE_CLOCK_MAX_CATCH_UP, RACE_TICK_INTERVAL_MS
+
+
+class _RunningRace:
+    def __init__(self, messages: Iterable[dict], first_slot: int, start: float, done: asyncio.Future):
+        self.messages: Iterator[dict] = iter(messages)
+        self.pending = next(self.messages, None)  # read one ahead, so the last tick ends the race
+        self.next_slot = first_slot
+        self.start = start  # grid time one slot before the first tick
+        self.done = done
+        self.sent = 0
+        self.skipped = 0
+        self.lag = 0.0      # seconds the latest tick went out after its deadline
+        self.max_lag = 0.0
+
+
+class RaceClock:
+    def __init__(self, interval_ms: int = RACE_TICK_INTERVAL_MS, max_catch_up: int = RACE_CLOCK_MAX_CATCH_UP):
+        self._interval = interval_ms / 1000.0
+        self._max_catch_up = max(1, max_catch_up)
+        self._origin: float | None = None
+        self._races: dict[str, _RunningRace] = {}
+        self._task: asyncio.Task | None = None
+        self._stats = {"wakeups": 0, "late_wakeups": 0, "ticks_sent": 0, "ticks_skipped": 0}
+
+    async def run(self, race_id: str, messages: Iterable[dict]) -> None:
+        """Broadcast ``messages`` one per tick on the shared grid; returns after the last."""
+        now = time.monotonic()
+        if self._origin is None:
+            self._origin = now
+        slot = self._slot_at(now) + 1
+        done = asyncio.get_running_loop().create_future()
+        race = self._races[race_id] = _RunningRace(messages, slot, self._deadline(slot - 1), done)
+        if race.pending is None:
+            done.set_result(None)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        try:
+            await done
+        finally:
+            if self._races.get(race_id) is race:
+                del self._races[race_id]
+
+    def _slot_at(self, t: float) -> int:
+        return math.floor((t - self._origin) / self._interval)
+
+    def _deadline(self, slot: int) -> float:
+        return self._origin + slot * self._interval
+
+    async def _loop(self) -> None:
+        while self._races:
+            slot = min(r.next_slot for r in self._races.values())
+            delay = self._deadline(slot) - time.monotonic()
+            await asyncio.sleep(max(delay, 0))  # always yield, even when behind
+            # Never behind the slot slept for (the event loop may wake a hair early)
+            now_slot = max(self._slot_at(time.monotonic()), slot)
+            self._stats["wakeups"] += 1
+            if now_slot > slot:
+                self._stats["late_wakeups"] += 1
+            for race_id, race in list(self._races.items()):
+                if race.done.done():  # finished, failed, or its run() was cancelled
+                    self._races.pop(race_id, None)
+                elif race.next_slot <= now_slot:
+                    await self._advance(race_id, race, now_slot)
+
+    async def _advance(self, race_id: str, race: _RunningRace, now_slot: int) -> None:
+        due = now_slot - race.next_slot + 1
+        skip = max(0, due - self._max_catch_up)
+        sent, skipped = race.sent, race.skipped
+        try:
+            for i in range(due):
+                message = race.pending
+                race.pending = next(race.messages, None)
+                if i < skip:
+                    race.skipped += 1
+                else:
+                    await broadcaster.broadcast(race_id, message)
+                    race.sent += 1
+                if race.pending is None:
+                    break
+        except Exception as e:
+            race.done.set_exception(e)  # raised in run()
+        else:
+            race.next_slot = now_slot + 1
+            race.lag = time.monotonic() - self._deadline(now_slot)
+            race.max_lag = max(race.max_lag, race.lag)
+            if race.pending is None:
+                race.done.set_result(None)
+        if race.done.done():
+            self._races.pop(race_id, None)
+        self._stats["ticks_sent"] += race.sent - sent
+        self._stats["ticks_skipped"] += race.skipped - skipped
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        races = {}
+        for race_id, race in self._races.items():
+            elapsed = now - race.start
+            races[race_id] = {
+                "ticks_sent": race.sent,
+                "ticks_skipped": race.skipped,
+                "elapsed_s": round(elapsed, 1),
+                "tick_rate": round((race.sent + race.skipped) / elapsed, 2) if elapsed > 0 else 0.0,
+                "lag_ms": round(race.lag * 1000, 2),
+                "max_lag_ms": round(race.max_lag * 1000, 2),
+            }
+        return {
+            "interval_ms": round(self._interval * 1000, 3),
+            "nominal_tick_rate": round(1 / self._interval, 2),
+            **self._stats,
+            "races": races,
+        }
+
+
+# Singleton — imported directly by main.py and scheduler/jobs.py
+race_clock = RaceClock()
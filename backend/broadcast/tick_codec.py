@@ -0,0 +1,159 @@
+"""
+Tick wire protocols, chosen per WebSocket connection (?protocol=N).
+
+Protocol 1 (default) sends ticks as generate_tick_stream yields them: every
+car's car_id, username, progress, speed and incident, every tick.
+
+Protocol 2 sends the roster once and then only numbers:
+  {"type": "roster", "entrants": [{car_id, username}, ...]}
+      only when the cars on track differ from race_init's entrants (bots
+      join at lock time); from then on cars are referred to by index into it
+  {"type": "key", "tick": 1, "p": [...], "s": [...], "inc": [[i, "dnf"], ...]}
+      every car, every TICK_KEYFRAME_INTERVAL ticks (and first on every connection)
+  {"type": "delta", "tick": 2, "cars": [[i, p, s], ...], "inc": [[i, incident|null], ...]}
+      only cars whose progress or speed changed; "inc" only when an incident
+      changed (omitted otherwise)
+p is progress × 10⁴ and s whole mph, both integers — exactly the precision
+protocol 1 carries, so a decoder rebuilds protocol 1's cars bit for bit.
+Finished and stopped cars drop out of deltas entirely.
+
+Protocol 3 sends each tick as one binary WebSocket message — every car, no
+deltas — and everything else (race_init, roster, status, finished) as JSON.
+Little-endian, cars indexed as in protocol 2:
+  offset 0       uint8   frame kind (1 = tick)
+  offset 1       uint8   reserved (0)
+  offset 2       uint16  n cars
+  offset 4       uint32  tick
+  offset 8       uint16  p[n]          progress × 10⁴
+  offset 8+2n    uint16  s[n]          whole mph
+  offset 8+4n    uint8   incident[n]   index into INCIDENT_CODES
+A tick carrying an incident with no code is sent as a protocol 1 JSON tick instead.
+"""
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+
+from backend.config import TICK_KEYFRAME_INTERVAL
+
+PROTOCOLS = (1, 2, 3)
+PROGRESS_SCALE = 10_000  # progress is rounded to 4 places upstream
+INCIDENT_CODES: tuple[str | None, ...] = (None, "dnf_start", "dnf")
+
+_BINARY_TICK = 1
+_BINARY_HEADER = struct.Struct("<BBHI")
+_INCIDENT_CODE = {incident: code for code, incident in enumerate(INCIDENT_CODES)}
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class _IndexedTickEncoder:
+    """Shared by protocols 2 and 3: cars by index into the client's roster."""
+
+    def __init__(self, car_ids: list[str]):
+        self._set_roster(car_ids)
+
+    def _set_roster(self, car_ids: list[str]) -> None:
+        self._index = {car_id: i for i, car_id in enumerate(car_ids)}
+
+    def _roster_frames(self, cars: list[dict]) -> list[dict]:
+        """Re-index (and tell the client) when the cars on track aren't the roster."""
+        if len(cars) == len(self._index) and all(c["car_id"] in self._index for c in cars):
+            return []
+        self._set_roster([c["car_id"] for c in cars])
+        return [{
+            "type": "roster",
+            "entrants": [{"car_id": c["car_id"], "username": c["username"]} for c in cars],
+        }]
+
+    def _state(self, cars: list[dict]) -> list[tuple[int, int, str | None]]:
+        """(p, s, incident) per roster index."""
+        state: list = [None] * len(cars)
+        for c in cars:
+            state[self._index[c["car_id"]]] = (
+                round(c["progress"] * PROGRESS_SCALE), int(c["speed"]), c["incident"],
+            )
+        return state
+
+
+class DeltaTickEncoder(_IndexedTickEncoder):
+    """Turns protocol 1 tick messages into protocol 2 frames for one stream of ticks."""
+
+    def __init__(self, car_ids: list[str], keyframe_interval: int = TICK_KEYFRAME_INTERVAL):
+        self._keyframe_interval = keyframe_interval
+        super().__init__(car_ids)
+
+    def _set_roster(self, car_ids: list[str]) -> None:
+        super()._set_roster(car_ids)
+        self._last: list[tuple[int, int, str | None]] | None = None  # (p, s, incident) per index
+        self._since_key = 0
+
+    def encode(self, msg: dict) -> list[dict]:
+        """Frames to send for one tick message (a roster frame may precede the tick)."""
+        frames = self._roster_frames(msg["cars"])
+        state = self._state(msg["cars"])
+
+        if self._last is None or self._since_key >= self._keyframe_interval:
+            self._last = state
+            self._since_key = 1
+            frames.append(self.keyframe(msg))
+            return frames
+
+        frame: dict = {
+            "type": "delta",
+            "tick": msg["tick"],
+            "cars": [
+                [i, p, s] for i, ((p, s, _), (lp, ls, _)) in enumerate(zip(state, self._last))
+                if p != lp or s != ls
+            ],
+        }
+        incidents = [
+            [i, inc] for i, ((_, _, inc), (_, _, last_inc)) in enumerate(zip(state, self._last))
+            if inc != last_inc
+        ]
+        if incidents:
+            frame["inc"] = incidents
+        self._since_key += 1
+        self._last = state
+        frames.append(frame)
+        return frames
+
+    def keyframe(self, msg: dict) -> dict:
+        """A key frame for the tick last passed to encode(), without touching the delta state.
+
+        For clients that join between key frames.
+        """
+        state = self._last if self._last is not None else self._state(msg["cars"])
+        frame: dict = {
+            "type": "key",
+            "tick": msg["tick"],
+            "p": [p for p, _, _ in state],
+            "s": [s for _, s, _ in state],
+        }
+        incidents = [[i, inc] for i, (_, _, inc) in enumerate(state) if inc is not None]
+        if incidents:
+            frame["inc"] = incidents
+        return frame
+
+
+class BinaryTickEncoder(_IndexedTickEncoder):
+    """Turns protocol 1 tick messages into protocol 3 frames (bytes, or dicts sent as JSON)."""
+
+    def encode(self, msg: dict) -> list[dict | bytes]:
+        frames: list[dict | bytes] = list(self._roster_frames(msg["cars"]))
+        state = self._state(msg["cars"])
+        try:
+            incidents = bytes(_INCIDENT_CODE[inc] for _, _, inc in state)
+        except KeyError:
+            frames.append({"type": "tick", **msg})  # an incident the binary format can't name
+            return frames
+        progress = array("H", [p for p, _, _ in state])
+        speed = array("H", [s for _, s, _ in state])
+        if not _LITTLE_ENDIAN:
+            progress.byteswap()
+            speed.byteswap()
+        frames.append(
+            _BINARY_HEADER.pack(_BINARY_TICK, 0, len(state), msg["tick"])
+            + progress.tobytes() + speed.tobytes() + incidents
+        )
+        return frames
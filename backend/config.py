@@ -4,17 +4,59 @@ import os
 
 # ── Filesystem paths ──────────────────────────────────────────────────────────
 ROOT = Path(__file__).parent.parent
-DATA_DIR = ROOT / "data"
+DATA_DIR = Path(os.environ.get("DATA_DIR", ROOT / "data"))
 PLAYERS_DIR = DATA_DIR / "players"
 RACES_DIR = DATA_DIR / "races"
+TRACKS_DIR = DATA_DIR / "tracks"                        # one file per distinct layout, named by content hash
+ARCHIVE_DIR = DATA_DIR / "archive"                      # finished races packed per day
+REPLAYS_DIR = DATA_DIR / "replays"                      # precomputed tick streams, one per locked race
+USERNAME_INDEX_FILE = DATA_DIR / "username_index.json"  # username → player_id
+RACE_INDEX_FILE = DATA_DIR / "race_index.json"          # RaceSummary per race (schedule view)
 SCHEDULE_FILE = DATA_DIR / "schedule.json"
 STATIC_DIR = ROOT / "PNG"
 CAR_GLB = ROOT / "car.glb"
 
+# ── Storage ───────────────────────────────────────────────────────────────────
+# "json" — one file per player/race under data/ (default); "sqlite" — single WAL database
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+SQLITE_PATH = DATA_DIR / "carracingsim.db"
+# Validated Player/Race objects kept in memory (LRU, invalidated by file mtime)
+STORAGE_CACHE_MAX_ENTRIES = int(os.environ.get("STORAGE_CACHE_MAX_ENTRIES", "4096"))
+# Disk reads/writes and (de)serialization run on this many threads, off the event loop
+STORAGE_IO_WORKERS   = int(os.environ.get("STORAGE_IO_WORKERS", "4"))
+STORAGE_IO_MAX_QUEUE = int(os.environ.get("STORAGE_IO_MAX_QUEUE", "256"))  # jobs waiting beyond the workers
+# Saves within this window are coalesced and written as one batch (0 = write immediately)
+STORAGE_WRITE_BEHIND_MS = int(os.environ.get("STORAGE_WRITE_BEHIND_MS", "200"))
+# Finished races older than this move from the live store into data/archive/ (0 = never)
+RACE_ARCHIVE_AFTER_HOURS = int(os.environ.get("RACE_ARCHIVE_AFTER_HOURS", "48"))
+# Replay files of races finished longer ago than this are deleted (0 = keep them forever)
+REPLAY_RETENTION_HOURS = int(os.environ.get("REPLAY_RETENTION_HOURS", "48"))
+# Set to 1 when several server processes share DATA_DIR (uvicorn --workers N): entity locks
+# span processes, saves are written immediately, and each process replays the others'
+# changes from the journal into its cache and indexes
+STORAGE_MULTI_PROCESS = os.environ.get("STORAGE_MULTI_PROCESS", "0") == "1"
+STORAGE_LOCK_FILE = DATA_DIR / "storage.lock"        # one byte-range lock stripe per entity
+STORAGE_JOURNAL_FILE = DATA_DIR / "storage.journal"  # one JSON line per entity written
+STORAGE_JOURNAL_MAX_BYTES = 4 * 1024 * 1024          # the journal starts over beyond this
+
+# ── Scheduler ─────────────────────────────────────────────────────────────────
+# Of the server processes sharing DATA_DIR, only the one holding this lock runs the scheduler
+SCHEDULER_LEADER_LOCK = DATA_DIR / "scheduler.lock"
+SCHEDULER_LEADER_POLL_SECONDS = 2.0  # standbys retry the lock, and the leader heartbeats, this often
+# A leader whose heartbeat is older than this is hung (alive but its event loop stuck): a standby
+# kills it so the kernel frees the lock (uvicorn --workers restarts the process)
+SCHEDULER_LEADER_STALE_SECONDS = 30.0
+
 # ── Auth ──────────────────────────────────────────────────────────────────────
 SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRE_DAYS = 30
+# bcrypt runs on this many threads off the event loop — at most this many hashes at once
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", "2"))
+# A login/register waiting longer than this for a hashing thread gets 503 instead of queueing
+AUTH_HASH_QUEUE_TIMEOUT_MS = int(os.environ.get("AUTH_HASH_QUEUE_TIMEOUT_MS", "2000"))
+# Verified session tokens, and the players they belong to, kept in memory (LRU); 0 disables
+AUTH_SESSION_CACHE_MAX_ENTRIES = int(os.environ.get("AUTH_SESSION_CACHE_MAX_ENTRIES", "4096"))
 
 # ── Economy ───────────────────────────────────────────────────────────────────
 STARTING_CREDITS = 5_000
@@ -103,12 +145,24 @@ EVENT_SLOT_WEIGHTS: dict[str, dict[str, float]] = {
 TRACK_GRID_SIZE   = 12    # default grid size (fallback)
 TRACK_MIN_STEPS   = 24    # minimum path length before loop closes; scaled up with n
 TRACK_MAX_RETRIES = 10
+# "grow" — bump a small loop outward until it reaches its target length (always succeeds);
+# "walk" — original self-avoiding random walk, falls back to an oval on large grids
+TRACK_GENERATOR = os.environ.get("TRACK_GENERATOR", "grow")
 
 # ── Race broadcast ────────────────────────────────────────────────────────────
 # RACE_LAP_COUNT is now per-race (stored in schedule.json and Race.lap_count).
 # Default used only when a Race is created outside the normal scheduler flow.
 RACE_LAP_COUNT_DEFAULT = 25
 RACE_TICK_INTERVAL_MS  = 62    # milliseconds between ticks (~16 ticks/sec)
+RACE_CLOCK_MAX_CATCH_UP = 8    # overdue ticks a race may send in one burst; older ones are skipped
+TICK_KEYFRAME_INTERVAL = 32    # protocol 2: full-state frame every N ticks, deltas in between
+WS_BUFFER_FRAMES       = 64    # tick frames queued per client (~4s); the oldest is dropped beyond this
+WS_LAG_LIMIT_FRAMES    = 960   # disconnect a client once this many ticks were dropped without it catching up (~60s)
+# "memory" — one server process (default); "hub" — server processes share races over a
+# Unix socket (see backend/broadcast/hub.py)
+BROADCAST_BACKEND = os.environ.get("BROADCAST_BACKEND", "memory")
+BROADCAST_HUB_SOCKET = Path(os.environ.get("BROADCAST_HUB_SOCKET", DATA_DIR / "broadcast.sock"))
+BROADCAST_HUB_MAX_BUFFER = 8 * 1024 * 1024  # bytes a peer may fall behind before the hub drops it
 
 # ── Physics simulation ───────────────────────────────────────────────────────
 TILE_FEET              = 30.0
@@ -129,6 +183,12 @@ BRAKE_FPS2             = BRAKE_G * FT_PER_SEC_PER_G      # ~32.2 ft/s²
 
 TRAILING_GRACE_TICKS   = 160  # ~10s after leader finishes for trailing cars
 
+# Tick-stream engine: "python" (reference), "numpy" (vectorized, identical output,
+# needs the `fast` extra), or "auto" — numpy for big fields when installed, else python
+SIM_ENGINE = os.environ.get("SIM_ENGINE", "auto")
+# Worker processes that simulate races into replay files (0 = a thread in the server process)
+SIM_WORKERS = int(os.environ.get("SIM_WORKERS", "2"))
+
 # ── Bots ─────────────────────────────────────────────────────────────────────
 BOT_GRID_TARGET = 6           # total cars per race (players + bots fill to this)
 BOT_PLAYER_ID_PREFIX = "bot_" # prefix distinguishes bots from real player UUIDs
@@ -7,8 +7,9 @@ Routes:
   POST /api/auth/logout
   GET  /api/auth/me
 
-  GET  /api/schedule
+  GET  /api/schedule                  (?since=&until= time window)
   GET  /api/races/{race_id}
+  GET  /api/tracks/{track_id}         (immutable, cacheable)
 
   GET  /api/car
   POST /api/car/repair/{slot}
@@ -19,6 +20,8 @@ Routes:
 
   POST /api/admin/races/{race_id}/start
   POST /api/admin/reset-schedule
+  POST /api/admin/rebuild-username-index
+  GET  /api/admin/stats
 
   WS   /ws/races/{race_id}
 
@@ -38,7 +41,7 @@ from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import (
-    Cookie, Depends, FastAPI, HTTPException, Response, WebSocket,
+    Cookie, Depends, FastAPI, HTTPException, Query, Request, Response, WebSocket,
     WebSocketDisconnect, status,
 )
 from fastapi.middleware.cors import CORSMiddleware
@@ -48,18 +51,23 @@ from pydantic import BaseModel
 
 from backend.auth import (
     create_token, decode_token, get_current_player,
-    hash_password, verify_password,
+    hash_password, hash_stats, session_stats, shutdown_hash_workers, verify_password,
 )
 from backend.broadcast.race_broadcaster import broadcaster
+from backend.broadcast.race_clock import race_clock
+from backend.broadcast.tick_codec import PROTOCOLS
 from backend.config import (
     CAR_GLB, ENTRY_FEE, FINISH_REWARDS, SLOT_NAMES, SLOT_SWAP_COSTS,
     STATIC_DIR, TIER_SCORES, TIER_UNLOCK_RACES,
 )
 from backend.models import Player, Race, RaceEntry, SlotPart
+from backend.replay import Replay, shutdown_sim_workers, sim_stats
 from backend.scheduler.jobs import setup_scheduler, run_race_job, reset_schedule
+from backend.scheduler.leader import LeaderElection
 from backend.storage import (
-    ensure_dirs, find_player_by_username, load_player, load_race,
-    list_races, save_player, save_race,
+    cache_stats, ensure_dirs, find_player_by_username, flush_pending, io_stats, load_player,
+    list_race_summaries, load_archive_index, load_race, load_race_index, load_track, load_username_index,
+    lock_stats, locked, rebuild_username_index, save_player, save_race, shutdown_storage, warm_race_cache,
 )
 
 log = logging.getLogger("uvicorn.error")
@@ -69,9 +77,31 @@ log = logging.getLogger("uvicorn.error")
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     ensure_dirs()
-    app.state.scheduler = await setup_scheduler()
+    await load_username_index()
+    await load_race_index()
+    await load_archive_index()
+    await broadcaster.start()
+
+    # Only one of the server processes sharing DATA_DIR runs the scheduler
+    app.state.scheduler = None
+
+    async def lead() -> None:
+        app.state.scheduler = await setup_scheduler()
+
+    app.state.leader = LeaderElection(lead)
+    await app.state.leader.start()
+    warmed = await warm_race_cache()
+    log.info("Storage cache warmed with %d upcoming races", warmed)
     yield
-    app.state.scheduler.shutdown()
+    if app.state.scheduler is not None:
+        app.state.scheduler.shutdown()
+    await app.state.leader.stop()
+    await broadcaster.stop()
+    flushed = await flush_pending()
+    log.info("Storage flushed %d pending writes", flushed)
+    shutdown_storage()
+    shutdown_sim_workers()
+    shutdown_hash_workers()
 
 
 app = FastAPI(title="CarRacingSim", lifespan=lifespan)
@@ -106,11 +136,13 @@ class RegisterBody(BaseModel):
 async def register(body: RegisterBody, response: Response):
     if len(body.username) < 3 or len(body.password) < 6:
         raise HTTPException(400, "Username ≥ 3 chars, password ≥ 6 chars")
-    existing = await find_player_by_username(body.username)
-    if existing:
-        raise HTTPException(409, "Username taken")
-    player = Player(username=body.username, hashed_password=hash_password(body.password))
-    await save_player(player)
+    hashed = await hash_password(body.password)  # before the lock, which it would hold for ~200 ms
+    async with locked(("usernames", body.username)):
+        existing = await find_player_by_username(body.username)
+        if existing:
+            raise HTTPException(409, "Username taken")
+        player = Player(username=body.username, hashed_password=hashed)
+        await save_player(player)
     token = create_token(player.id)
     response.set_cookie("session", token, httponly=True, samesite="lax", max_age=86400 * 30)
     return {"id": player.id, "username": player.username}
@@ -119,7 +151,7 @@ async def register(body: RegisterBody, response: Response):
 @app.post("/api/auth/login")
 async def login(body: RegisterBody, response: Response):
     player = await find_player_by_username(body.username)
-    if not player or not verify_password(body.password, player.hashed_password):
+    if not player or not await verify_password(body.password, player.hashed_password):
         raise HTTPException(401, "Invalid credentials")
     token = create_token(player.id)
     response.set_cookie("session", token, httponly=True, samesite="lax", max_age=86400 * 30)
@@ -145,27 +177,41 @@ async def me(player: Player = Depends(get_current_player)):
 
 # ── Schedule & races ──────────────────────────────────────────────────────────
 
-@app.get("/api/schedule")
-async def get_schedule(player: Player = Depends(get_current_player)):
-    races = await list_races()
-    entered_ids = set()
-    for r in races:
-        if any(e.player_id == player.id for e in r.entries):
-            entered_ids.add(r.id)
+def _time_bound(value: Optional[str], name: str) -> Optional[str]:
+    """Normalise an ISO-8601 query parameter to the races' UTC 'Z' format."""
+    if value is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"{name} must be an ISO-8601 timestamp")
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds").replace("+00:00", "Z")
+
 
+@app.get("/api/schedule")
+async def get_schedule(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    player: Player = Depends(get_current_player),
+):
+    summaries = await list_race_summaries(
+        since=_time_bound(since, "since"), until=_time_bound(until, "until"),
+    )
     return [
         {
-            "id": r.id,
-            "scheduled_time": r.scheduled_time,
-            "event_type": r.event_type,
-            "status": r.status,
-            "entry_fee": r.entry_fee,
-            "lap_count": r.lap_count,
-            "grid_size": r.grid_size,
-            "entrant_count": len(r.entries),
-            "entered": r.id in entered_ids,
+            "id": s.id,
+            "scheduled_time": s.scheduled_time,
+            "event_type": s.event_type,
+            "status": s.status,
+            "entry_fee": s.entry_fee,
+            "lap_count": s.lap_count,
+            "grid_size": s.grid_size,
+            "entrant_count": s.entrant_count,
+            "entered": player.id in s.entrant_ids,
         }
-        for r in races
+        for s in summaries
     ]
 
 
@@ -177,6 +223,51 @@ async def get_race(race_id: str, player: Player = Depends(get_current_player)):
     return race.model_dump(exclude={"results"} if race.status != "finished" else set())
 
 
+_REPLAY_MAX_TICKS = 2000  # per request (~2 min of race)
+
+
+@app.get("/api/races/{race_id}/replay")
+async def get_race_replay(
+    race_id: str,
+    start: int = Query(1, ge=1),
+    count: int = Query(_REPLAY_MAX_TICKS, ge=1, le=_REPLAY_MAX_TICKS),
+    player: Player = Depends(get_current_player),
+):
+    """A window of a finished race's ticks, read from its memory-mapped replay file."""
+    race = await load_race(race_id)
+    if not race:
+        raise HTTPException(404, "Race not found")
+    if race.status != "finished":
+        raise HTTPException(400, "Race not finished")  # the replay already holds the outcome
+    replay = Replay.open(race_id)
+    if replay is None:
+        raise HTTPException(410, "Replay no longer available")  # pruned after REPLAY_RETENTION_HOURS
+    with replay:
+        return {
+            "race_id": race_id,
+            "lap_count": replay.lap_count,
+            "n_ticks": replay.n_ticks,
+            "start": start,
+            "ticks": list(replay.ticks(start, start + count - 1)),
+        }
+
+
+_TRACK_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@app.get("/api/tracks/{track_id}")
+async def get_track(track_id: str, request: Request):
+    """Serve a stored track. Ids are content hashes, so responses never change."""
+    track = await load_track(track_id)  # usually cached; an unknown id must not get a 304
+    if not track:
+        raise HTTPException(404, "Track not found")
+    etag = f'"{track_id}"'
+    headers = {"Cache-Control": _TRACK_CACHE_CONTROL, "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(track.model_dump_json(), media_type="application/json", headers=headers)
+
+
 # ── Car management ────────────────────────────────────────────────────────────
 
 @app.get("/api/car")
@@ -207,14 +298,17 @@ async def get_car(player: Player = Depends(get_current_player)):
 async def repair_slot(slot: str, player: Player = Depends(get_current_player)):
     if slot not in SLOT_NAMES:
         raise HTTPException(400, f"Unknown slot: {slot}")
-    if player.materials < 1:
-        raise HTTPException(400, "Not enough materials (need 1)")
-    part = player.car.get_slot(slot)
-    if part.readiness >= 100:
-        raise HTTPException(400, "Slot already at full readiness")
-    player.car.set_slot(slot, part.model_copy(update={"readiness": 100.0}))
-    player = player.model_copy(update={"materials": player.materials - 1})
-    await save_player(player)
+    async with locked(("players", player.id)):
+        player = await load_player(player.id)
+        if player.materials < 1:
+            raise HTTPException(400, "Not enough materials (need 1)")
+        part = player.car.get_slot(slot)
+        if part.readiness >= 100:
+            raise HTTPException(400, "Slot already at full readiness")
+        car = player.car.model_copy()
+        car.set_slot(slot, part.model_copy(update={"readiness": 100.0}))
+        player = player.model_copy(update={"car": car, "materials": player.materials - 1})
+        await save_player(player)
     return {"slot": slot, "readiness": 100.0, "materials": player.materials}
 
 
@@ -228,20 +322,24 @@ async def swap_slot(slot: str, body: SwapBody, player: Player = Depends(get_curr
         raise HTTPException(400, f"Unknown slot: {slot}")
     if body.tier not in TIER_SCORES:
         raise HTTPException(400, f"Unknown tier: {body.tier}")
-    required_races = TIER_UNLOCK_RACES[body.tier]
-    if player.races_entered < required_races:
-        raise HTTPException(400, f"{body.tier.title()} tier requires {required_races} races entered")
-    cost = SLOT_SWAP_COSTS[slot]
-    if player.credits < cost["credits"]:
-        raise HTTPException(400, f"Not enough credits (need {cost['credits']})")
-    if player.materials < cost["materials"]:
-        raise HTTPException(400, f"Not enough materials (need {cost['materials']})")
-    player.car.set_slot(slot, SlotPart(tier=body.tier, readiness=100.0))
-    player = player.model_copy(update={
-        "credits": player.credits - cost["credits"],
-        "materials": player.materials - cost["materials"],
-    })
-    await save_player(player)
+    async with locked(("players", player.id)):
+        player = await load_player(player.id)
+        required_races = TIER_UNLOCK_RACES[body.tier]
+        if player.races_entered < required_races:
+            raise HTTPException(400, f"{body.tier.title()} tier requires {required_races} races entered")
+        cost = SLOT_SWAP_COSTS[slot]
+        if player.credits < cost["credits"]:
+            raise HTTPException(400, f"Not enough credits (need {cost['credits']})")
+        if player.materials < cost["materials"]:
+            raise HTTPException(400, f"Not enough materials (need {cost['materials']})")
+        car = player.car.model_copy()
+        car.set_slot(slot, SlotPart(tier=body.tier, readiness=100.0))
+        player = player.model_copy(update={
+            "car": car,
+            "credits": player.credits - cost["credits"],
+            "materials": player.materials - cost["materials"],
+        })
+        await save_player(player)
     return {
         "slot": slot,
         "tier": body.tier,
@@ -254,44 +352,48 @@ async def swap_slot(slot: str, body: SwapBody, player: Player = Depends(get_curr
 
 @app.post("/api/races/{race_id}/enter")
 async def enter_race(race_id: str, player: Player = Depends(get_current_player)):
-    race = await load_race(race_id)
-    if not race:
-        raise HTTPException(404, "Race not found")
-    if race.status not in ("open",):
-        raise HTTPException(400, f"Race is {race.status} — cannot enter")
-    if any(e.player_id == player.id for e in race.entries):
-        raise HTTPException(409, "Already entered")
-    if player.credits < race.entry_fee:
-        raise HTTPException(400, "Not enough credits for entry fee")
-    player = player.model_copy(update={"credits": player.credits - race.entry_fee})
-    await save_player(player)
-    entry = RaceEntry(
-        player_id=player.id,
-        username=player.username,
-        entered_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
-    )
-    race = race.model_copy(update={"entries": race.entries + [entry]})
-    await save_race(race)
+    async with locked(("races", race_id), ("players", player.id)):
+        player = await load_player(player.id)
+        race = await load_race(race_id)
+        if not race:
+            raise HTTPException(404, "Race not found")
+        if race.status not in ("open",):
+            raise HTTPException(400, f"Race is {race.status} — cannot enter")
+        if any(e.player_id == player.id for e in race.entries):
+            raise HTTPException(409, "Already entered")
+        if player.credits < race.entry_fee:
+            raise HTTPException(400, "Not enough credits for entry fee")
+        player = player.model_copy(update={"credits": player.credits - race.entry_fee})
+        await save_player(player)
+        entry = RaceEntry(
+            player_id=player.id,
+            username=player.username,
+            entered_at=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        )
+        race = race.model_copy(update={"entries": race.entries + [entry]})
+        await save_race(race)
     return {"entered": True, "credits": player.credits, "entry_fee": race.entry_fee}
 
 
 @app.delete("/api/races/{race_id}/enter")
 async def withdraw_race(race_id: str, player: Player = Depends(get_current_player)):
-    race = await load_race(race_id)
-    if not race:
-        raise HTTPException(404, "Race not found")
-    if race.status != "open":
-        raise HTTPException(400, f"Race is {race.status} — withdrawal no longer allowed")
-    entry = next((e for e in race.entries if e.player_id == player.id), None)
-    if not entry:
-        raise HTTPException(400, "Not entered in this race")
-    # Refund 50 % of entry fee
-    refund = race.entry_fee // 2
-    player = player.model_copy(update={"credits": player.credits + refund})
-    await save_player(player)
-    new_entries = [e for e in race.entries if e.player_id != player.id]
-    race = race.model_copy(update={"entries": new_entries})
-    await save_race(race)
+    async with locked(("races", race_id), ("players", player.id)):
+        player = await load_player(player.id)
+        race = await load_race(race_id)
+        if not race:
+            raise HTTPException(404, "Race not found")
+        if race.status != "open":
+            raise HTTPException(400, f"Race is {race.status} — withdrawal no longer allowed")
+        entry = next((e for e in race.entries if e.player_id == player.id), None)
+        if not entry:
+            raise HTTPException(400, "Not entered in this race")
+        # Refund 50 % of entry fee
+        refund = race.entry_fee // 2
+        player = player.model_copy(update={"credits": player.credits + refund})
+        await save_player(player)
+        new_entries = [e for e in race.entries if e.player_id != player.id]
+        race = race.model_copy(update={"entries": new_entries})
+        await save_race(race)
     return {"withdrawn": True, "refund": refund, "credits": player.credits}
 
 
@@ -320,15 +422,48 @@ async def admin_reset_schedule(player: Player = Depends(get_current_player)):
     return {"reset": True, "races_created": created}
 
 
+@app.post("/api/admin/rebuild-username-index")
+async def admin_rebuild_username_index(player: Player = Depends(get_current_player)):
+    if player.username != "admin":
+        raise HTTPException(403, "Admin only")
+    count = await rebuild_username_index()
+    return {"rebuilt": True, "players_indexed": count}
+
+
+@app.get("/api/admin/stats")
+async def admin_stats(player: Player = Depends(get_current_player)):
+    if player.username != "admin":
+        raise HTTPException(403, "Admin only")
+    return {
+        "storage_cache": cache_stats(),
+        "storage_io": io_stats(),
+        "storage_locks": lock_stats(),
+        "broadcast": broadcaster.stats(),
+        "race_clock": race_clock.stats(),
+        "simulation": sim_stats(),
+        "auth_hashing": hash_stats(),
+        "sessions": session_stats(),
+        "scheduler": {
+            **app.state.leader.stats(),
+            "jobs": len(app.state.scheduler.get_jobs()) if app.state.scheduler is not None else None,
+        },
+    }
+
+
 # ── WebSocket live race ───────────────────────────────────────────────────────
 
 @app.websocket("/ws/races/{race_id}")
-async def ws_race(websocket: WebSocket, race_id: str):
+async def ws_race(websocket: WebSocket, race_id: str, protocol: int = 1):
     session = websocket.cookies.get("session")
     player_id = decode_token(session) if session else None
 
     await websocket.accept()
 
+    if protocol not in PROTOCOLS:
+        await websocket.send_json({"type": "error", "detail": f"Unsupported protocol {protocol}"})
+        await websocket.close()
+        return
+
     race = await load_race(race_id)
     if not race:
         await websocket.send_json({"type": "error", "detail": "Race not found"})
@@ -341,10 +476,12 @@ async def ws_race(websocket: WebSocket, race_id: str):
         "race_id": race_id,
         "event_type": race.event_type,
         "status": race.status,
+        "track_id": race.track_id,
         "track": race.track.model_dump() if race.track else None,
         "entrants": [{"car_id": e.player_id, "username": e.username} for e in race.entries],
         "your_id": player_id,
         "lap_count": race.lap_count,
+        "protocol": protocol,
     })
 
     if race.status == "finished":
@@ -355,21 +492,26 @@ async def ws_race(websocket: WebSocket, race_id: str):
         await websocket.close()
         return
 
-    q = broadcaster.subscribe(race_id)
+    # Frames arrive already encoded for this protocol (protocols 2/3 index cars
+    # into the entrants just sent)
+    sub = broadcaster.subscribe(race_id, protocol, [e.player_id for e in race.entries])
     try:
         while True:
             try:
-                msg = await asyncio.wait_for(q.get(), timeout=60.0)
+                frame = await asyncio.wait_for(sub.get(), timeout=60.0)
             except asyncio.TimeoutError:
                 # Send keepalive ping
                 await websocket.send_json({"type": "ping"})
                 continue
-            await websocket.send_json(msg)
-            if msg.get("type") == "finished":
+            if isinstance(frame.data, bytes):
+                await websocket.send_bytes(frame.data)
+            else:
+                await websocket.send_text(frame.data)
+            if frame.final:
                 break
     except WebSocketDisconnect:
         pass
     except Exception:
         log.exception("WebSocket error for race %s", race_id)
     finally:
-        broadcaster.unsubscribe(race_id, q)
+        broadcaster.unsubscribe(race_id, sub)
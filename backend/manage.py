@@ -0,0 +1,71 @@
+"""
+Operator command line — run with the backend stopped.
+
+Usage:
+  python -m backend.manage rebuild-username-index
+  python -m backend.manage migrate-storage [--to sqlite]
+  python -m backend.manage archive-races [--older-than-hours N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from backend.config import (
+    PLAYERS_DIR, RACE_ARCHIVE_AFTER_HOURS, RACES_DIR, SQLITE_PATH, TRACKS_DIR,
+)
+from backend.storage import (
+    JsonFileBackend, archive_finished_races, copy_entities, ensure_dirs, flush_pending,
+    load_archive_index, rebuild_username_index,
+)
+
+
+async def _rebuild_username_index(_args: argparse.Namespace) -> None:
+    count = await rebuild_username_index()
+    print(f"Indexed {count} usernames")
+
+
+async def _migrate_storage(args: argparse.Namespace) -> None:
+    from backend.storage_sqlite import SQLiteBackend
+    source = JsonFileBackend({"players": PLAYERS_DIR, "races": RACES_DIR, "tracks": TRACKS_DIR})
+    target = SQLiteBackend(SQLITE_PATH)
+    try:
+        copied = copy_entities(source, target)
+    finally:
+        target.close()
+    print(f"Copied {copied['players']} players, {copied['races']} races and "
+          f"{copied['tracks']} tracks into {SQLITE_PATH}")
+    print("Start the backend with STORAGE_BACKEND=sqlite to use it.")
+
+
+async def _archive_races(args: argparse.Namespace) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=args.older_than_hours)
+    await load_archive_index()
+    archived = await archive_finished_races(cutoff.isoformat(timespec="seconds").replace("+00:00", "Z"))
+    await flush_pending()
+    print(f"Archived {archived} finished races scheduled before {cutoff:%Y-%m-%d %H:%M} UTC")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("rebuild-username-index", help="Rescan stored players and rewrite the username index")
+    cmd.set_defaults(func=_rebuild_username_index)
+
+    cmd = commands.add_parser("migrate-storage", help="Copy data/players, data/races and data/tracks into the SQLite database")
+    cmd.add_argument("--to", choices=["sqlite"], default="sqlite")
+    cmd.set_defaults(func=_migrate_storage)
+
+    cmd = commands.add_parser("archive-races", help="Pack old finished races into data/archive/")
+    cmd.add_argument("--older-than-hours", type=int, default=RACE_ARCHIVE_AFTER_HOURS)
+    cmd.set_defaults(func=_archive_races)
+
+    args = parser.parse_args(argv)
+    ensure_dirs()
+    asyncio.run(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,13 @@
 from __future__ import annotations
 
 import uuid
-from typing import Literal, Optional
+from functools import cached_property
+from typing import Any, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 from backend.config import SLOT_NAMES, STARTING_CREDITS, STARTING_MATERIALS
+from backend.track_codec import decode_path, encode_path, tile_shapes
 
 Tier = Literal["standard", "upgraded", "performance"]
 RaceStatus = Literal["upcoming", "open", "locked", "running", "finished"]
@@ -59,10 +61,41 @@ class TileData(BaseModel):
 
 
 class TrackData(BaseModel):
+    """Closed-loop track stored as start cell + one N/E/S/W letter per step.
+
+    ``path_order`` and ``tiles`` are expanded from the directions on first use
+    and cached on the instance; tracks are never modified after generation.
+    Documents in the old expanded form ({tiles, path_order}) are still accepted
+    and converted on load.
+    """
     grid_width: int
     grid_height: int
-    tiles: list[TileData]
-    path_order: list[list[int]]  # [[x,y], ...]
+    start: list[int]   # [x, y] of the first path cell
+    directions: str    # e.g. "EESSWWNN"; the last step returns to start
+
+    @model_validator(mode="before")
+    @classmethod
+    def _from_expanded(cls, data: Any) -> Any:
+        if isinstance(data, dict) and "directions" not in data and "path_order" in data:
+            start, directions = encode_path(data["path_order"])
+            data = {**data, "start": start, "directions": directions}
+        return data
+
+    @cached_property
+    def path_order(self) -> list[list[int]]:  # [[x,y], ...]
+        return decode_path(self.start, self.directions)
+
+    @cached_property
+    def tile_types(self) -> list[str]:
+        """Tile type per path_order index — all the simulation needs."""
+        return [t_type for t_type, _ in tile_shapes(self.directions)]
+
+    @cached_property
+    def tiles(self) -> list[TileData]:
+        return [
+            TileData(x=x, y=y, type=t_type, orientation=t_orient)
+            for (x, y), (t_type, t_orient) in zip(self.path_order, tile_shapes(self.directions))
+        ]
 
 
 class RaceEntry(BaseModel):
@@ -105,6 +138,36 @@ class Race(BaseModel):
     entry_fee: int = 100
     lap_count: int = 25                   # set from schedule.json slot (25–250)
     grid_size: int = 12                   # track grid n×n (12–60); set at race creation
-    track: Optional[TrackData] = None
+    track_id: Optional[str] = None        # content hash in the track store
+    track: Optional[TrackData] = None     # embedded track (races created before the track store)
     entries: list[RaceEntry] = Field(default_factory=list)
     results: list[EntryResult] = Field(default_factory=list)
+
+
+class RaceSummary(BaseModel):
+    """Schedule-sized view of a Race — kept in the storage race index."""
+    id: str
+    scheduled_time: str
+    event_type: str
+    status: RaceStatus
+    entry_fee: int
+    lap_count: int
+    grid_size: int
+    entrant_count: int
+    entrant_ids: list[str] = Field(default_factory=list)
+    track_id: Optional[str] = None  # tells archiving which stored tracks live races still use
+
+    @classmethod
+    def from_race(cls, race: Race) -> "RaceSummary":
+        return cls(
+            id=race.id,
+            scheduled_time=race.scheduled_time,
+            event_type=race.event_type,
+            status=race.status,
+            entry_fee=race.entry_fee,
+            lap_count=race.lap_count,
+            grid_size=race.grid_size,
+            entrant_count=len(race.entries),
+            entrant_ids=[e.player_id for e in race.entries],
+            track_id=race.track_id,
+        )
@@ -0,0 +1,302 @@
+"""
+Precomputed race replays.
+
+Once entries lock at T-10 everything that decides a race is fixed: the grid,
+each car's snapshot and the seeds. lock_race_entries() simulates the race then
+and writes the whole tick stream to data/replays/{race_id}.replay, so at T+0
+run_race_job() only reads ticks back and broadcasts them — nothing is computed
+on the start path — and a finished race can be re-watched from the same file.
+
+File layout (little-endian):
+  8 bytes    magic b"CRSRPLY1"
+  4 bytes    uint32 header length H
+  H bytes    JSON header, space-padded to a multiple of 4
+  float32    progress[n_ticks][n_cars]
+  float32    speed[n_ticks][n_cars]
+
+Each column is stored tick-major, so a tick is n_cars consecutive floats and a
+window of ticks is one contiguous slice of the memory map. The header holds
+race_id, lap_count, car_ids, usernames, the results, and incidents as runs
+[car, first_tick, last_tick, incident] — only DNF cars ever have one.
+
+Ticks are stored as emitted (progress rounded to 4 places, whole-mph speed);
+float32 holds both closely enough that Replay.ticks() rebuilds them exactly.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from backend.config import REPLAYS_DIR, SIM_WORKERS
+from backend.models import EntryResult, Race, TrackData
+
+_MAGIC = b"CRSRPLY1"
+_PREAMBLE = struct.Struct("<8sI")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def replay_path(race_id: str) -> Path:
+    return REPLAYS_DIR / f"{race_id}.replay"
+
+
+def write_replay(
+    path: Path, race_id: str, lap_count: int, results: list[EntryResult], ticks: Iterable[dict],
+) -> int:
+    """Write a tick stream (engine.generate_tick_stream output) to path. Returns the tick count."""
+    progress = array("f")
+    speed = array("f")
+    runs: list[list] = []               # [car, first_tick, last_tick, incident]
+    last_run: dict[int, list] = {}      # car index → its most recent run
+    n_ticks = 0
+    for msg in ticks:
+        n_ticks += 1
+        if msg["tick"] != n_ticks:
+            raise ValueError(f"Tick stream skipped from {n_ticks - 1} to {msg['tick']}")
+        for i, car in enumerate(msg["cars"]):
+            progress.append(car["progress"])
+            speed.append(car["speed"])
+            incident = car["incident"]
+            if incident is None:
+                continue
+            run = last_run.get(i)
+            if run is not None and run[3] == incident and run[2] == n_ticks - 1:
+                run[2] = n_ticks
+            else:
+                last_run[i] = run = [i, n_ticks, n_ticks, incident]
+                runs.append(run)
+
+    header = json.dumps({
+        "race_id": race_id,
+        "lap_count": lap_count,
+        "n_ticks": n_ticks,
+        "car_ids": [r.player_id for r in results],
+        "usernames": [r.username for r in results],
+        "incidents": runs,
+        "results": [r.model_dump() for r in results],
+    }).encode()
+    header += b" " * (-len(header) % 4)  # keep the float columns 4-byte aligned
+    if not _LITTLE_ENDIAN:
+        progress.byteswap()
+        speed.byteswap()
+
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")  # two processes may simulate one race
+    with tmp.open("wb") as fh:
+        fh.write(_PREAMBLE.pack(_MAGIC, len(header)))
+        fh.write(header)
+        progress.tofile(fh)
+        speed.tofile(fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return n_ticks
+
+
+def build_replay(race: Race, track: TrackData | None, path: Path | None = None) -> int:
+    """Simulate a locked race and write its replay. Blocking — see simulate_replay()."""
+    from backend.simulation.engine import generate_tick_stream, simulate_race
+    results = simulate_race(race)
+    ticks = generate_tick_stream(results, lap_count=race.lap_count, track=track)
+    return write_replay(path or replay_path(race.id), race.id, race.lap_count, results, ticks)
+
+
+def delete_replay(race_id: str) -> None:
+    replay_path(race_id).unlink(missing_ok=True)
+
+
+def replays_written_before(before: float) -> list[str]:
+    """Race ids whose replay file was last written before ``before`` (a Unix time)."""
+    ids = []
+    for path in REPLAYS_DIR.glob("*.replay"):
+        try:
+            if path.stat().st_mtime < before:
+                ids.append(path.stem)
+        except FileNotFoundError:
+            continue  # deleted meanwhile
+    return ids
+
+
+# ── Simulation workers ────────────────────────────────────────────────────────
+#
+# Simulating a race is pure-Python CPU work. On a thread it still holds the
+# GIL against the event loop serving HTTP, WebSockets and every other race's
+# ticks, so it runs in SIM_WORKERS separate processes instead. Nothing is
+# streamed back: a worker writes the replay file and returns its tick count,
+# and the event loop memory-maps the file when the race starts.
+
+_sim_executor: ProcessPoolExecutor | None = None
+_sim_counters = {"in_flight": 0, "max_in_flight": 0, "completed": 0, "failed": 0, "pool_restarts": 0}
+_sim_seconds = {"total": 0.0, "max": 0.0}
+
+
+def _get_sim_executor() -> ProcessPoolExecutor:
+    global _sim_executor
+    if _sim_executor is None:
+        # spawn, not fork: the server process has the event loop and I/O threads running.
+        # Spawned workers re-import __main__, so a script that starts the app itself
+        # (rather than the uvicorn CLI) needs an `if __name__ == "__main__":` guard.
+        _sim_executor = ProcessPoolExecutor(max_workers=SIM_WORKERS, mp_context=get_context("spawn"))
+    return _sim_executor
+
+
+async def simulate_replay(race: Race, track: TrackData | None) -> int:
+    """build_replay() on a simulation worker process (a thread when SIM_WORKERS=0)."""
+    global _sim_executor
+    loop = asyncio.get_running_loop()
+    path = replay_path(race.id)
+    _sim_counters["in_flight"] += 1
+    _sim_counters["max_in_flight"] = max(_sim_counters["max_in_flight"], _sim_counters["in_flight"])
+    t0 = time.perf_counter()
+    try:
+        if SIM_WORKERS <= 0:
+            return await loop.run_in_executor(None, build_replay, race, track, path)
+        try:
+            return await loop.run_in_executor(_get_sim_executor(), build_replay, race, track, path)
+        except BrokenProcessPool:
+            # A worker died (killed, out of memory); start a fresh pool and retry once
+            _sim_counters["pool_restarts"] += 1
+            _sim_executor = None
+            return await loop.run_in_executor(_get_sim_executor(), build_replay, race, track, path)
+    except BaseException:
+        _sim_counters["failed"] += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        _sim_counters["in_flight"] -= 1
+        _sim_counters["completed"] += 1
+        _sim_seconds["total"] += elapsed
+        _sim_seconds["max"] = max(_sim_seconds["max"], elapsed)
+
+
+def sim_stats() -> dict:
+    completed = _sim_counters["completed"]
+    return {
+        "workers": SIM_WORKERS,
+        "mode": "process" if SIM_WORKERS > 0 else "thread",
+        **_sim_counters,
+        "avg_seconds": round(_sim_seconds["total"] / completed, 3) if completed else None,
+        "max_seconds": round(_sim_seconds["max"], 3),
+    }
+
+
+def shutdown_sim_workers() -> None:
+    """Stop the worker processes (app shutdown)."""
+    global _sim_executor
+    if _sim_executor is not None:
+        _sim_executor.shutdown(wait=True, cancel_futures=True)
+        _sim_executor = None
+
+
+class Replay:
+    """A replay file opened through a read-only memory map.
+
+    Reading ticks touches only the pages they live on; the OS page cache is
+    shared by every reader of the same file. Use as a context manager, or call
+    close() when done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._claim_fd: int | None = None
+        with path.open("rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, header_len = _PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"{path.name} is not a replay file")
+            header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_len])
+        except Exception:
+            self._mmap.close()
+            raise
+        self.race_id: str = header["race_id"]
+        self.lap_count: int = header["lap_count"]
+        self.n_ticks: int = header["n_ticks"]
+        self.car_ids: list[str] = header["car_ids"]
+        self.usernames: list[str] = header["usernames"]
+        self._incidents: list[list] = header["incidents"]
+        self._results: list[dict] = header["results"]
+
+        n_values = self.n_ticks * len(self.car_ids)
+        base = _PREAMBLE.size + header_len
+        self._progress = self._column(base, n_values)
+        self._speed = self._column(base + 4 * n_values, n_values)
+
+    def _column(self, offset: int, n_values: int):
+        if _LITTLE_ENDIAN:
+            return memoryview(self._mmap)[offset:offset + 4 * n_values].cast("f")
+        column = array("f", self._mmap[offset:offset + 4 * n_values])
+        column.byteswap()
+        return column
+
+    @classmethod
+    def open(cls, race_id: str) -> "Replay | None":
+        """Open the replay for race_id, or None if there isn't one."""
+        try:
+            return cls(replay_path(race_id))
+        except FileNotFoundError:
+            return None
+
+    @property
+    def results(self) -> list[EntryResult]:
+        return [EntryResult.model_validate(r) for r in self._results]
+
+    def ticks(self, start: int = 1, stop: int | None = None) -> Iterator[dict]:
+        """Yield tick messages start..stop (1-based, inclusive), as generate_tick_stream did."""
+        n_cars = len(self.car_ids)
+        stop = self.n_ticks if stop is None else min(stop, self.n_ticks)
+        for tick in range(max(start, 1), stop + 1):
+            lo = (tick - 1) * n_cars
+            incidents: list[str | None] = [None] * n_cars
+            for car, first, last, incident in self._incidents:
+                if first <= tick <= last:
+                    incidents[car] = incident
+            cars = [
+                {"car_id": c, "username": u, "progress": round(p, 4), "speed": s, "incident": inc}
+                for c, u, p, s, inc in zip(
+                    self.car_ids, self.usernames,
+                    self._progress[lo:lo + n_cars].tolist(), self._speed[lo:lo + n_cars].tolist(),
+                    incidents,
+                )
+            ]
+            yield {"tick": tick, "lap_count": self.lap_count, "cars": cars}
+
+    def claim(self) -> bool:
+        """Take this race's broadcast, exclusively across processes.
+
+        False if another process — or another Replay in this one — holds it.
+        Released by close(), or by the kernel if the process dies mid-race.
+        """
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._claim_fd = fd
+        return True
+
+    def close(self) -> None:
+        if self._claim_fd is not None:
+            os.close(self._claim_fd)
+            self._claim_fd = None
+        for column in (self._progress, self._speed):
+            if isinstance(column, memoryview):
+                column.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "Replay":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
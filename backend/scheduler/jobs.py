@@ -2,27 +2,41 @@
 Race lifecycle jobs — the single write authority for race results.
 
 Flow per race:
-  T-10 min  → lock_race_entries()   — freeze builds, no more entry/withdrawal
-  T+0 min   → run_race_job()        — simulate, broadcast ticks, save results, apply wear
+  T-10 min  → lock_race_entries()   — freeze builds, fill the grid with bots, simulate
+                                      the race into data/replays/{race_id}.replay
+  T+0 min   → run_race_job()        — broadcast ticks from the replay on the shared race clock,
+                                      save results, apply wear
+
+Hourly, archive_old_races() packs finished races older than
+RACE_ARCHIVE_AFTER_HOURS into data/archive/, and prune_old_replays() deletes
+the replay files of races finished more than REPLAY_RETENTION_HOURS ago.
+
+These jobs run in one process only, the scheduler leader (scheduler/leader.py).
+A leader that takes over resumes any race its predecessor left "running".
 """
 from __future__ import annotations
 
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta, timezone
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from backend.config import (
     FINISH_REWARDS, DEFAULT_REWARD, ENTRY_FEE,
-    RACE_TICK_INTERVAL_MS, SCHEDULE_FILE,
-    RACE_LAP_COUNT_DEFAULT, TRACK_GRID_SIZE,
+    RACE_ARCHIVE_AFTER_HOURS, REPLAY_RETENTION_HOURS, SCHEDULE_FILE,
+    RACE_LAP_COUNT_DEFAULT, RACE_TICK_INTERVAL_MS, TRACK_GRID_SIZE,
 )
 from backend.models import Race, RaceEntry
-from backend.storage import load_race, save_race, load_player, save_player
-from backend.simulation.engine import simulate_race, generate_tick_stream, apply_wear
+from backend.replay import Replay, delete_replay, replays_written_before, simulate_replay
+from backend.storage import (
+    load_race, load_race_track, save_race, save_track, load_player, save_player, locked,
+)
+from backend.simulation.engine import apply_wear
 from backend.broadcast.race_broadcaster import broadcaster
+from backend.broadcast.race_clock import race_clock
 from backend.track_gen import generate_track
 
 log = logging.getLogger(__name__)
@@ -46,52 +60,100 @@ async def ensure_race_exists(
     grid_size: int = TRACK_GRID_SIZE,
 ) -> None:
     """Create the race JSON file if it doesn't already exist."""
-    from backend.storage import race_path
-    if race_path(race_id).exists():
+    from backend.storage import race_exists, track_id as content_id
+    if race_exists(race_id):
         return
     track = generate_track(n=grid_size)
-    race = Race(
-        id=race_id,
-        scheduled_time=_iso(scheduled_dt),
-        event_type=event_type,
-        status="open",
-        entry_fee=ENTRY_FEE,
-        lap_count=lap_count,
-        grid_size=grid_size,
-        track=track,
-    )
-    await save_race(race)
+    # The track lock stops archiving from deleting an identical stored layout
+    # between save_track() and save_race()
+    async with locked(("races", race_id), ("tracks", content_id(track))):
+        if race_exists(race_id):  # created by another process meanwhile
+            return
+        track_id = await save_track(track)
+        race = Race(
+            id=race_id,
+            scheduled_time=_iso(scheduled_dt),
+            event_type=event_type,
+            status="open",
+            entry_fee=ENTRY_FEE,
+            lap_count=lap_count,
+            grid_size=grid_size,
+            track_id=track_id,
+        )
+        await save_race(race)
     log.info("Created race %s (%s, %d laps, %dx%d grid)", race_id, event_type, lap_count, grid_size, grid_size)
 
 
-async def lock_race_entries(race_id: str) -> None:
-    """Lock all entries: snapshot the current car state as locked_car."""
-    race = await load_race(race_id)
-    if not race or race.status != "open":
-        return
+async def _fill_grid(race: Race) -> Race:
+    """Top the grid up with bot entries (saved); no-op when it is already full."""
+    from backend.bots import generate_bot_entries
+    bot_entries = generate_bot_entries(race.id, len(race.entries))
+    if bot_entries:
+        race = race.model_copy(update={"entries": race.entries + bot_entries})
+        await save_race(race)
+    return race
+
+
+async def _prepare_replay(race: Race) -> None:
+    """Simulate a locked race and write its replay file on a simulation worker."""
+    track = await load_race_track(race)
+    t0 = time.perf_counter()
+    n_ticks = await simulate_replay(race, track)
+    log.info("Precomputed replay for race %s (%d ticks in %.2fs)", race.id, n_ticks, time.perf_counter() - t0)
+
+
+def _resume_tick(race: Race, replay: Replay) -> int:
+    """The tick a race that started on schedule would be broadcasting now."""
+    started = datetime.fromisoformat(race.scheduled_time.replace("Z", "+00:00"))
+    elapsed_ms = (datetime.now(timezone.utc) - started).total_seconds() * 1000
+    return min(max(1, int(elapsed_ms // RACE_TICK_INTERVAL_MS) + 1), replay.n_ticks + 1)
 
-    locked_entries = []
-    for entry in race.entries:
-        player = await load_player(entry.player_id)
-        if player:
-            locked_entries.append(
-                entry.model_copy(update={"locked_car": player.car})
-            )
-        else:
-            locked_entries.append(entry)
 
-    race = race.model_copy(update={"status": "locked", "entries": locked_entries})
-    await save_race(race)
+def _open_replay(race: Race) -> Replay | None:
+    """The race's replay, if it exists and was simulated from its current grid."""
+    replay = Replay.open(race.id)
+    if replay is not None and set(replay.car_ids) != {e.player_id for e in race.entries}:
+        replay.close()  # left over from an earlier race with this id
+        return None
+    return replay
+
+
+async def lock_race_entries(race_id: str) -> None:
+    """Lock all entries: snapshot the current car state as locked_car, then precompute the race."""
+    async with locked(("races", race_id)):
+        race = await load_race(race_id)
+        if not race or race.status != "open":
+            return
+
+        locked_entries = []
+        for entry in race.entries:
+            player = await load_player(entry.player_id)
+            if player:
+                locked_entries.append(
+                    entry.model_copy(update={"locked_car": player.car})
+                )
+            else:
+                locked_entries.append(entry)
+
+        race = race.model_copy(update={"status": "locked", "entries": locked_entries})
+        await save_race(race)
     log.info("Locked entries for race %s (%d entrants)", race_id, len(locked_entries))
 
+    race = await _fill_grid(race)
+    await _prepare_replay(race)
+
 
 async def run_race_job(race_id: str) -> None:
-    """Simulate race, broadcast ticks, save results, apply wear and rewards."""
+    """Broadcast the precomputed race, save results, apply wear and rewards.
+
+    A race left "running" by a process that died mid-broadcast is picked up
+    where the clock says it should be (see resume_interrupted_races).
+    """
     race = await load_race(race_id)
     if not race:
         log.warning("run_race_job: race %s not found", race_id)
         return
-    if race.status not in ("open", "locked"):
+    if race.status not in ("open", "locked", "running"):
         return  # already ran or cancelled
 
     # Lock any remaining open entries (in case lock job didn't fire)
@@ -99,48 +161,70 @@ async def run_race_job(race_id: str) -> None:
         await lock_race_entries(race_id)
         race = await load_race(race_id)
 
-    # Fill grid with bot entries
-    from backend.bots import generate_bot_entries
-    bot_entries = generate_bot_entries(race_id, len(race.entries))
-    if bot_entries:
-        race = race.model_copy(update={"entries": race.entries + bot_entries})
-        await save_race(race)
+    # Normally written at lock time; simulate now if that didn't happen
+    # (lock job missed, file lost, or the grid changed since)
+    replay = _open_replay(race)
+    if replay is None:
+        race = await _fill_grid(race)
+        await _prepare_replay(race)
+        replay = _open_replay(race)
+    if replay is None:
+        # Removed by another process meanwhile, or the grid changed again. A race
+        # that was already running is retried by resume_interrupted_races.
+        log.error("run_race_job: no replay for race %s, not starting it", race_id)
+        return
 
-    race = race.model_copy(update={"status": "running"})
-    await save_race(race)
+    # Held until the replay is closed, so a race is only ever broadcast by one
+    # process, and a dead runner's race can be taken over
+    if not replay.claim():
+        replay.close()
+        return  # being broadcast right now
+    async with locked(("races", race_id)):
+        current = await load_race(race_id)
+        if current is None or current.status not in ("locked", "running"):
+            replay.close()
+            return  # finished by another process meanwhile, or deleted
+        first_tick = 1
+        if current.status == "running":
+            first_tick = _resume_tick(current, replay)
+            log.warning("Resuming interrupted race %s at tick %d of %d", race_id, first_tick, replay.n_ticks)
+        else:
+            race = race.model_copy(update={"status": "running"})
+            await save_race(race)
     await broadcaster.broadcast(race_id, {"type": "status", "status": "running"})
 
-    # Simulate
-    results = simulate_race(race)
-    tick_stream = generate_tick_stream(results, lap_count=race.lap_count, track=race.track)
+    # Broadcast ticks straight from the memory-mapped replay, paced by the shared clock
+    with replay:
+        await race_clock.run(race_id, ({"type": "tick", **tick_msg} for tick_msg in replay.ticks(first_tick)))
+        results = replay.results
 
-    # Broadcast ticks (generator — streamed directly, constant memory)
-    interval = RACE_TICK_INTERVAL_MS / 1000.0
-    for tick_msg in tick_stream:
-        await broadcaster.broadcast(race_id, {"type": "tick", **tick_msg})
-        await asyncio.sleep(interval)
+        # Save the finished race while the claim still keeps other runners out
+        async with locked(("races", race_id)):
+            current = await load_race(race_id)
+            if current is None or current.status != "running":
+                log.warning("run_race_job: race %s was deleted or changed during the broadcast", race_id)
+                return
+            race = current.model_copy(update={"status": "finished", "results": results})
+            await save_race(race)
 
     # Broadcast final results
     results_payload = [r.model_dump() for r in results]
     await broadcaster.broadcast(race_id, {"type": "finished", "results": results_payload})
 
-    # Save finished race
-    race = race.model_copy(update={"status": "finished", "results": results})
-    await save_race(race)
-
     # Apply rewards + wear to each entrant
     for result in results:
-        player = await load_player(result.player_id)
-        if not player:
-            continue
-        reward = FINISH_REWARDS.get(result.position, DEFAULT_REWARD)
-        new_car = apply_wear(player.car, race.event_type)
-        player = player.model_copy(update={
-            "credits": player.credits + reward,
-            "races_entered": player.races_entered + 1,
-            "car": new_car,
-        })
-        await save_player(player)
+        async with locked(("players", result.player_id)):
+            player = await load_player(result.player_id)
+            if not player:
+                continue
+            reward = FINISH_REWARDS.get(result.position, DEFAULT_REWARD)
+            new_car = apply_wear(player.car, race.event_type)
+            player = player.model_copy(update={
+                "credits": player.credits + reward,
+                "races_entered": player.races_entered + 1,
+                "car": new_car,
+            })
+            await save_player(player)
 
     log.info("Race %s finished — %d results saved", race_id, len(results))
 
@@ -149,9 +233,54 @@ async def run_race_job(race_id: str) -> None:
         await register_next_n_races(_scheduler, RACE_WINDOW)
 
 
+async def archive_old_races() -> int:
+    """Pack finished races older than RACE_ARCHIVE_AFTER_HOURS into day archives."""
+    from backend.storage import archive_finished_races
+    if RACE_ARCHIVE_AFTER_HOURS <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=RACE_ARCHIVE_AFTER_HOURS)
+    archived = await archive_finished_races(_iso(cutoff))
+    if archived:
+        log.info("Archived %d finished races scheduled before %s", archived, _iso(cutoff))
+    return archived
+
+
+async def prune_old_replays() -> int:
+    """Delete the replay files of races finished more than REPLAY_RETENTION_HOURS ago."""
+    if REPLAY_RETENTION_HOURS <= 0:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=REPLAY_RETENTION_HOURS)
+    # A replay is written before its race starts, so only files this old can qualify
+    candidates = await asyncio.to_thread(replays_written_before, cutoff.timestamp())
+    pruned = 0
+    for race_id in candidates:
+        race = await load_race(race_id)
+        if race is not None and (race.status != "finished" or race.scheduled_time >= _iso(cutoff)):
+            continue  # still running, or finished too recently
+        await asyncio.to_thread(delete_replay, race_id)
+        pruned += 1
+    if pruned:
+        log.info("Pruned %d replays of races scheduled before %s", pruned, _iso(cutoff))
+    return pruned
+
+
+async def resume_interrupted_races() -> None:
+    """Restart the broadcast of races left "running" by a process that died.
+
+    Runs when this process becomes the scheduler leader and every
+    RESUME_CHECK_SECONDS after; run_race_job skips races whose replay is
+    still claimed by a live process.
+    """
+    from backend.storage import list_race_summaries
+    for summary in await list_race_summaries():
+        if summary.status == "running":
+            asyncio.create_task(run_race_job(summary.id))
+
+
 # ── Rolling window scheduler ─────────────────────────────────────────────────
 
 RACE_WINDOW = 30  # keep this many upcoming races registered at all times
+RESUME_CHECK_SECONDS = 30  # how often the leader looks for races whose runner died
 
 _scheduler: AsyncIOScheduler | None = None
 
@@ -162,16 +291,19 @@ def _parse_slot_time(slot_time: str, base_date: datetime) -> datetime:
     return base_date.replace(hour=h, minute=m, second=0, microsecond=0, tzinfo=timezone.utc)
 
 
-async def register_next_n_races(scheduler: AsyncIOScheduler, n: int = RACE_WINDOW) -> int:
+async def register_next_n_races(scheduler: AsyncIOScheduler | None, n: int = RACE_WINDOW) -> int:
     """Ensure the next `n` future races exist and have APScheduler jobs.
 
+    Without a scheduler (a standby process, see scheduler/leader.py) only the
+    races are created; the leader's jobs find them by id.
+
     Walks forward from the current UTC time through the repeating 144-slot
     daily schedule, crossing day boundaries as needed.  Idempotent — safe to
     call after every race or on startup.
 
     Returns the number of *new* races created.
     """
-    from backend.storage import race_path
+    from backend.storage import race_exists
 
     schedule = json.loads(SCHEDULE_FILE.read_text())
     slots = schedule["slots"]
@@ -209,14 +341,14 @@ async def register_next_n_races(scheduler: AsyncIOScheduler, n: int = RACE_WINDO
         lap_count = slot.get("lap_count", RACE_LAP_COUNT_DEFAULT)
         grid_size = slot.get("grid_size", TRACK_GRID_SIZE)
 
-        is_new = not race_path(race_id).exists()
+        is_new = not race_exists(race_id)
         await ensure_race_exists(race_id, slot_dt, event_type, lap_count=lap_count, grid_size=grid_size)
         if is_new:
             created += 1
 
         # Schedule APScheduler jobs (idempotent via replace_existing)
         lock_dt = slot_dt - timedelta(minutes=10)
-        if lock_dt > now:
+        if scheduler is not None and lock_dt > now:
             scheduler.add_job(
                 lock_race_entries,
                 "date",
@@ -225,7 +357,7 @@ async def register_next_n_races(scheduler: AsyncIOScheduler, n: int = RACE_WINDO
                 id=f"lock_{race_id}",
                 replace_existing=True,
             )
-        if slot_dt > now:
+        if scheduler is not None and slot_dt > now:
             scheduler.add_job(
                 run_race_job,
                 "date",
@@ -242,12 +374,16 @@ async def register_next_n_races(scheduler: AsyncIOScheduler, n: int = RACE_WINDO
     return created
 
 
-async def reset_schedule(scheduler: AsyncIOScheduler) -> int:
-    """Admin action: wipe all races and create a fresh batch of RACE_WINDOW races."""
+async def reset_schedule(scheduler: AsyncIOScheduler | None) -> int:
+    """Admin action: wipe all races and create a fresh batch of RACE_WINDOW races.
+
+    On a standby process (no scheduler) the leader keeps its jobs; the fresh
+    races reuse the slot-based ids they point at.
+    """
     from backend.storage import delete_all_races
 
     # Remove all APScheduler race jobs
-    for job in scheduler.get_jobs():
+    for job in scheduler.get_jobs() if scheduler is not None else []:
         if job.id.startswith("lock_") or job.id.startswith("run_"):
             job.remove()
 
@@ -260,12 +396,42 @@ async def reset_schedule(scheduler: AsyncIOScheduler) -> int:
 
 
 async def setup_scheduler() -> AsyncIOScheduler:
-    """Initialise and start the scheduler; register the next RACE_WINDOW races."""
+    """Initialise and start the scheduler; register the next RACE_WINDOW races.
+
+    Called in the scheduler leader only (see scheduler/leader.py).
+    """
     global _scheduler
     scheduler = AsyncIOScheduler(timezone="UTC")
     _scheduler = scheduler
 
     await register_next_n_races(scheduler, RACE_WINDOW)
 
+    if RACE_ARCHIVE_AFTER_HOURS > 0:
+        scheduler.add_job(
+            archive_old_races,
+            "cron",
+            minute=5,
+            id="archive_races",
+            replace_existing=True,
+        )
+
+    if REPLAY_RETENTION_HOURS > 0:
+        scheduler.add_job(
+            prune_old_replays,
+            "cron",
+            minute=15,
+            id="prune_replays",
+            replace_existing=True,
+        )
+
+    scheduler.add_job(
+        resume_interrupted_races,
+        "interval",
+        seconds=RESUME_CHECK_SECONDS,
+        next_run_time=datetime.now(timezone.utc),
+        id="resume_races",
+        replace_existing=True,
+    )
+
     scheduler.start()
     return scheduler
@@ -0,0 +1,163 @@
+"""
+Scheduler leader election.
+
+Several server processes may share one DATA_DIR (STORAGE_MULTI_PROCESS). Only
+one of them — the leader — runs APScheduler, and with it race locking,
+simulation, broadcasting and payouts; the others serve HTTP and WebSockets
+only.
+
+The leader holds an exclusive flock on SCHEDULER_LEADER_LOCK. The kernel
+drops the lock as soon as the leader process exits, however it dies, and the
+first standby to retry (every SCHEDULER_LEADER_POLL_SECONDS) takes over. While
+it leads, a process rewrites the file with its pid and a timestamp on every
+poll — the heartbeat — so anyone can see who leads and whether its event loop
+is still turning.
+
+A leader that is alive but hung keeps the flock, so a standby that finds the
+heartbeat older than SCHEDULER_LEADER_STALE_SECONDS kills it (SIGKILL: a stuck
+loop can't run a graceful shutdown). The kernel then drops the lock and the
+next poll elects a new leader. All processes share one host — flock and the
+broadcast hub's Unix socket already require that — so the pid is meaningful.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from backend.config import SCHEDULER_LEADER_LOCK, SCHEDULER_LEADER_POLL_SECONDS, SCHEDULER_LEADER_STALE_SECONDS
+
+log = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(
+        self,
+        on_elected: Callable[[], Awaitable[None]],
+        path: Path = SCHEDULER_LEADER_LOCK,
+        poll_seconds: float = SCHEDULER_LEADER_POLL_SECONDS,
+        stale_seconds: float = SCHEDULER_LEADER_STALE_SECONDS,
+    ):
+        self._on_elected = on_elected
+        self._path = path
+        self._poll = poll_seconds
+        self._stale = stale_seconds
+        self._fd: int | None = None
+        self._task: asyncio.Task | None = None
+        self.elections = 0  # times this process became leader
+        self.takeovers = 0  # hung leaders this process killed
+        self._suspect: tuple[int, float] | None = None  # (pid, heartbeat) last seen stale
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    async def start(self) -> None:
+        """Try once right away, so a lone process leads before startup finishes."""
+        await self._try_lead()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop campaigning and hand leadership on (call after the scheduler is shut down)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._fd is not None:
+            os.close(self._fd)  # releases the flock; a standby takes over on its next poll
+            self._fd = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll)
+            if self.is_leader:
+                self._heartbeat()
+            else:
+                await self._try_lead()
+                if not self.is_leader:
+                    self._fence_hung_leader()
+
+    async def _try_lead(self) -> None:
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return
+        self._fd = fd
+        self.elections += 1
+        self._heartbeat()
+        log.info("Scheduler leader: elected (pid %d)", os.getpid())
+        beating = asyncio.create_task(self._beat())  # starting the scheduler may take a while
+        try:
+            await self._on_elected()
+        except Exception:
+            log.exception("Scheduler leader: could not start the scheduler; standing down")
+            os.close(fd)  # let another process try
+            self._fd = None
+        finally:
+            beating.cancel()
+
+    async def _beat(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll)
+            self._heartbeat()
+
+    def _heartbeat(self) -> None:
+        # Rewritten in place: replacing the file would leave the flock on the old inode
+        data = json.dumps({"pid": os.getpid(), "heartbeat": time.time()}).encode()
+        os.ftruncate(self._fd, 0)
+        os.pwrite(self._fd, data, 0)
+
+    def _fence_hung_leader(self) -> None:
+        current = self._read()
+        pid, heartbeat = current.get("pid"), current.get("heartbeat")
+        if not pid or not heartbeat or pid == os.getpid():
+            return
+        age = time.time() - heartbeat
+        if age <= self._stale:
+            self._suspect = None
+            return
+        if self._suspect != (pid, heartbeat):
+            # Seen stale once. A leader elected a moment ago may not have written
+            # its first heartbeat yet (the file still names its dead predecessor,
+            # whose pid may be reused), so only act if nothing changes by next poll
+            self._suspect = (pid, heartbeat)
+            return
+        self._suspect = None
+        log.error("Scheduler leader: pid %d missed its heartbeat for %.0fs; killing it to take over", pid, age)
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            return  # gone already; the lock is free on the next poll
+        except PermissionError:
+            log.error("Scheduler leader: not allowed to kill pid %d", pid)
+            return
+        self.takeovers += 1
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self._path.read_text(encoding="utf-8") or "{}")
+        except (FileNotFoundError, ValueError):
+            return {}  # no leader yet, or caught mid-rewrite
+
+    def stats(self) -> dict:
+        current = self._read()
+        heartbeat = current.get("heartbeat")
+        return {
+            "role": "leader" if self.is_leader else "standby",
+            "pid": os.getpid(),
+            "leader_pid": current.get("pid"),
+            "heartbeat_age_s": round(time.time() - heartbeat, 1) if heartbeat else None,
+            "elections": self.elections,
+            "takeovers": self.takeovers,
+        }
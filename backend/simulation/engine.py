@@ -7,9 +7,12 @@ All randomness is seeded from the race ID so the result is deterministic per rac
 from __future__ import annotations
 
 import hashlib
+import importlib.util
 import math
 import random
-from typing import Iterator, Optional
+from functools import lru_cache
+from itertools import accumulate
+from typing import Iterator, NamedTuple, Optional
 
 from backend.config import (
     SLOT_NAMES,
@@ -28,9 +31,11 @@ from backend.config import (
     BRAKE_FPS2,
     MPH_TO_FPS,
     RACE_TICK_INTERVAL_MS,
+    SIM_ENGINE,
     TRAILING_GRACE_TICKS,
 )
 from backend.models import CarSlots, EntryResult, Race, RaceEntry, SlotPart, SlotResult, TrackData
+from backend.track_codec import tile_shapes
 
 # ── Luck narrative tags ────────────────────────────────────────────────────────
 _LUCK_TAGS_POSITIVE = [
@@ -213,88 +218,159 @@ def simulate_race(race: Race) -> list[EntryResult]:
 # ── Speed profile generation ──────────────────────────────────────────────────
 
 def build_speed_profile(track: TrackData) -> list[float]:
-    """Build per-tile max safe speed (ft/s) via iterative constraint passes.
+    """Per-tile max safe speed (ft/s) around the loop.
 
-    1. Raw target: straight → TOP_SPEED_FPS, curve → CORNER_SPEED_FPS,
-       chicane → CHICANE_SPEED_FPS
-    2. Backward pass: braking constraint
-    3. Forward pass: acceleration constraint
-    4. Iterate until stable (cap at 10 passes)
+    Raw target: straight → TOP_SPEED_FPS, curve → CORNER_SPEED_FPS,
+    chicane → CHICANE_SPEED_FPS; then every tile is capped so a car can brake
+    down to whatever lies ahead and accelerate up from whatever lies behind.
+    Memoized per layout — the profile depends only on the direction string.
     """
-    # Map (x, y) → tile type for O(1) lookup
-    tile_type_by_pos: dict[tuple[int, int], str] = {}
-    for tile in track.tiles:
-        tile_type_by_pos[(tile.x, tile.y)] = tile.type
-
-    n = len(track.path_order)
-    speed = [0.0] * n
-
-    # 1. Raw target per tile
-    for i, pos in enumerate(track.path_order):
-        tt = tile_type_by_pos.get((pos[0], pos[1]), "straight")
-        if tt == "chicane":
-            speed[i] = CHICANE_SPEED_FPS
-        elif tt == "curve":
-            speed[i] = CORNER_SPEED_FPS
-        else:
-            speed[i] = TOP_SPEED_FPS
-
-    # 2-4. Iterative constraint passes (closed loop)
-    for _ in range(10):
-        changed = False
-
-        # Backward pass: braking constraint
-        for i in range(n):
-            nxt = (i + 1) % n
-            limit = math.sqrt(speed[nxt] ** 2 + 2.0 * BRAKE_FPS2 * TILE_FEET)
-            if speed[i] > limit + 0.01:
-                speed[i] = limit
-                changed = True
-
-        # Forward pass: acceleration constraint
-        for i in range(n):
-            prev = (i - 1) % n
-            limit = math.sqrt(speed[prev] ** 2 + 2.0 * ACCEL_FPS2 * TILE_FEET)
-            if speed[i] > limit + 0.01:
-                speed[i] = limit
-                changed = True
-
-        if not changed:
-            break
+    return list(_speed_profile(track.directions))
+
+
+_RAW_SPEED_FPS = {"chicane": CHICANE_SPEED_FPS, "curve": CORNER_SPEED_FPS}
+_BRAKE_SQ_PER_TILE = 2.0 * BRAKE_FPS2 * TILE_FEET  # v² shed braking over one tile
+_ACCEL_SQ_PER_TILE = 2.0 * ACCEL_FPS2 * TILE_FEET  # v² gained accelerating over one tile
+
+# Above this many tiles the NumPy sweeps win (python -m benchmarks.speed_profile)
+_NUMPY_PROFILE_MIN_TILES = 64
+
+
+@lru_cache(maxsize=256)
+def _speed_profile(directions: str) -> tuple[float, ...]:
+    raw = [_RAW_SPEED_FPS.get(t_type, TOP_SPEED_FPS) for t_type, _ in tile_shapes(directions)]
+    if len(raw) >= _NUMPY_PROFILE_MIN_TILES and importlib.util.find_spec("numpy") is not None:
+        return tuple(_constrain_profile_numpy(raw))
+    return tuple(_constrain_profile(raw))
+
+
+def _constrain_profile(raw: list[float]) -> list[float]:
+    """Exact braking/acceleration caps for a closed loop, in two sweeps.
+
+    In v² both constraints are additive — v[i]² ≤ v[i+1]² + brake and
+    v[i]² ≤ v[i-1]² + accel — so the cap on tile i is the cheapest
+    raw[j]² + cost(i→j) over all tiles j. The slowest tile is never capped,
+    and no cheapest route needs to pass it, so cutting the loop open there
+    turns both directions into one running minimum each:
+      braking:      min over j ≥ i of (raw[j]² + brake·j) − brake·i
+      acceleration: min over j ≤ i of (raw[j]² − accel·j) + accel·i
+    The same arithmetic as _constrain_profile_numpy, so both give identical floats.
+    """
+    n = len(raw)
+    m = min(range(n), key=raw.__getitem__)
+    sq = [v * v for v in raw[m:] + raw[:m]]
+    sq.append(sq[0])  # the slowest tile again, closing the loop behind the last one
+    suffix = list(accumulate(
+        (x + _BRAKE_SQ_PER_TILE * j for j, x in reversed(list(enumerate(sq)))), min,
+    ))[::-1]
+    prefix = list(accumulate((x - _ACCEL_SQ_PER_TILE * j for j, x in enumerate(sq)), min))
+    capped = [
+        math.sqrt(min(suffix[j] - _BRAKE_SQ_PER_TILE * j, prefix[j] + _ACCEL_SQ_PER_TILE * j))
+        for j in range(n)
+    ]
+    return capped[n - m:] + capped[:n - m]  # back to path order
 
-    return speed
+
+def _constrain_profile_numpy(raw: list[float]) -> list[float]:
+    """_constrain_profile with the running minima as array scans."""
+    import numpy as np
+    n = len(raw)
+    m = int(np.argmin(raw))
+    sq = np.square(np.roll(np.array(raw, dtype=np.float64), -m))
+    sq = np.append(sq, sq[0])
+    j = np.arange(n + 1, dtype=np.float64)
+    suffix = np.minimum.accumulate((sq + _BRAKE_SQ_PER_TILE * j)[::-1])[::-1]
+    prefix = np.minimum.accumulate(sq - _ACCEL_SQ_PER_TILE * j)
+    capped = np.sqrt(np.minimum(suffix - _BRAKE_SQ_PER_TILE * j, prefix + _ACCEL_SQ_PER_TILE * j))[:n]
+    return np.roll(capped, m).tolist()
 
 
 # ── Tick stream generation ─────────────────────────────────────────────────────
 
+class _StreamSetup(NamedTuple):
+    profile: list[float]          # max safe speed per tile (ft/s)
+    n_tiles: int
+    total_distance: float         # feet, lap_count × track length
+    factors: list[float]          # per-car speed multiplier (0.3–1.0)
+    dnf_stops: list[float | None] # per-car progress at which a DNF car stops
+
+
+def _dnf_stop(player_id: str) -> float:
+    """Progress at which a DNF car stops — from a stable digest, not hash(), which
+    differs per process (PYTHONHASHSEED) and would change with every worker."""
+    seed = int(hashlib.sha256(player_id.encode()).hexdigest(), 16) % (2**32)
+    return random.Random(seed).uniform(0.3, 0.7)
+
+
+def _stream_setup(results: list[EntryResult], lap_count: int, track: TrackData | None) -> _StreamSetup:
+    """Inputs shared by every tick-stream engine, so they all start identically."""
+    # Build speed profile from track (or use flat top speed as fallback)
+    if track and track.directions:
+        profile = build_speed_profile(track)
+        n_tiles = len(track.directions)
+    else:
+        profile = [TOP_SPEED_FPS]
+        n_tiles = 1
+
+    total_distance = TILE_FEET * n_tiles * lap_count  # total race distance in feet
+
+    max_score = max(r.result_score for r in results) or 1.0
+    factors = [max(0.3, r.result_score / max_score) for r in results]
+    dnf_stops = [_dnf_stop(r.player_id) if r.dnf else None for r in results]
+    return _StreamSetup(profile, n_tiles, total_distance, factors, dnf_stops)
+
+
 def generate_tick_stream(
     results: list[EntryResult],
     lap_count: int = 25,
     track: TrackData | None = None,
+    engine: str = SIM_ENGINE,
 ) -> Iterator[dict]:
-    """Yield tick snapshots with physics-based car movement.
+    """Stream tick snapshots with physics-based car movement.
 
     Each tick: {tick, lap_count, cars: [{car_id, username, progress, speed, incident}]}
     Progress: 0.0 → 1.0 over the full race distance (lap_count × track length).
     Cars accelerate/brake per the speed profile; slower cars have a lower top speed.
     DNF cars stop at a random point (0.3–0.7 progress).
+
+    ``engine`` picks the implementation (SIM_ENGINE): "python" is the
+    reference below, "numpy" steps the whole field per tick with arrays
+    (backend/simulation/engine_numpy.py) and yields identical ticks, and
+    "auto" uses NumPy for fields large enough to repay its per-tick overhead
+    when it is installed.
     """
-    if not results:
-        return
+    if _use_numpy(engine, len(results)):
+        from backend.simulation.engine_numpy import generate_tick_stream_numpy
+        return generate_tick_stream_numpy(results, lap_count, track)
+    return _generate_tick_stream_python(results, lap_count, track)
 
-    dt = RACE_TICK_INTERVAL_MS / 1000.0  # seconds per tick
 
-    # Build speed profile from track (or use flat top speed as fallback)
-    if track and track.path_order:
-        profile = build_speed_profile(track)
-        n_tiles = len(track.path_order)
-    else:
-        profile = [TOP_SPEED_FPS]
-        n_tiles = 1
+# Below this many cars the reference loop beats NumPy's fixed per-tick cost
+# (python -m benchmarks.tick_engines)
+_NUMPY_MIN_CARS = 24
 
-    total_distance = TILE_FEET * n_tiles * lap_count  # total race distance in feet
 
-    max_score = max(r.result_score for r in results) or 1.0
+def _use_numpy(engine: str, n_cars: int) -> bool:
+    if engine == "python":
+        return False
+    if engine == "numpy":
+        return True
+    if engine == "auto":
+        return n_cars >= _NUMPY_MIN_CARS and importlib.util.find_spec("numpy") is not None
+    raise ValueError(f"Unknown SIM_ENGINE: {engine!r} (expected 'auto', 'python' or 'numpy')")
+
+
+def _generate_tick_stream_python(
+    results: list[EntryResult],
+    lap_count: int,
+    track: TrackData | None,
+) -> Iterator[dict]:
+    """Reference engine: one Python step per car per tick."""
+    if not results:
+        return
+
+    dt = RACE_TICK_INTERVAL_MS / 1000.0  # seconds per tick
+    profile, n_tiles, total_distance, factors, dnf_stops = _stream_setup(results, lap_count, track)
 
     # Per-car state
     car_pos: dict[str, float] = {}       # feet travelled
@@ -304,15 +380,14 @@ def generate_tick_stream(
     dnf_stop: dict[str, float] = {}      # progress at which DNF car stops
     dnf_fired: dict[str, bool] = {}      # whether dnf_start incident was emitted
 
-    for r in results:
+    for r, factor, stop in zip(results, factors, dnf_stops):
         pid = r.player_id
         car_pos[pid] = 0.0
         car_vel[pid] = 0.0
         car_finished[pid] = None
-        car_factor[pid] = max(0.3, r.result_score / max_score)
+        car_factor[pid] = factor
         if r.dnf:
-            rng = random.Random(hash(pid))
-            dnf_stop[pid] = rng.uniform(0.3, 0.7)
+            dnf_stop[pid] = stop
             dnf_fired[pid] = False
 
     leader_finished_tick: int | None = None
@@ -0,0 +1,256 @@
+"""
+Segment-based lap-time solver — the tick stream's physics without the ticks.
+
+While a car is on one tile its target speed is constant, so the per-tick
+update in generate_tick_stream (velocity steps toward the target by a fixed
+amount, then position += velocity × dt) has a closed form: velocity is a
+clamped arithmetic sequence and distance its partial sum. solve_car() uses
+that to jump from tile to tile, working out in O(1) on which tick the car
+leaves each one — O(tiles) per lap instead of one step per tick.
+
+The resulting CarSolution answers, without replaying anything:
+  - finish_tick / stop_tick       when the car crosses the line (or its DNF stop)
+  - lap_ticks, lap_times          per-lap crossings; times are interpolated within
+                                  the crossing tick, for gaps finer than one tick
+  - state_at(tick)                position and velocity after any tick (binary search)
+
+RaceSolution does the same for a whole field and builds the tick message
+generate_tick_stream would have sent at any tick (snapshot()). Sums are formed
+in closed form rather than accumulated tick by tick, so positions can differ
+from the stream in the last few bits; rounded to the message's precision
+they match (python -m benchmarks.lap_solver checks this).
+"""
+from __future__ import annotations
+
+import bisect
+import math
+from typing import NamedTuple
+
+from backend.config import (
+    ACCEL_FPS2, BRAKE_FPS2, MPH_TO_FPS, RACE_TICK_INTERVAL_MS, TILE_FEET, TRAILING_GRACE_TICKS,
+)
+from backend.models import EntryResult, TrackData
+from backend.simulation.engine import _stream_setup
+
+_DT = RACE_TICK_INTERVAL_MS / 1000.0  # seconds per tick
+_MAX_TICKS = 200_000                   # same safety cap as the tick stream
+
+
+class _Segment(NamedTuple):
+    """A run of ticks on one tile: constant target, velocity ramping toward it."""
+    tick: int      # ticks elapsed before the segment starts
+    pos: float     # feet travelled at that point
+    vel: float     # ft/s at that point
+    target: float  # ft/s the car is steering toward on this tile
+    step: float    # velocity change per tick while ramping (+accel or −brake)
+    ramp: int      # ticks until velocity reaches the target
+
+
+def _ramp_sum(seg: _Segment, r: int) -> float:
+    """Velocity summed over the first r ramping ticks (vel + step·i for i = 1..r)."""
+    return r * seg.vel + seg.step * r * (r + 1) / 2.0
+
+
+def _distance(seg: _Segment, k: int) -> float:
+    """Feet travelled in the first k ticks of a segment."""
+    r = max(0, min(k, seg.ramp - 1))  # ticks spent below the target; the rest are at it
+    return (_ramp_sum(seg, r) + (k - r) * seg.target) * _DT
+
+
+def _velocity(seg: _Segment, k: int) -> float:
+    return seg.target if k >= seg.ramp else seg.vel + seg.step * k
+
+
+def _ticks_to_cover(seg: _Segment, feet: float) -> int:
+    """Smallest k ≥ 1 with _distance(seg, k) ≥ feet."""
+    need = feet / _DT  # in velocity-ticks
+    r = max(0, seg.ramp - 1)
+    ramp_sum = _ramp_sum(seg, r)
+    if r and ramp_sum >= need:
+        # Covered while ramping: step/2·k² + (vel + step/2)·k = need. For either
+        # sign of step this root is the first crossing (the rising side)
+        a, b = seg.step / 2.0, seg.vel + seg.step / 2.0
+        k = (-b + math.sqrt(max(0.0, b * b + 4.0 * a * need))) / (2.0 * a)
+    else:
+        k = r + (need - ramp_sum) / seg.target
+    # The estimate is within a tick; settle it against the exact sum
+    k = max(1, math.ceil(k - 1e-9))
+    while k > 1 and _distance(seg, k - 1) >= feet:
+        k -= 1
+    while _distance(seg, k) < feet:
+        k += 1
+    return k
+
+
+def _start_segment(tick: int, pos: float, vel: float, target: float) -> _Segment:
+    if vel < target:
+        step = ACCEL_FPS2 * _DT
+        ramp = math.ceil((target - vel) / step)
+    elif vel > target:
+        step = -BRAKE_FPS2 * _DT
+        ramp = math.ceil((vel - target) / -step)
+    else:
+        step, ramp = 0.0, 0
+    return _Segment(tick, pos, vel, target, step, ramp)
+
+
+class CarSolution:
+    """One car's solved trajectory; see the module docstring."""
+
+    def __init__(
+        self, segments: list[_Segment], seg_ends: list[int], total_distance: float,
+        finish_tick: int | None, stop_tick: int | None, lap_ticks: list[int], lap_crossings: list[float],
+    ):
+        self._segments = segments
+        self._seg_ends = seg_ends      # tick each segment ends on (inclusive)
+        self._starts = [s.tick for s in segments]
+        self.total_distance = total_distance
+        self.finish_tick = finish_tick  # tick the car crossed the line (None: DNF / cap)
+        self.stop_tick = stop_tick      # tick a DNF car stopped (None otherwise)
+        self.lap_ticks = lap_ticks          # tick each completed lap was crossed on
+        self.lap_crossings = lap_crossings  # seconds from the start to each crossing, sub-tick precise
+
+    @property
+    def lap_times(self) -> list[float]:
+        """Seconds per completed lap."""
+        return [b - a for a, b in zip([0.0] + self.lap_crossings, self.lap_crossings)]
+
+    @property
+    def done_tick(self) -> int:
+        """Last tick the car moved (or the tick it stopped)."""
+        return self.finish_tick or self.stop_tick or self._seg_ends[-1]
+
+    def state_at(self, tick: int) -> tuple[float, float]:
+        """(feet travelled, ft/s) after `tick` ticks, as the tick stream would report them."""
+        if tick <= 0:
+            return 0.0, 0.0
+        if self.stop_tick is not None and tick >= self.stop_tick:
+            pos, _ = self.state_at(self.stop_tick - 1)
+            return pos, 0.0
+        last = self._seg_ends[-1]
+        if tick > last:
+            tick_pos, vel = self.state_at(last)
+            return (self.total_distance if self.finish_tick else tick_pos), vel
+        i = bisect.bisect_left(self._starts, tick) - 1
+        seg = self._segments[i]
+        k = tick - seg.tick
+        pos = seg.pos + _distance(seg, k)
+        if tick == self.finish_tick:
+            pos = self.total_distance
+        return pos, _velocity(seg, k)
+
+
+def solve_car(
+    profile: list[float], factor: float, lap_count: int, dnf_stop: float | None = None,
+) -> CarSolution:
+    """Solve one car over a speed profile (build_speed_profile output).
+
+    ``factor`` is the car's speed multiplier and ``dnf_stop`` the fraction of
+    the race at which a DNF car stops, both as the tick stream derives them.
+    """
+    n_tiles = len(profile)
+    lap_distance = TILE_FEET * n_tiles
+    total_distance = lap_distance * lap_count
+    stop_distance = dnf_stop * total_distance if dnf_stop is not None else math.inf
+
+    segments: list[_Segment] = []
+    seg_ends: list[int] = []
+    lap_ticks: list[int] = []
+    lap_crossings: list[float] = []
+    finish_tick = stop_tick = None
+    tick, pos, vel = 0, 0.0, 0.0
+    tile = 0  # absolute tile count from the start line
+
+    while tick < _MAX_TICKS:
+        if pos >= stop_distance:
+            stop_tick = tick + 1  # a DNF car is frozen on the tick after it passes its stop
+            break
+        seg = _start_segment(tick, pos, vel, profile[tile % n_tiles] * factor)
+        # The car leaves this segment at the tile edge, the line, or its stop point
+        edge = min(TILE_FEET * (tile + 1), total_distance, stop_distance)
+        k = _ticks_to_cover(seg, edge - pos)
+        k = min(k, _MAX_TICKS - tick)
+        new_pos = seg.pos + _distance(seg, k)
+        segments.append(seg)
+        seg_ends.append(tick + k)
+
+        if new_pos >= TILE_FEET * (tile + 1) and (tile + 1) % n_tiles == 0:
+            # Lap line: interpolate when within the crossing tick it was reached
+            before = seg.pos + _distance(seg, k - 1)
+            line = TILE_FEET * (tile + 1)
+            lap_ticks.append(tick + k)
+            lap_crossings.append((tick + k - 1 + (line - before) / (new_pos - before)) * _DT)
+
+        tick, pos, vel = tick + k, new_pos, _velocity(seg, k)
+        if pos >= total_distance:
+            finish_tick = tick
+            break
+        tile = int(pos // TILE_FEET)
+
+    return CarSolution(segments, seg_ends, total_distance, finish_tick, stop_tick, lap_ticks, lap_crossings)
+
+
+class RaceSolution:
+    """Every car of a race solved at once — the tick stream, answerable at any tick."""
+
+    def __init__(self, results: list[EntryResult], lap_count: int, track: TrackData | None = None):
+        self.lap_count = lap_count
+        self.car_ids = [r.player_id for r in results]
+        self.usernames = [r.username for r in results]
+        if results:
+            profile, _, total_distance, factors, dnf_stops = _stream_setup(results, lap_count, track)
+        else:
+            profile, total_distance, factors, dnf_stops = [], 0.0, [], []
+        self.total_distance = total_distance
+        self.cars = [
+            solve_car(profile, factor, lap_count, stop) for factor, stop in zip(factors, dnf_stops)
+        ]
+
+        finishes = [c.finish_tick for c in self.cars if c.finish_tick is not None]
+        self.leader_finish_tick: int | None = min(finishes) if finishes else None
+        # The stream ends once no car moves any more (a finished car is still
+        # "moving" on its finishing tick), or TRAILING_GRACE_TICKS after the leader
+        all_done = max(
+            (c.stop_tick if c.stop_tick is not None else c.done_tick + 1 for c in self.cars), default=0,
+        )
+        if self.leader_finish_tick is not None:
+            all_done = min(all_done, self.leader_finish_tick + TRAILING_GRACE_TICKS)
+        self.n_ticks = min(all_done, _MAX_TICKS)
+
+    def gaps(self, tick: int | None = None) -> list[float | None]:
+        """Seconds behind the leader at the line, per car (None if the car didn't finish).
+
+        Gaps come from the sub-tick lap crossing times, so two cars finishing on
+        the same tick still get distinct gaps. With ``tick``, only laps
+        completed by then count, and each car is compared on its latest lap.
+        """
+        crossings = [
+            c.lap_crossings[: bisect.bisect_right(c.lap_ticks, tick)] if tick is not None else c.lap_crossings
+            for c in self.cars
+        ]
+        gaps: list[float | None] = []
+        for times in crossings:
+            if not times:
+                gaps.append(None)
+                continue
+            lap = len(times)
+            gaps.append(times[-1] - min(t[lap - 1] for t in crossings if len(t) >= lap))
+        return gaps
+
+    def snapshot(self, tick: int) -> dict:
+        """The tick message generate_tick_stream yields for ``tick`` (1..n_ticks)."""
+        cars = []
+        for car_id, username, car in zip(self.car_ids, self.usernames, self.cars):
+            pos, vel = car.state_at(tick)
+            incident = None
+            if car.stop_tick is not None and tick >= car.stop_tick:
+                incident = "dnf_start" if tick == car.stop_tick else "dnf"
+            cars.append({
+                "car_id": car_id,
+                "username": username,
+                "progress": round(min(1.0, pos / self.total_distance), 4),
+                "speed": round(vel / MPH_TO_FPS, 0),
+                "incident": incident,
+            })
+        return {"tick": tick, "lap_count": self.lap_count, "cars": cars}
+
@@ -1,108 +1,1176 @@
-"""JSON file I/O with per-file async locking to prevent concurrent writes."""
+"""Persistence for players and races behind a pluggable backend.
+
+STORAGE_BACKEND selects where entities live: "json" keeps one file per entity
+under data/players/, data/races/ and data/tracks/ (the default); "sqlite" keeps them in a
+single WAL-mode database (see backend/storage_sqlite.py). Everything above the
+backend — cache, write-behind, username index — is shared.
+
+Blocking backend calls and Pydantic (de)serialization run on a bounded thread
+pool so a directory scan never stalls WebSocket fan-out on the event loop.
+
+Two small indexes ride along with the entities: username → player id, and a
+RaceSummary per race so the schedule never has to load full races (tracks,
+locked cars, results).
+
+Finished races past RACE_ARCHIVE_AFTER_HOURS are packed into per-day
+compressed archives under data/archive/ and removed from the live store, so
+scans only ever see the live window; load_race() still finds them. Each
+archived race carries its own track, and stored tracks no live race uses any
+more are deleted with it.
+
+Saves are write-behind: the object is visible to readers immediately, and all
+saves landing within one STORAGE_WRITE_BEHIND_MS window are written together
+in a single batch (one transaction on SQLite). JSON files are replaced via
+temp file + rename, so a crash leaves either the old or the new version on
+disk, never a truncated one.
+
+Validated objects are kept in a bounded write-through cache. Cached objects are
+shared between callers — derive new ones with model_copy(update=...) instead of
+mutating them in place.
+
+Code that reads an entity, changes it and saves it back holds it with locked()
+for the whole cycle. With STORAGE_MULTI_PROCESS several server processes can
+share one DATA_DIR: those locks then span processes, saves are written at once
+instead of write-behind, and a change journal keeps every process's cache and
+indexes in step with the others' writes.
+"""
 from __future__ import annotations
 
 import asyncio
+import errno
+import fcntl
+import hashlib
 import json
 import os
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
 from pathlib import Path
-from typing import TypeVar, Type
+from typing import Any, AsyncIterator, Callable, Iterable, TypeVar, Type
 
 from pydantic import BaseModel
 
-from backend.config import PLAYERS_DIR, RACES_DIR
+from backend.config import (
+    ARCHIVE_DIR, PLAYERS_DIR, RACE_INDEX_FILE, RACES_DIR, REPLAYS_DIR, SQLITE_PATH,
+    STORAGE_BACKEND, STORAGE_CACHE_MAX_ENTRIES, STORAGE_IO_MAX_QUEUE, STORAGE_IO_WORKERS,
+    STORAGE_JOURNAL_FILE, STORAGE_JOURNAL_MAX_BYTES, STORAGE_LOCK_FILE, STORAGE_MULTI_PROCESS,
+    STORAGE_WRITE_BEHIND_MS, TRACKS_DIR, USERNAME_INDEX_FILE,
+)
 
 T = TypeVar("T", bound=BaseModel)
 
-# One asyncio.Lock per file path — created on first access
-_locks: dict[str, asyncio.Lock] = {}
+Key = tuple[str, str]  # (kind, entity id) — kind is "players", "races" or "tracks"
+Stamp = tuple[int, int]
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    """Write via a sibling temp file + rename so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")  # per process: others may write it too
+    with tmp.open("w", encoding="utf-8") as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def _stamp(st: os.stat_result) -> Stamp:
+    return st.st_mtime_ns, st.st_size
+
+
+# ── Backends ──────────────────────────────────────────────────────────────────
+#
+# A backend stores serialized entities by (kind, id). Every method is blocking
+# and is called from the I/O pool, except stamp() and exists(), which must be
+# cheap enough to call on the event loop.
+
+class JsonFileBackend:
+    """One compact JSON file per entity: {dir}/{id}.json."""
+
+    name = "json"
+
+    def __init__(self, dirs: dict[str, Path]) -> None:
+        self.dirs = dirs
+
+    def path(self, kind: str, entity_id: str) -> Path:
+        return self.dirs[kind] / f"{entity_id}.json"
+
+    def setup(self) -> None:
+        for d in self.dirs.values():
+            d.mkdir(parents=True, exist_ok=True)
+
+    def close(self) -> None:
+        pass
+
+    def stamp(self, kind: str, entity_id: str) -> Stamp | None:
+        """(mtime_ns, size) of the file — changes whenever anyone rewrites it."""
+        try:
+            return _stamp(self.path(kind, entity_id).stat())
+        except FileNotFoundError:
+            return None
+
+    def exists(self, kind: str, entity_id: str) -> bool:
+        return self.path(kind, entity_id).exists()
+
+    def read(self, kind: str, entity_id: str) -> tuple[Stamp, str] | None:
+        try:
+            with self.path(kind, entity_id).open(encoding="utf-8") as fh:
+                return _stamp(os.fstat(fh.fileno())), fh.read()
+        except FileNotFoundError:
+            return None
+
+    def write_many(self, items: list[tuple[str, str, BaseModel]]) -> list[Stamp]:
+        stamps = []
+        for kind, entity_id, obj in items:
+            path = self.path(kind, entity_id)
+            _atomic_write_text(path, obj.model_dump_json())
+            stamps.append(_stamp(path.stat()))
+        return stamps
+
+    def delete(self, kind: str, entity_id: str) -> None:
+        self.path(kind, entity_id).unlink(missing_ok=True)
+
+    def list_ids(self, kind: str) -> list[str]:
+        return sorted(f.stem for f in self.dirs[kind].glob("*.json"))
+
+
+class RaceArchive:
+    """Finished races packed per day: {dir}/{YYYY-MM-DD}.pack + .idx.json.
+
+    A pack is a run of independently zlib-compressed race JSON records; the
+    day's index maps race id → [offset, length] so one race can be read with a
+    single seek. Records are only ever appended — the pack is fsynced before
+    the index that points into it is replaced, so a crash leaves at worst some
+    unreferenced bytes at the end of a pack.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.dir = directory
+        self.index: dict[str, tuple[str, int, int]] = {}  # race id → (day, offset, length)
+
+    def _pack_path(self, day: str) -> Path:
+        return self.dir / f"{day}.pack"
+
+    def _index_path(self, day: str) -> Path:
+        return self.dir / f"{day}.idx.json"
+
+    def _read_day_index(self, day: str) -> dict[str, list[int]]:
+        try:
+            return json.loads(self._index_path(day).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return {}
+
+    def load(self) -> int:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index.clear()
+        for path in sorted(self.dir.glob("*.idx.json")):
+            day = path.name.removesuffix(".idx.json")
+            for race_id, (offset, length) in self._read_day_index(day).items():
+                self.index[race_id] = (day, offset, length)
+        return len(self.index)
+
+    def read(self, race_id: str) -> str | None:
+        entry = self.index.get(race_id)
+        if entry is None:
+            return None
+        day, offset, length = entry
+        with self._pack_path(day).open("rb") as fh:
+            fh.seek(offset)
+            return zlib.decompress(fh.read(length)).decode("utf-8")
+
+    def append(self, day: str, races: list[BaseModel]) -> None:
+        index = self._read_day_index(day)
+        with self._pack_path(day).open("ab") as fh:
+            offset = fh.seek(0, os.SEEK_END)
+            for race in races:
+                blob = zlib.compress(race.model_dump_json().encode("utf-8"))
+                fh.write(blob)
+                index[race.id] = [offset, len(blob)]
+                offset += len(blob)
+            fh.flush()
+            os.fsync(fh.fileno())
+        _atomic_write_text(self._index_path(day), json.dumps(index))
+        for race in races:
+            offset, length = index[race.id]
+            self.index[race.id] = (day, offset, length)
+
+
+def _make_backend(name: str):
+    if name == "json":
+        return JsonFileBackend({"players": PLAYERS_DIR, "races": RACES_DIR, "tracks": TRACKS_DIR})
+    if name == "sqlite":
+        from backend.storage_sqlite import SQLiteBackend
+        return SQLiteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name!r} (expected 'json' or 'sqlite')")
+
+
+_backend = _make_backend(STORAGE_BACKEND)
+_archive = RaceArchive(ARCHIVE_DIR)
+
+
+def use_backend(backend) -> None:
+    """Swap the active backend (benchmarks and migration). Drops all cached state."""
+    global _backend, _username_index_loaded, _race_index_loaded
+    if _pending:
+        raise RuntimeError("flush_pending() before switching storage backends")
+    _backend = backend
+    _cache.clear()
+    _username_index.clear()
+    _username_index_loaded = False
+    _race_index.clear()
+    _race_index_loaded = False
+    _player_changed(None)
+
+
+# ── Cache ─────────────────────────────────────────────────────────────────────
+
+class _EntityCache:
+    """LRU of validated models keyed by (kind, id).
+
+    Each entry remembers the backend stamp it was read under (file mtime and
+    size for JSON files); a lookup with a different stamp is a miss, so edits
+    made outside this process are picked up on the next read.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Key, tuple[Stamp, BaseModel]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Key, stamp: Stamp) -> BaseModel | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != stamp:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Key, stamp: Stamp, obj: BaseModel) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (stamp, obj)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key: Key) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache = _EntityCache(STORAGE_CACHE_MAX_ENTRIES)
+
+
+def cache_stats() -> dict:
+    return {"backend": _backend.name, **_cache.stats()}
+
+
+# Called with a player's id whenever it is saved, here or by another process,
+# and with None when any player may have changed. Caches of Player objects
+# kept outside this module (auth's sessions) listen here.
+_player_listeners: list[Callable[[str | None], None]] = []
+
+
+def on_player_change(listener: Callable[[str | None], None]) -> None:
+    _player_listeners.append(listener)
+
+
+def _player_changed(player_id: str | None) -> None:
+    for listener in _player_listeners:
+        listener(player_id)
+
+
+# ── Entity locks ──────────────────────────────────────────────────────────────
+#
+# In-process every entity gets an asyncio.Lock while anyone holds or waits for
+# it. With STORAGE_MULTI_PROCESS each entity also maps to one byte of
+# STORAGE_LOCK_FILE, taken with a non-blocking fcntl.lockf that is retried from
+# the event loop. Record locks belong to the whole process, so a stripe is
+# taken once and counted for every holder here. One locked() call takes all of
+# its locks in sorted order, which is what rules out deadlocks — never nest
+# locked() calls.
+
+_LOCK_STRIPES = 4096
+_JOURNAL_STRIPE = _LOCK_STRIPES  # the byte after the stripes guards journal rotation
+# Held while writing the username and race index files; nothing else is locked under it
+_INDEX_LOCK: Key = ("index", "indexes")
+
+
+class _EntityLocks:
+    def __init__(self, path: Path | None) -> None:
+        self.path = path  # None: in-process locks only
+        self.fd: int | None = None
+        self._keys: dict[Key, list] = {}      # key → [asyncio.Lock, holders + waiters]
+        self._stripes: dict[int, int] = {}    # stripe → holders in this process
+        self.acquired = 0
+        self.contended = 0
+        self.max_wait = 0.0
+
+    def open(self) -> None:
+        if self.path is not None and self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @asynccontextmanager
+    async def hold(self, keys: Iterable[Key]) -> AsyncIterator[None]:
+        keys = sorted(set(keys))
+        stripes = sorted({self._stripe(key) for key in keys}) if self.fd is not None else []
+        held_keys: list[Key] = []
+        held_stripes: list[int] = []
+        t0 = time.perf_counter()
+        try:
+            for key in keys:
+                await self._lock_key(key)
+                held_keys.append(key)
+            for stripe in stripes:
+                await self._lock_stripe(stripe)
+                held_stripes.append(stripe)
+            self.acquired += 1
+            self.max_wait = max(self.max_wait, time.perf_counter() - t0)
+            yield
+        finally:
+            for stripe in held_stripes:
+                self._unlock_stripe(stripe)
+            for key in held_keys:
+                self._unlock_key(key)
+
+    @staticmethod
+    def _stripe(key: Key) -> int:
+        return zlib.crc32(f"{key[0]}/{key[1]}".encode()) % _LOCK_STRIPES
+
+    async def _lock_key(self, key: Key) -> None:
+        entry = self._keys.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        if entry[0].locked():
+            self.contended += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._forget_key(key)
+            raise
+
+    def _unlock_key(self, key: Key) -> None:
+        self._keys[key][0].release()
+        self._forget_key(key)
+
+    def _forget_key(self, key: Key) -> None:
+        entry = self._keys[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._keys[key]
+
+    async def _lock_stripe(self, stripe: int) -> None:
+        delay = 0.001
+        while not self._stripes.get(stripe):  # someone here may have taken it while we slept
+            try:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+                break
+            except OSError as e:
+                if e.errno not in (errno.EACCES, errno.EAGAIN):
+                    raise
+            if delay == 0.001:
+                self.contended += 1
+            await asyncio.sleep(delay)  # held by another process
+            delay = min(delay * 2, 0.02)
+        self._stripes[stripe] = self._stripes.get(stripe, 0) + 1
+
+    def _unlock_stripe(self, stripe: int) -> None:
+        self._stripes[stripe] -= 1
+        if self._stripes[stripe] == 0:
+            del self._stripes[stripe]
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+
+    def stats(self) -> dict:
+        return {
+            "scope": "host" if self.path is not None else "process",
+            "held": len(self._keys),
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+_locks = _EntityLocks(STORAGE_LOCK_FILE if STORAGE_MULTI_PROCESS else None)
+
+
+def locked(*keys: Key) -> AbstractAsyncContextManager[None]:
+    """Hold the given (kind, id) entities across a load → change → save cycle.
+
+    Load them again inside the block: a copy read before it may be stale.
+    Any kind string works as a lock name (register() locks usernames).
+    """
+    return _locks.hold(keys)
+
+
+# ── Change journal ────────────────────────────────────────────────────────────
+#
+# With STORAGE_MULTI_PROCESS every write batch appends one JSON line per entity
+# to STORAGE_JOURNAL_FILE — the race summary or username along with the id —
+# before the writer's locks are released. Each process reads the lines the
+# others appended before every load and listing, and drops or updates its
+# cached copies and indexes to match. Past STORAGE_JOURNAL_MAX_BYTES a writer
+# swaps in a new file that starts with a {"gen": n} line; readers finish the
+# old one through the descriptor they already hold. A process that was idle
+# for more than a whole file sees the generation jump, drops its cache and
+# reloads the indexes instead.
+
+class _Journal:
+    def __init__(self, path: Path, locks: _EntityLocks, max_bytes: int) -> None:
+        self.path = path
+        self._locks = locks
+        self._max_bytes = max_bytes
+        self._wfd: int | None = None
+        self._rfd: int | None = None
+        self._gen = 0
+        self._offset = 0
+        self.resync = False  # set when entries were missed; _sync() reloads everything
+        self.appended = 0
+        self.applied = 0
+        self.rotations = 0
+        self.resyncs = 0
+
+    def open(self) -> None:
+        """Start reading from the current end: everything before it is already on disk."""
+        if self._rfd is None:
+            self._wfd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            self._rfd = os.open(self.path, os.O_RDONLY)
+            self._gen = self._file_gen(self._rfd)
+            self._offset = os.fstat(self._rfd).st_size
+
+    @staticmethod
+    def _file_gen(fd: int) -> int:
+        head = os.pread(fd, 64, 0)
+        return json.loads(head[:head.index(b"\n")])["gen"] if head.startswith(b'{"gen"') else 0
+
+    def append(self, entries: list[dict]) -> None:
+        """Blocking (I/O pool); callers hold _flush_lock, so one append at a time per process."""
+        if not entries or self._wfd is None:
+            return
+        data = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries).encode()
+        fd = self._locks.fd
+        fcntl.lockf(fd, fcntl.LOCK_SH, 1, _JOURNAL_STRIPE)  # no rotation mid-append
+        try:
+            if os.fstat(self._wfd).st_ino != os.stat(self.path).st_ino:  # rotated by another process
+                os.close(self._wfd)
+                self._wfd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.write(self._wfd, data)
+            size = os.fstat(self._wfd).st_size
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, _JOURNAL_STRIPE)
+        self.appended += len(entries)
+        if size > self._max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        fd = self._locks.fd
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, _JOURNAL_STRIPE)
+        except OSError:
+            return  # another process is appending; whoever writes next rotates
+        try:
+            if os.stat(self.path).st_size > self._max_bytes:
+                with self.path.open("rb") as fh:
+                    gen = self._file_gen(fh.fileno()) + 1
+                tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps({"gen": gen}, separators=(",", ":")) + "\n")
+                os.replace(tmp, self.path)
+                self.rotations += 1
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, _JOURNAL_STRIPE)
+
+    def poll(self) -> list[dict]:
+        """Entries other processes appended since the last poll (two stat calls when idle)."""
+        if self._rfd is None:
+            return []
+        try:
+            rotated = os.stat(self.path).st_ino != os.fstat(self._rfd).st_ino
+        except FileNotFoundError:
+            rotated = False
+        entries = self._read_new()
+        if rotated:  # the old file is complete; carry on in the new one
+            os.close(self._rfd)
+            self._rfd = os.open(self.path, os.O_RDONLY)
+            gen = self._file_gen(self._rfd)
+            if gen != self._gen + 1:
+                self.resync = True
+                self.resyncs += 1
+            self._gen = gen
+            self._offset = 0
+            entries += self._read_new()
+        pid = os.getpid()
+        return [e for e in entries if e.get("pid", pid) != pid]  # skips the {"gen": n} line
+
+    def _read_new(self) -> list[dict]:
+        size = os.fstat(self._rfd).st_size
+        if size <= self._offset:
+            return []
+        data = os.pread(self._rfd, size - self._offset, self._offset)
+        end = data.rfind(b"\n") + 1  # a line still being written waits for the next poll
+        self._offset += end
+        return [json.loads(line) for line in data[:end].splitlines()]
+
+    def stats(self) -> dict:
+        return {
+            "generation": self._gen,
+            "appended": self.appended,
+            "applied": self.applied,
+            "rotations": self.rotations,
+            "resyncs": self.resyncs,
+        }
+
+
+_journal = _Journal(STORAGE_JOURNAL_FILE, _locks, STORAGE_JOURNAL_MAX_BYTES) if STORAGE_MULTI_PROCESS else None
+
+
+def _journal_entry(kind: str, entity_id: str, obj: BaseModel | None = None, **fields: Any) -> dict:
+    """What other processes need to bring their cache and indexes up to date."""
+    from backend.models import RaceSummary
+    entry = {"pid": os.getpid(), "kind": kind, "id": entity_id, **fields}
+    if kind == "players" and obj is not None:
+        entry["username"] = obj.username
+    elif kind == "races" and obj is not None:
+        entry["summary"] = RaceSummary.from_race(obj).model_dump()
+    return entry
+
+
+def _sync() -> None:
+    """Apply the other processes' journal entries; a no-op in single-process mode."""
+    if _journal is None:
+        return
+    entries = _journal.poll()
+    if _journal.resync:
+        # Entries went by in a journal file we never read. The index files are
+        # only written under _INDEX_LOCK by a process that was up to date, so
+        # start over from them (blocking, but only after a long idle spell)
+        _journal.resync = False
+        _cache.clear()
+        _player_changed(None)
+        usernames, summaries = _read_username_index(), _read_race_index()
+        if usernames is not None:
+            _username_index.clear()
+            _username_index.update(usernames)
+        if summaries is not None:
+            _race_index.clear()
+            _race_index.update((summary.id, summary) for summary in summaries)
+        _archive.load()
+    if not entries:
+        return
+    from backend.models import RaceSummary
+    for entry in entries:
+        kind, entity_id = entry["kind"], entry["id"]
+        _cache.discard((kind, entity_id))
+        if kind == "players":
+            _player_changed(entity_id)
+            if "username" in entry:
+                _username_index[entry["username"]] = entity_id
+        elif kind == "races":
+            if "summary" in entry:
+                _race_index[entity_id] = RaceSummary.model_validate(entry["summary"])
+            else:  # deleted or archived
+                _race_index.pop(entity_id, None)
+            if "archived" in entry:
+                _archive.index[entity_id] = tuple(entry["archived"])
+    _journal.applied += len(entries)
+
+
+def sync() -> None:
+    """Apply the other processes' writes now (loads and listings do this themselves)."""
+    _sync()
 
 
-def _lock_for(path: Path) -> asyncio.Lock:
-    key = str(path)
-    if key not in _locks:
-        _locks[key] = asyncio.Lock()
-    return _locks[key]
+def lock_stats() -> dict:
+    return {**_locks.stats(), "journal": _journal.stats() if _journal is not None else None}
+
+
+# ── I/O thread pool ───────────────────────────────────────────────────────────
+
+_io_executor = ThreadPoolExecutor(max_workers=STORAGE_IO_WORKERS, thread_name_prefix="storage-io")
+# Bounds jobs handed to the pool (running + queued); further callers wait here
+_io_slots = asyncio.Semaphore(STORAGE_IO_WORKERS + STORAGE_IO_MAX_QUEUE)
+_io_counters = {"waiting": 0, "in_flight": 0, "max_in_flight": 0, "completed": 0}
+_write_counters = {"saves": 0, "writes": 0, "batches": 0}
+
+
+async def _run_io(fn: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking storage function on the I/O pool."""
+    _io_counters["waiting"] += 1
+    async with _io_slots:
+        _io_counters["waiting"] -= 1
+        _io_counters["in_flight"] += 1
+        _io_counters["max_in_flight"] = max(_io_counters["max_in_flight"], _io_counters["in_flight"])
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_io_executor, fn, *args)
+        finally:
+            _io_counters["in_flight"] -= 1
+            _io_counters["completed"] += 1
+
+
+def io_stats() -> dict:
+    return {
+        "workers": STORAGE_IO_WORKERS,
+        "queue_depth": max(0, _io_counters["in_flight"] - STORAGE_IO_WORKERS),
+        **_io_counters,
+        **_write_counters,
+        "coalesced": _write_counters["saves"] - _write_counters["writes"] - len(_pending),
+        "pending_writes": len(_pending),
+    }
 
 
 def ensure_dirs() -> None:
     PLAYERS_DIR.mkdir(parents=True, exist_ok=True)
     RACES_DIR.mkdir(parents=True, exist_ok=True)
+    TRACKS_DIR.mkdir(parents=True, exist_ok=True)
+    REPLAYS_DIR.mkdir(parents=True, exist_ok=True)
+    _backend.setup()
+    _locks.open()
+    if _journal is not None:
+        _journal.open()  # before the indexes load, so no change falls in between
+
+
+def shutdown_storage() -> None:
+    """Write anything still pending, then stop the I/O pool (app shutdown).
+
+    Call after ``await flush_pending()``; this is the synchronous backstop for
+    saves that arrived in between.
+    """
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        _flush_task = None
+    if _pending:
+        _write_batch([(kind, entity_id, obj) for (kind, entity_id), obj in _pending.items()])
+        _write_counters["writes"] += len(_pending)
+        _pending.clear()
+    if _username_index_dirty:
+        _write_username_index(dict(_username_index))
+    if _race_index_dirty:
+        _write_race_index(list(_race_index.values()))
+    _io_executor.shutdown(wait=True)
+    _backend.close()
+
+
+# ── Generic load / save ───────────────────────────────────────────────────────
+
+# Write-behind: newest object per entity not yet persisted, and the shared flush timer
+_pending: dict[Key, BaseModel] = {}
+_flush_task: asyncio.Task | None = None
+_flush_lock = asyncio.Lock()
+# Other processes can't see a pending save, so with several of them every save is written at once
+_WRITE_BEHIND_MS = 0 if STORAGE_MULTI_PROCESS else STORAGE_WRITE_BEHIND_MS
 
 
-# ── Generic helpers ───────────────────────────────────────────────────────────
+def _write_batch(items: list[tuple[str, str, BaseModel]]) -> list[Stamp]:
+    stamps = _backend.write_many(items)
+    if _journal is not None:
+        _journal.append([_journal_entry(kind, entity_id, obj) for kind, entity_id, obj in items if kind != "tracks"])
+    return stamps
 
-async def load_json(path: Path, model: Type[T]) -> T | None:
-    if not path.exists():
+
+def _read_model(kind: str, entity_id: str, model: Type[T]) -> tuple[Stamp, T] | None:
+    loaded = _backend.read(kind, entity_id)
+    if loaded is None:
+        return None
+    stamp, text = loaded
+    return stamp, model.model_validate_json(text)
+
+
+async def _load(kind: str, entity_id: str, model: Type[T]) -> T | None:
+    _sync()
+    key = (kind, entity_id)
+    pending = _pending.get(key)
+    if isinstance(pending, model):
+        return pending
+    # For JSON files stamp() is a stat() served from the dentry cache — cheap
+    # enough to keep on the loop so cache hits never queue behind pool jobs.
+    stamp = _backend.stamp(kind, entity_id)
+    if stamp is None:
+        _cache.discard(key)
+        return None
+    cached = _cache.get(key, stamp)
+    if isinstance(cached, model):
+        return cached
+    loaded = await _run_io(_read_model, kind, entity_id, model)
+    if loaded is None:
         return None
-    async with _lock_for(path):
-        text = path.read_text(encoding="utf-8")
-    return model.model_validate_json(text)
+    stamp, obj = loaded
+    if key not in _pending:  # a save may have landed while we were reading
+        _cache.put(key, stamp, obj)
+    return obj
+
+
+async def _save(kind: str, entity_id: str, obj: BaseModel) -> None:
+    global _flush_task
+    _pending[(kind, entity_id)] = obj
+    _write_counters["saves"] += 1
+    if _WRITE_BEHIND_MS <= 0:
+        await flush_pending()
+    elif _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+async def _flush_later() -> None:
+    await asyncio.sleep(_WRITE_BEHIND_MS / 1000.0)
+    await flush_pending()
+
+
+async def flush_pending() -> int:
+    """Write every pending save now, as one batch. Returns the number written."""
+    global _flush_task, _username_index_dirty, _race_index_dirty
+    task, _flush_task = _flush_task, None  # saves from here on start a fresh window
+    if task is not None and task is not asyncio.current_task():
+        task.cancel()
+    async with _flush_lock:
+        batch = list(_pending.items())
+        if batch:
+            stamps = await _run_io(_write_batch, [(kind, entity_id, obj) for (kind, entity_id), obj in batch])
+            _write_counters["writes"] += len(batch)
+            _write_counters["batches"] += 1
+            for (key, obj), stamp in zip(batch, stamps):
+                # Readers keep getting the pending object until it is persisted
+                if _pending.get(key) is obj:
+                    del _pending[key]
+                    _cache.put(key, stamp, obj)
+        # Indexes go out after the entities they describe
+        if _username_index_dirty or _race_index_dirty:
+            async with _locks.hold([_INDEX_LOCK]):
+                _sync()  # other processes write these files too; include their latest changes
+                if _username_index_dirty:
+                    _username_index_dirty = False
+                    await _run_io(_write_username_index, dict(_username_index))
+                if _race_index_dirty:
+                    _race_index_dirty = False
+                    await _run_io(_write_race_index, list(_race_index.values()))
+    return len(batch)
+
 
+async def _list_ids(kind: str) -> list[str]:
+    """Stored ids of ``kind`` plus entities saved but not yet flushed."""
+    _sync()
+    ids = set(await _run_io(_backend.list_ids, kind))
+    ids.update(entity_id for k, entity_id in _pending if k == kind)
+    return sorted(ids)
 
-async def save_json(path: Path, obj: BaseModel) -> None:
-    async with _lock_for(path):
-        path.write_text(obj.model_dump_json(indent=2), encoding="utf-8")
+
+def _exists(kind: str, entity_id: str) -> bool:
+    return (kind, entity_id) in _pending or _backend.exists(kind, entity_id)
 
 
 # ── Players ───────────────────────────────────────────────────────────────────
 
-def player_path(player_id: str) -> Path:
-    return PLAYERS_DIR / f"{player_id}.json"
+# username → player_id; loaded once by load_username_index(), kept in sync by
+# save_player() and written out with the write-behind batch that follows
+_username_index: dict[str, str] = {}
+_username_index_loaded = False
+_username_index_dirty = False
 
 
 async def load_player(player_id: str):
     from backend.models import Player
-    return await load_json(player_path(player_id), Player)
+    return await _load("players", player_id, Player)
 
 
 async def save_player(player) -> None:
-    await save_json(player_path(player.id), player)
+    global _username_index_dirty
+    if _username_index.get(player.username) != player.id:
+        _username_index[player.username] = player.id
+        _username_index_dirty = True
+    _player_changed(player.id)  # no await before _save() queues the new object
+    await _save("players", player.id, player)
 
 
 async def find_player_by_username(username: str):
-    """Linear scan — fine for prototype scale."""
+    """O(1) lookup through the username index."""
+    if not _username_index_loaded:
+        await load_username_index()
+    _sync()
+    player_id = _username_index.get(username)
+    if player_id is None:
+        return None
+    player = await load_player(player_id)
+    if player is None or player.username != username:
+        return None  # stale index entry (player removed by hand)
+    return player
+
+
+async def list_players() -> list:
     from backend.models import Player
-    for f in PLAYERS_DIR.glob("*.json"):
-        p = await load_json(f, Player)
-        if p and p.username == username:
-            return p
-    return None
+    ids = await _list_ids("players")
+    return [p for p in await asyncio.gather(*(_load("players", i, Player) for i in ids)) if p]
 
 
-# ── Races ─────────────────────────────────────────────────────────────────────
+# ── Username index ────────────────────────────────────────────────────────────
+
+def _write_username_index(index: dict[str, str]) -> None:
+    _atomic_write_text(USERNAME_INDEX_FILE, json.dumps(index))
+
+
+def _read_username_index() -> dict[str, str] | None:
+    try:
+        return json.loads(USERNAME_INDEX_FILE.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+async def load_username_index() -> int:
+    """Load the username index into memory and reconcile it with the stored players.
 
-def race_path(race_id: str) -> Path:
-    return RACES_DIR / f"{race_id}.json"
+    Rebuilt from scratch if the file is missing. Otherwise players stored
+    without an index entry (a crash between a player write and the index
+    write) are loaded and added, and entries for players that no longer exist
+    are dropped. Returns the number of indexed usernames.
+    """
+    global _username_index_loaded, _username_index_dirty
+    from backend.models import Player
+    entries = await _run_io(_read_username_index)
+    if entries is None:
+        return await rebuild_username_index()
+    stored = set(await _list_ids("players"))
+    index = {name: pid for name, pid in entries.items() if pid in stored}
+    indexed = set(index.values()) | set(_username_index.values())
+    missing = [i for i in stored if i not in indexed]
+    for player in await asyncio.gather(*(_load("players", i, Player) for i in missing)):
+        if player:
+            index.setdefault(player.username, player.id)  # never take over a name someone holds
+    index.update(_username_index)  # keeps entries saved since startup
+    _username_index.clear()
+    _username_index.update(index)
+    _username_index_loaded = True
+    if missing or len(entries) != len(index):
+        _username_index_dirty = True
+        await flush_pending()
+    return len(_username_index)
+
+
+async def rebuild_username_index() -> int:
+    """Rescan every stored player and rewrite the username index from scratch.
 
+    Returns the number of indexed usernames.
+    """
+    global _username_index_loaded, _username_index_dirty
+    _player_changed(None)  # player files were edited by hand
+    index = {p.username: p.id for p in await list_players()}
+    async with _flush_lock:
+        _username_index.clear()
+        _username_index.update(index)
+        _username_index_loaded = True
+        _username_index_dirty = False
+        async with _locks.hold([_INDEX_LOCK]):
+            await _run_io(_write_username_index, index)
+    return len(_username_index)
+
+
+# ── Races ─────────────────────────────────────────────────────────────────────
 
 async def load_race(race_id: str):
+    """Load a live race, falling back to the day archives."""
     from backend.models import Race
-    return await load_json(race_path(race_id), Race)
+    race = await _load("races", race_id, Race)
+    if race is None and race_id in _archive.index:
+        race = await _load_archived(race_id)
+    return race
 
 
 async def save_race(race) -> None:
-    await save_json(race_path(race.id), race)
+    global _race_index_dirty
+    from backend.models import RaceSummary
+    _race_index[race.id] = RaceSummary.from_race(race)
+    _race_index_dirty = True
+    await _save("races", race.id, race)
+
+
+def race_exists(race_id: str) -> bool:
+    """True if the race is stored, archived, or saved and waiting to be flushed."""
+    _sync()
+    return _exists("races", race_id) or race_id in _archive.index
 
 
 async def delete_all_races() -> int:
-    """Delete all race JSON files. Returns the number of files deleted."""
-    count = 0
-    for f in RACES_DIR.glob("*.json"):
-        f.unlink()
-        # Remove any lock we were holding for this path
-        key = str(f)
-        _locks.pop(key, None)
-        count += 1
-    return count
+    """Delete all live races and their replays (archived ones are kept). Returns the number deleted."""
+    from backend.replay import delete_replay
+    global _race_index_dirty
+    async with _flush_lock:
+        ids = await _list_ids("races")
+        for race_id in ids:
+            # Drop any unflushed save and cache entry we were holding for this race
+            _pending.pop(("races", race_id), None)
+            _cache.discard(("races", race_id))
+            await _run_io(_backend.delete, "races", race_id)
+            await _run_io(delete_replay, race_id)
+        if _journal is not None:
+            await _run_io(_journal.append, [_journal_entry("races", race_id) for race_id in ids])
+        _race_index.clear()
+        _race_index_dirty = False
+        async with _locks.hold([_INDEX_LOCK]):
+            await _run_io(_write_race_index, [])
+    return len(ids)
 
 
 async def list_races() -> list:
     """Return all Race objects sorted by scheduled_time."""
     from backend.models import Race
-    races = []
-    for f in sorted(RACES_DIR.glob("*.json")):
-        r = await load_json(f, Race)
-        if r:
-            races.append(r)
+    ids = await _list_ids("races")
+    races = [r for r in await asyncio.gather(*(_load("races", i, Race) for i in ids)) if r]
     races.sort(key=lambda r: r.scheduled_time)
     return races
+
+
+async def warm_race_cache() -> int:
+    """Load every race that hasn't finished yet into the cache.
+
+    Called at startup so the first WebSocket connects and scheduler jobs for
+    upcoming races are served from memory. Returns the number of races warmed.
+    """
+    from backend.models import Race
+    ids = [s.id for s in await list_race_summaries() if s.status != "finished"]
+    races = await asyncio.gather(*(_load("races", i, Race) for i in ids))
+    return sum(1 for r in races if r)
+
+
+# ── Race archive ──────────────────────────────────────────────────────────────
+
+# Archived races never change, so one constant stamp keeps them valid in the cache
+_ARCHIVED_STAMP: Stamp = (0, 0)
+
+
+def _read_archived(race_id: str, model: Type[T]) -> T | None:
+    text = _archive.read(race_id)
+    return model.model_validate_json(text) if text is not None else None
+
+
+async def _load_archived(race_id: str):
+    from backend.models import Race
+    key = ("archive", race_id)
+    cached = _cache.get(key, _ARCHIVED_STAMP)
+    if isinstance(cached, Race):
+        return cached
+    race = await _run_io(_read_archived, race_id, Race)
+    if race is not None:
+        _cache.put(key, _ARCHIVED_STAMP, race)
+    return race
+
+
+async def load_archive_index() -> int:
+    """Read every day index under data/archive/. Returns the number of archived races."""
+    return await _run_io(_archive.load)
+
+
+async def archive_finished_races(before: str) -> int:
+    """Move finished races scheduled before ``before`` into the day archives.
+
+    ``before`` uses the races' timestamp format (``YYYY-MM-DDTHH:MM:SSZ``).
+    Each race is appended to its day's pack with its track embedded, then
+    deleted from the live store and the race index; its stored track goes too
+    once no live race uses it. Returns the number of races archived.
+    """
+    global _race_index_dirty
+    from backend.models import Race
+    if not _race_index_loaded:
+        await load_race_index()
+    await flush_pending()  # the archive copy must be the final version
+
+    by_day: dict[str, list[str]] = {}
+    for s in await list_race_summaries(until=before):
+        if s.status == "finished" and s.scheduled_time < before:
+            by_day.setdefault(s.scheduled_time[:10], []).append(s.id)
+
+    archived = 0
+    for day, ids in sorted(by_day.items()):
+        races = [r for r in await asyncio.gather(*(_load("races", i, Race) for i in ids)) if r]
+        races = list(await asyncio.gather(*(_with_embedded_track(r) for r in races)))
+        async with _flush_lock:
+            # Anything saved again since we loaded it stays live until next time
+            races = [r for r in races if ("races", r.id) not in _pending]
+            if not races:
+                continue
+            await _run_io(_archive.append, day, races)
+            for race in races:
+                _cache.discard(("races", race.id))
+                _race_index.pop(race.id, None)
+                await _run_io(_backend.delete, "races", race.id)
+            if _journal is not None:
+                await _run_io(_journal.append, [
+                    _journal_entry("races", race.id, archived=_archive.index[race.id]) for race in races
+                ])
+            _race_index_dirty = False
+            async with _locks.hold([_INDEX_LOCK]):
+                _sync()
+                await _run_io(_write_race_index, list(_race_index.values()))
+        await _drop_unused_tracks({r.track_id for r in races if r.track_id})
+        archived += len(races)
+    return archived
+
+
+async def _with_embedded_track(race):
+    """The race with its stored track copied in, so the archive doesn't need data/tracks/."""
+    if race.track is None and race.track_id:
+        track = await load_track(race.track_id)
+        if track is not None:
+            race = race.model_copy(update={"track": track})
+    return race
+
+
+async def _drop_unused_tracks(track_ids: set[str]) -> int:
+    """Delete the stored tracks no live race references. Returns the number deleted.
+
+    Layouts can be shared (identical tracks have one id), so each is checked
+    under its track lock, which ensure_race_exists holds from save_track()
+    until the new race is in the index.
+    """
+    dropped = 0
+    for tid in sorted(track_ids):
+        async with _locks.hold([("tracks", tid)]):
+            _sync()
+            if ("tracks", tid) in _pending or any(s.track_id == tid for s in _race_index.values()):
+                continue
+            _cache.discard(("tracks", tid))
+            await _run_io(_backend.delete, "tracks", tid)
+            dropped += 1
+    return dropped
+
+
+# ── Race index ────────────────────────────────────────────────────────────────
+
+# race_id → RaceSummary; loaded once by load_race_index(), kept in sync by
+# save_race() and written out with the write-behind batch that follows
+_race_index: dict = {}
+_race_index_loaded = False
+_race_index_dirty = False
+
+
+def _write_race_index(summaries: list) -> None:
+    _atomic_write_text(RACE_INDEX_FILE, json.dumps([s.model_dump() for s in summaries]))
+
+
+def _read_race_index() -> list | None:
+    from backend.models import RaceSummary
+    try:
+        text = RACE_INDEX_FILE.read_text(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    return [RaceSummary.model_validate(s) for s in json.loads(text)]
+
+
+async def load_race_index() -> int:
+    """Load the race index into memory and reconcile it with the stored races.
+
+    Races stored without an index entry (index file missing, or a crash between
+    a race write and the index write) are loaded and summarized; entries for
+    races that no longer exist are dropped. Returns the number of indexed races.
+    """
+    global _race_index_loaded, _race_index_dirty
+    from backend.models import Race, RaceSummary
+    summaries = await _run_io(_read_race_index) or []
+    stored = set(await _list_ids("races"))
+    # Summaries written before they carried track_id are redone from the race
+    index = {s.id: s for s in summaries if s.id in stored and "track_id" in s.model_fields_set}
+    missing = [i for i in stored if i not in index and i not in _race_index]
+    for race in await asyncio.gather(*(_load("races", i, Race) for i in missing)):
+        if race:
+            index[race.id] = RaceSummary.from_race(race)
+    index.update(_race_index)  # keeps entries saved since startup
+    _race_index.clear()
+    _race_index.update(index)
+    _race_index_loaded = True
+    if missing or len(summaries) != len(index):
+        _race_index_dirty = True
+        await flush_pending()
+    return len(_race_index)
+
+
+async def list_race_summaries(since: str | None = None, until: str | None = None) -> list:
+    """RaceSummary objects sorted by scheduled_time, optionally windowed.
+
+    ``since`` / ``until`` are inclusive bounds in the races' own timestamp
+    format (``YYYY-MM-DDTHH:MM:SSZ``), compared as strings.
+    """
+    if not _race_index_loaded:
+        await load_race_index()
+    _sync()
+    summaries = [
+        s for s in _race_index.values()
+        if (since is None or s.scheduled_time >= since) and (until is None or s.scheduled_time <= until)
+    ]
+    summaries.sort(key=lambda s: (s.scheduled_time, s.id))
+    return summaries
+
+
+# ── Tracks ────────────────────────────────────────────────────────────────────
+#
+# Tracks are stored once per distinct layout under the hash of their compact
+# JSON; races reference them by track_id. A stored track never changes; it is
+# deleted once every race using it has been archived (archived races embed it).
+
+def track_id(track) -> str:
+    """Content hash of a track — identical layouts share one id."""
+    return hashlib.sha256(track.model_dump_json().encode("utf-8")).hexdigest()[:16]
+
+
+async def save_track(track) -> str:
+    """Store a track if it isn't stored yet. Returns its track_id."""
+    tid = track_id(track)
+    if not _exists("tracks", tid):
+        await _save("tracks", tid, track)
+    return tid
+
+
+async def load_track(tid: str):
+    from backend.models import TrackData
+    return await _load("tracks", tid, TrackData)
+
+
+async def load_race_track(race):
+    """The race's track: embedded (races created before the track store) or by track_id."""
+    if race.track is not None:
+        return race.track
+    if race.track_id:
+        return await load_track(race.track_id)
+    return None
+
+
+# ── Migration ─────────────────────────────────────────────────────────────────
+
+def copy_entities(source, target, kinds: Iterable[str] = ("players", "races", "tracks"),
+                  batch_size: int = 500) -> dict[str, int]:
+    """Copy every entity from one backend into another (blocking, offline use).
+
+    Entities are validated on the way through so a corrupt source file fails
+    loudly instead of being copied. Returns the number copied per kind.
+    """
+    from backend.models import Player, Race, TrackData
+    models = {"players": Player, "races": Race, "tracks": TrackData}
+    copied: dict[str, int] = {}
+    target.setup()
+    for kind in kinds:
+        batch: list[tuple[str, str, BaseModel]] = []
+        count = 0
+        for entity_id in source.list_ids(kind):
+            loaded = source.read(kind, entity_id)
+            if loaded is None:
+                continue
+            batch.append((kind, entity_id, models[kind].model_validate_json(loaded[1])))
+            if len(batch) >= batch_size:
+                target.write_many(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            target.write_many(batch)
+            count += len(batch)
+        copied[kind] = count
+    return copied
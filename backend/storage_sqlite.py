@@ -0,0 +1,126 @@
+"""SQLite storage backend — selected with STORAGE_BACKEND=sqlite.
+
+One table per entity kind. The full entity is stored as compact JSON in
+``data``; the columns next to it exist only so queries can use an index
+(username lookups, scans ordered by scheduled_time). The database runs in WAL
+mode so readers never block the writer, and each write-behind batch from
+backend/storage.py commits as a single transaction.
+
+Connections are per thread: the storage I/O pool opens one connection per
+worker thread on first use.
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from pydantic import BaseModel
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id       TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    data     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS players_username ON players (username);
+
+CREATE TABLE IF NOT EXISTS races (
+    id             TEXT PRIMARY KEY,
+    scheduled_time TEXT NOT NULL,
+    status         TEXT NOT NULL,
+    data           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS races_scheduled_time ON races (scheduled_time);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    id   TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+# kind → (INSERT statement, function (id, obj) → the indexed columns + data)
+_UPSERTS = {
+    "players": (
+        "INSERT OR REPLACE INTO players (id, username, data) VALUES (?, ?, ?)",
+        lambda entity_id, obj: (entity_id, obj.username, obj.model_dump_json()),
+    ),
+    "races": (
+        "INSERT OR REPLACE INTO races (id, scheduled_time, status, data) VALUES (?, ?, ?, ?)",
+        lambda entity_id, obj: (entity_id, obj.scheduled_time, obj.status, obj.model_dump_json()),
+    ),
+    # Tracks are keyed by content hash, which isn't a field of the model
+    "tracks": (
+        "INSERT OR REPLACE INTO tracks (id, data) VALUES (?, ?)",
+        lambda entity_id, obj: (entity_id, obj.model_dump_json()),
+    ),
+}
+
+_ORDER_BY = {"players": "id", "races": "scheduled_time, id", "tracks": "id"}
+
+# Cache entries never go stale within one process: every write goes through it
+_STAMP = (0, 0)
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def setup(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def stamp(self, kind: str, entity_id: str) -> tuple[int, int] | None:
+        return _STAMP
+
+    def exists(self, kind: str, entity_id: str) -> bool:
+        row = self._conn().execute(f"SELECT 1 FROM {kind} WHERE id = ?", (entity_id,)).fetchone()
+        return row is not None
+
+    def read(self, kind: str, entity_id: str) -> tuple[tuple[int, int], str] | None:
+        row = self._conn().execute(f"SELECT data FROM {kind} WHERE id = ?", (entity_id,)).fetchone()
+        return (_STAMP, row[0]) if row else None
+
+    def write_many(self, items: list[tuple[str, str, BaseModel]]) -> list[tuple[int, int]]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for kind, entity_id, obj in items:
+                sql, columns = _UPSERTS[kind]
+                conn.execute(sql, columns(entity_id, obj))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return [_STAMP] * len(items)
+
+    def delete(self, kind: str, entity_id: str) -> None:
+        self._conn().execute(f"DELETE FROM {kind} WHERE id = ?", (entity_id,))
+
+    def list_ids(self, kind: str) -> list[str]:
+        rows = self._conn().execute(f"SELECT id FROM {kind} ORDER BY {_ORDER_BY[kind]}")
+        return [row[0] for row in rows]
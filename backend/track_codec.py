@@ -0,0 +1,67 @@
+"""
+Compact track encoding.
+
+A track is a closed loop of grid cells, so it is fully described by its first
+cell and one compass letter (N/E/S/W) per step — the last step leads back to
+the start. Tile type and orientation follow from the directions a cell is
+entered and left by, so they never need to be stored.
+
+This module has no model imports: backend.models uses it to expand tracks
+lazily, and backend.track_gen uses it to encode freshly generated ones.
+"""
+from __future__ import annotations
+
+# compass letter ↔ (dx, dy) step on the grid (y grows southwards)
+STEPS: dict[str, tuple[int, int]] = {"E": (1, 0), "W": (-1, 0), "S": (0, 1), "N": (0, -1)}
+_LETTERS: dict[tuple[int, int], str] = {step: letter for letter, step in STEPS.items()}
+
+# Which two compass labels a curve orientation connects
+_CURVE_DIRS: dict[frozenset, str] = {
+    frozenset({"N", "E"}): "NE",
+    frozenset({"N", "W"}): "NW",
+    frozenset({"S", "E"}): "SE",
+    frozenset({"S", "W"}): "SW",
+}
+
+
+def tile_shape(came_from: str, going_to: str) -> tuple[str, str]:
+    """Return (tile_type, orientation) for a cell given entry and exit directions."""
+    if came_from == going_to:
+        return "straight", "horizontal" if came_from in "EW" else "vertical"
+    key = frozenset({came_from, going_to})
+    if key in _CURVE_DIRS:
+        return "curve", _CURVE_DIRS[key]
+    # A reversal can't happen on a proper walk; default to straight
+    return "straight", "horizontal"
+
+
+def encode_path(path: list) -> tuple[list[int], str]:
+    """Encode a closed path (without the trailing duplicate) as (start, directions)."""
+    m = len(path)
+    letters = []
+    for i, (x, y) in enumerate(path):
+        nx, ny = path[(i + 1) % m]
+        step = (nx - x, ny - y)
+        if step not in _LETTERS:
+            raise ValueError(f"Track path is not a chain of adjacent cells at index {i}")
+        letters.append(_LETTERS[step])
+    return [path[0][0], path[0][1]], "".join(letters)
+
+
+def decode_path(start: list[int], directions: str) -> list[list[int]]:
+    """Expand (start, directions) back into the [[x, y], ...] path order."""
+    x, y = start
+    path = []
+    for letter in directions:
+        path.append([x, y])
+        dx, dy = STEPS[letter]
+        x += dx
+        y += dy
+    if directions and [x, y] != list(start):
+        raise ValueError("Track directions do not return to the start cell")
+    return path
+
+
+def tile_shapes(directions: str) -> list[tuple[str, str]]:
+    """(tile_type, orientation) for every cell of the loop, in path order."""
+    return [tile_shape(directions[i - 1], going_to) for i, going_to in enumerate(directions)]
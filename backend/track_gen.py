@@ -1,77 +1,57 @@
 """
-Random-walk track generation.
-
-Algorithm:
+Track generation on an N×N grid. TRACK_GENERATOR picks the algorithm.
+
+"grow" (default) — loop growing:
+1. Start from a 2×2 loop at a random position near the middle.
+2. Pick a random loop cell and the straight wall (up to N/3 cells) that
+   starts there, and push the wall sideways by 1..N/8 cells: the shifted
+   wall plus two connecting arms are spliced into the loop and the wall's
+   inner cells drop out. The loop stays closed and self-avoiding and gains
+   2 × depth cells. Pushes that would touch other parts of the track are
+   skipped while alternatives remain, so straights keep a verge between them.
+3. Stop at a random target length between the minimum and twice the minimum.
+   Every attempt either grows the loop or discards a candidate, so this is
+   bounded (O(n²) in the worst case) and never fails.
+
+"walk" — random walk:
 1. Start at a fixed cell, walk randomly on an N×N grid without revisiting cells.
 2. When adjacent to start (after ≥ 8 steps) close the loop and return.
 3. Retry up to MAX_RETRIES times; fall back to a hardcoded oval if all fail.
-4. Annotate each tile with type (straight / curve / chicane) and orientation.
+   On 24×24 grids and up the walk rarely finds its way back, so most of these
+   tracks end up as the oval.
+
+Either way the loop is encoded as start cell + direction letters; tile type
+(straight / curve / chicane) and orientation are derived from it when first
+needed.
 """
 from __future__ import annotations
 
 import random
 from typing import Optional
 
-from backend.config import TRACK_GRID_SIZE, TRACK_MIN_STEPS, TRACK_MAX_RETRIES
-from backend.models import TileData, TrackData
-
-# (dx, dy) → compass label when moving in that direction
-_COMPASS = {(1, 0): "E", (-1, 0): "W", (0, 1): "S", (0, -1): "N"}
-
-# Which two compass labels a curve orientation connects
-_CURVE_DIRS: dict[frozenset, str] = {
-    frozenset({"N", "E"}): "NE",
-    frozenset({"N", "W"}): "NW",
-    frozenset({"S", "E"}): "SE",
-    frozenset({"S", "W"}): "SW",
-}
-
-
-def _tile_type_orientation(came_from_delta: tuple, going_to_delta: tuple) -> tuple[str, str]:
-    """Return (tile_type, orientation) for a cell given entry and exit directions."""
-    if came_from_delta == going_to_delta:
-        # Straight
-        if came_from_delta[0] != 0:
-            return "straight", "horizontal"
-        return "straight", "vertical"
-    # Curve — choose chicane if zig-zag (anti-parallel), otherwise normal curve
-    from_label = _COMPASS[came_from_delta]
-    to_label   = _COMPASS[going_to_delta]
-    key = frozenset({from_label, to_label})
-    if key in _CURVE_DIRS:
-        return "curve", _CURVE_DIRS[key]
-    # Shouldn't happen on a proper walk; default to straight
-    return "straight", "horizontal"
+from backend.config import TRACK_GENERATOR, TRACK_GRID_SIZE, TRACK_MIN_STEPS, TRACK_MAX_RETRIES
+from backend.models import TrackData
+from backend.track_codec import encode_path
 
 
 def _build_track_data(path: list[tuple[int, int]], n: int) -> TrackData:
-    """Convert a closed path list into a TrackData object.
+    """Convert a closed path list into a compact TrackData object.
 
-    path[0] == path[-1]; path_order excludes the trailing duplicate.
+    path[0] == path[-1]; the trailing duplicate is dropped. Tile types and
+    orientations are derived from the path on demand (see backend.track_codec).
     """
-    path_order = path[:-1]
-    tiles: list[TileData] = []
-    m = len(path_order)
-    for i, (x, y) in enumerate(path_order):
-        prev = path_order[(i - 1) % m]
-        nxt  = path_order[(i + 1) % m]
-        came_from = (x - prev[0], y - prev[1])
-        going_to  = (nxt[0] - x,  nxt[1] - y)
-        t_type, t_orient = _tile_type_orientation(came_from, going_to)
-        tiles.append(TileData(x=x, y=y, type=t_type, orientation=t_orient))
-
-    return TrackData(
-        grid_width=n,
-        grid_height=n,
-        tiles=tiles,
-        path_order=[[x, y] for x, y in path_order],
-    )
+    start, directions = encode_path(path[:-1])
+    return TrackData(grid_width=n, grid_height=n, start=start, directions=directions)
+
+
+def _min_steps(n: int) -> int:
+    return max(TRACK_MIN_STEPS, n * 2)
 
 
 def _try_walk(n: int, rng: random.Random) -> Optional[list[tuple[int, int]]]:
     """Attempt one random-walk closed loop. Returns path list or None."""
     max_steps  = n * n          # upper bound scales with grid area
-    min_steps  = max(TRACK_MIN_STEPS, n * 2)
+    min_steps  = _min_steps(n)
     start = (0, 0)
     visited: set[tuple[int, int]] = {start}
     path = [start]
@@ -116,11 +96,109 @@ def _oval_fallback(n: int) -> TrackData:
     return _build_track_data(path, n)
 
 
-def generate_track(n: int = TRACK_GRID_SIZE, seed: Optional[int] = None) -> TrackData:
-    """Generate a random closed-loop track on an N×N grid."""
-    rng = random.Random(seed)
+_NEIGHBOURS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+
+
+def _grow_loop(n: int, rng: random.Random, target: int) -> list[tuple[int, int]]:
+    """Grow a closed loop of about ``target`` cells. Returns path with path[0] == path[-1].
+
+    The loop is a circular linked list (``nxt``: cell → following cell), so
+    pushing a wall out only touches the cells of that wall.
+    """
+    x0 = rng.randrange(n // 4, max(n // 4 + 1, 3 * n // 4 - 1))
+    y0 = rng.randrange(n // 4, max(n // 4 + 1, 3 * n // 4 - 1))
+    square = [(x0, y0), (x0 + 1, y0), (x0 + 1, y0 + 1), (x0, y0 + 1)]
+    nxt = {cell: square[(i + 1) % 4] for i, cell in enumerate(square)}
+    max_depth = max(1, n // 8)
+    max_run = max(2, n // 3)
+
+    def fits(cells: list[tuple[int, int]], wall: list[tuple[int, int]], spaced: bool) -> bool:
+        if not all(0 <= x < n and 0 <= y < n and (x, y) not in nxt for x, y in cells):
+            return False
+        if spaced:
+            # Keep a one-cell verge: new cells may only touch the wall they replace
+            allowed = {*wall, *cells}
+            for x, y in cells:
+                for dx, dy in _NEIGHBOURS:
+                    if (x + dx, y + dy) in nxt and (x + dx, y + dy) not in allowed:
+                        return False
+        return True
+
+    # Spaced pushes first for an open layout; if those run out before the
+    # target, allow pushes that run alongside existing track.
+    for spaced in (True, False):
+        # Cells whose outgoing edge may still start a push
+        candidates = list(nxt)
+        while len(nxt) < target and candidates:
+            i = rng.randrange(len(candidates))
+            a = candidates[i]
+            grown = False
+            if a in nxt:  # cells dropped by an earlier push linger here
+                # The wall: a straight run of cells starting at a
+                step_x, step_y = nxt[a][0] - a[0], nxt[a][1] - a[1]
+                wall = [a, nxt[a]]
+                run = rng.randint(1, max_run)
+                while len(wall) <= run and nxt[wall[-1]] == (wall[-1][0] + step_x, wall[-1][1] + step_y):
+                    wall.append(nxt[wall[-1]])
+                sides = [(step_y, step_x), (-step_y, -step_x)]  # the two perpendiculars
+                rng.shuffle(sides)
+                for dx, dy in sides:
+                    # Push the wall out by up to max_depth cells; its inner cells leave the loop
+                    for depth in range(rng.randint(1, max_depth), 0, -1):
+                        first, last = wall[0], wall[-1]
+                        cells = (
+                            [(first[0] + dx * k, first[1] + dy * k) for k in range(1, depth)]
+                            + [(x + dx * depth, y + dy * depth) for x, y in wall]
+                            + [(last[0] + dx * k, last[1] + dy * k) for k in range(depth - 1, 0, -1)]
+                        )
+                        if fits(cells, wall, spaced):
+                            for cell in wall[1:-1]:
+                                del nxt[cell]
+                            chain = [first] + cells + [last]
+                            for c1, c2 in zip(chain, chain[1:]):
+                                nxt[c1] = c2
+                            candidates += cells  # a stays: its edge now leads into the new wall
+                            grown = True
+                            break
+                    if grown:
+                        break
+            if not grown:
+                candidates[i] = candidates[-1]
+                candidates.pop()
+
+    start = next(iter(nxt))
+    path = [start]
+    cell = nxt[start]
+    while cell != start:
+        path.append(cell)
+        cell = nxt[cell]
+    path.append(start)
+    return path
+
+
+def _generate_grow(n: int, rng: random.Random) -> TrackData:
+    min_steps = _min_steps(n)
+    target = rng.randint(min_steps, 2 * min_steps)
+    return _build_track_data(_grow_loop(n, rng, target), n)
+
+
+def _generate_walk(n: int, rng: random.Random) -> TrackData:
     for _ in range(TRACK_MAX_RETRIES):
         path = _try_walk(n, rng)
         if path:
             return _build_track_data(path, n)
     return _oval_fallback(n)
+
+
+_GENERATORS = {"grow": _generate_grow, "walk": _generate_walk}
+
+
+def generate_track(
+    n: int = TRACK_GRID_SIZE,
+    seed: Optional[int] = None,
+    generator: str = TRACK_GENERATOR,
+) -> TrackData:
+    """Generate a random closed-loop track on an N×N grid (reproducible with ``seed``)."""
+    if generator not in _GENERATORS:
+        raise ValueError(f"Unknown TRACK_GENERATOR: {generator!r} (expected 'grow' or 'walk')")
+    return _GENERATORS[generator](n, random.Random(seed))
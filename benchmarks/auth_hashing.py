@@ -0,0 +1,90 @@
+"""
+Login bursts: bcrypt on the event loop (the original handlers) vs on the
+AUTH_HASH_WORKERS thread pool. A burst of logins arrives at once while a
+ticker stands in for a live race, asking to wake every RACE_TICK_INTERVAL_MS;
+how late each tick goes out is the jitter every spectator would see.
+
+Reports logins verified per second, logins turned away with 503 after
+AUTH_HASH_QUEUE_TIMEOUT_MS, and tick lateness.
+
+Usage:
+  python -m benchmarks.auth_hashing [--logins 40] [--workers 0,1,2,4] [--timeout-ms 2000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from fastapi import HTTPException
+
+from backend import auth
+from backend.config import RACE_TICK_INTERVAL_MS
+
+_PASSWORD = "correct horse battery staple"
+
+
+async def _run(workers: int, n_logins: int, hashed: str) -> tuple[float, int, int, list[float]]:
+    """(wall seconds, logins verified, logins rejected, tick lateness in seconds)."""
+    interval = RACE_TICK_INTERVAL_MS / 1000
+    lateness: list[float] = []
+    done = False
+
+    async def ticker() -> None:
+        # Deadlines on a fixed grid, like the race clock: a stall makes every tick it spans late
+        deadline = time.perf_counter() + interval
+        while not done:
+            await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+            now = time.perf_counter()
+            while deadline <= now:
+                lateness.append(now - deadline)
+                deadline += interval
+
+    async def login() -> bool:
+        if workers <= 0:
+            await asyncio.sleep(0)  # a handler awaiting its storage load, then hashing inline
+            return auth._checkpw(_PASSWORD, hashed)
+        try:
+            return await auth.verify_password(_PASSWORD, hashed)
+        except HTTPException:
+            return False
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(interval * 3)  # a few undisturbed ticks first
+    t0 = time.perf_counter()
+    ok = sum(await asyncio.gather(*(login() for _ in range(n_logins))))
+    wall = time.perf_counter() - t0
+    done = True
+    await task
+    return wall, ok, n_logins - ok, lateness
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=40, help="logins arriving at once")
+    parser.add_argument("--workers", default="0,1,2,4", help="comma-separated AUTH_HASH_WORKERS values (0 = on the event loop)")
+    parser.add_argument("--timeout-ms", type=int, default=2000, help="AUTH_HASH_QUEUE_TIMEOUT_MS")
+    args = parser.parse_args()
+
+    hashed = auth._hashpw(_PASSWORD)
+    t0 = time.perf_counter()
+    auth._checkpw(_PASSWORD, hashed)
+    print(f"{args.logins} logins at once, {(time.perf_counter() - t0) * 1000:.0f}ms per bcrypt check, "
+          f"{RACE_TICK_INTERVAL_MS}ms ticks, {args.timeout_ms}ms queue timeout; {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'wall':>7} {'logins/s':>9} {'503s':>5} {'tick late p50':>14} {'p99':>8} {'max':>8}")
+    auth.AUTH_HASH_QUEUE_TIMEOUT_MS = args.timeout_ms
+    for workers in (int(w) for w in args.workers.split(",")):
+        auth.AUTH_HASH_WORKERS = workers
+        wall, ok, rejected, lateness = asyncio.run(_run(workers, args.logins, hashed))
+        auth.shutdown_hash_workers()
+        lateness.sort()
+        label = f"{workers}" if workers else "loop"
+        print(f"{label:>8} {wall:>6.2f}s {ok / wall:>9.1f} {rejected:>5}"
+              f" {statistics.median(lateness) * 1000:>12.1f}ms"
+              f" {lateness[int(len(lateness) * 0.99) - 1] * 1000:>6.1f}ms {lateness[-1] * 1000:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Authenticated request latency with and without the session cache: p50/p99 of
+GET /api/auth/me and GET /api/car through the whole ASGI app, plus the time
+spent in get_current_player alone. "off" is AUTH_SESSION_CACHE_MAX_ENTRIES=0,
+which verifies the JWT and loads the player (from the storage cache) on every
+request, as before the session cache.
+
+Usage:
+  python -m benchmarks.auth_sessions [--players 200] [--requests 4000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="carracingsim-bench-")
+
+import httpx  # noqa: E402
+
+from backend import auth, storage  # noqa: E402  (env must be set first)
+from backend.main import app  # noqa: E402
+from backend.models import Player  # noqa: E402
+
+
+async def _players(n: int) -> list[str]:
+    """Tokens for n stored players."""
+    storage.ensure_dirs()
+    await storage.load_username_index()
+    tokens = []
+    for i in range(n):
+        player = Player(username=f"bench{i}", hashed_password="-")
+        await storage.save_player(player)
+        tokens.append(auth.create_token(player.id))
+    await storage.flush_pending()
+    return tokens
+
+
+async def _run(tokens: list[str], n_requests: int, cache_entries: int) -> dict[str, list[float]]:
+    """Per-request seconds for each endpoint, and for get_current_player alone."""
+    auth._sessions.__init__(cache_entries)  # in place: storage still holds its listener
+    rng = random.Random(1)
+    timings: dict[str, list[float]] = {"/api/auth/me": [], "/api/car": [], "dependency": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in ("/api/auth/me", "/api/car"):
+            for i in range(n_requests):
+                token = rng.choice(tokens)
+                t0 = time.perf_counter()
+                response = await client.get(path, cookies={"session": token})
+                elapsed = time.perf_counter() - t0
+                assert response.status_code == 200, response.text
+                if i >= len(tokens):  # after a warm-up pass
+                    timings[path].append(elapsed)
+    for i in range(n_requests):
+        token = rng.choice(tokens)
+        t0 = time.perf_counter()
+        await auth.get_current_player(token)
+        if i >= len(tokens):
+            timings["dependency"].append(time.perf_counter() - t0)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000, help="per endpoint")
+    args = parser.parse_args()
+
+    tokens = asyncio.run(_players(args.players))
+    print(f"{args.players} players, {args.requests} requests per endpoint; {os.cpu_count()} CPUs")
+    print(f"{'cache':>6} {'endpoint':>14} {'p50':>9} {'p99':>9}")
+    for label, entries in (("off", 0), ("on", 4096)):
+        timings = asyncio.run(_run(tokens, args.requests, entries))
+        for name, samples in timings.items():
+            samples.sort()
+            print(f"{label:>6} {name:>14} {statistics.median(samples) * 1e6:>7.0f}us"
+                  f" {samples[int(len(samples) * 0.99) - 1] * 1e6:>7.0f}us")
+        stats = auth.session_stats()
+        print(f"{'':>6} token hit rate {stats['token_hit_rate']}, player hit rate {stats['player_hit_rate']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Spectator capacity of the Unix-socket broadcast hub as server processes scale.
+
+This process is the hub and publishes a race (protocol 3, the viewer's
+default) at the live tick rate. Each worker process joins as a peer and
+holds its share of the spectators: one subscription each, drained by a task
+that writes every frame to /dev/null in place of a WebSocket. Per tick, a
+worker records how long it took from the hub frame arriving until its last
+spectator had sent it.
+
+A configuration keeps up while p99 stays under the tick interval and no
+ticks are dropped.
+
+Usage:
+  python -m benchmarks.broadcast_hub [--workers 1,2,4] [--spectators 1000,4000,8000] [--cars 40] [--ticks 60]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import statistics
+import struct
+import tempfile
+import time
+from pathlib import Path
+
+from backend.broadcast.hub import HubBroadcaster
+from backend.broadcast.race_broadcaster import RaceBroadcaster
+from backend.config import RACE_TICK_INTERVAL_MS
+from backend.simulation.engine import generate_tick_stream
+from backend.track_gen import generate_track
+from benchmarks.tick_engines import _results
+
+_RACE = "bench"
+
+
+def _ticks(n_cars: int, n_ticks: int) -> list[dict]:
+    stream = generate_tick_stream(_results(n_cars), lap_count=50, track=generate_track(n=36, seed=1))
+    return [{"type": "tick", **t} for t, _ in zip(stream, range(n_ticks))]
+
+
+def _worker(path: Path, n_spectators: int, roster: list[str], ready, results) -> None:
+    asyncio.run(_worker_main(path, n_spectators, roster, ready, results))
+
+
+async def _worker_main(path: Path, n_spectators: int, roster: list[str], ready, results) -> None:
+    hub = HubBroadcaster(RaceBroadcaster(), path)
+    await hub.start()
+    subs = [hub.subscribe(_RACE, 3, roster) for _ in range(n_spectators)]
+    arrived: dict[int, float] = {}
+    sent: dict[int, int] = {}
+    latencies: list[float] = []
+
+    deliver = hub.local.broadcast
+
+    async def timed(race_id: str, message: dict) -> None:
+        if message.get("type") == "tick":
+            arrived[message["tick"]] = time.perf_counter()
+        await deliver(race_id, message)
+
+    hub.local.broadcast = timed
+    devnull = os.open(os.devnull, os.O_WRONLY)
+
+    async def spectator(sub) -> None:
+        while True:
+            frame = await sub.get()
+            os.write(devnull, frame.data if isinstance(frame.data, bytes) else frame.data.encode())
+            if frame.final:
+                return
+            if isinstance(frame.data, bytes):
+                (tick,) = struct.unpack_from("<I", frame.data, 4)
+                sent[tick] = sent.get(tick, 0) + 1
+                if sent[tick] == n_spectators:
+                    latencies.append(time.perf_counter() - arrived[tick])
+
+    tasks = [asyncio.create_task(spectator(sub)) for sub in subs]
+    while hub.stats()["hub"]["role"] != "peer":
+        await asyncio.sleep(0.05)
+    ready.put(os.getpid())
+    await asyncio.gather(*tasks)
+    stats = hub.local.stats()
+    results.put({"latencies": latencies, "dropped": stats["frames_dropped"]})
+    await hub.stop()
+    os.close(devnull)
+
+
+async def _publish(hub: HubBroadcaster, ticks: list[dict], interval: float) -> None:
+    await hub.broadcast(_RACE, {"type": "status", "status": "running"})
+    start = time.monotonic()
+    for i, tick in enumerate(ticks):
+        await asyncio.sleep(max(0.0, start + i * interval - time.monotonic()))
+        await hub.broadcast(_RACE, tick)
+    await asyncio.sleep(interval)
+    await hub.broadcast(_RACE, {"type": "finished", "results": []})
+
+
+def _run(n_workers: int, total: int, ticks: list[dict], interval: float) -> dict:
+    path = Path(tempfile.mkdtemp(prefix="carracingsim-hub-")) / "hub.sock"
+    ctx = multiprocessing.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    roster = [c["car_id"] for c in ticks[0]["cars"]]
+
+    async def main() -> list[dict]:
+        hub = HubBroadcaster(RaceBroadcaster(), path)
+        await hub.start()
+        while hub.stats()["hub"]["role"] != "hub":
+            await asyncio.sleep(0.01)
+        procs = [
+            ctx.Process(target=_worker, args=(path, total // n_workers, roster, ready, results))
+            for _ in range(n_workers)
+        ]
+        for p in procs:
+            p.start()
+        loop = asyncio.get_running_loop()
+        for _ in procs:
+            await loop.run_in_executor(None, ready.get)
+        await _publish(hub, ticks, interval)
+        out = [await loop.run_in_executor(None, results.get) for _ in procs]
+        for p in procs:
+            p.join()
+        await hub.stop()
+        return out
+
+    per_worker = asyncio.run(main())
+    latencies = sorted(l for r in per_worker for l in r["latencies"])
+    complete = len(latencies) / (len(ticks) * n_workers)
+    return {
+        "p50": statistics.median(latencies) * 1000 if latencies else float("nan"),
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else float("nan"),
+        "complete": complete,
+        "dropped": sum(r["dropped"] for r in per_worker),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated counts of server processes")
+    parser.add_argument("--spectators", default="1000,4000,8000", help="comma-separated totals, split across workers")
+    parser.add_argument("--cars", type=int, default=40)
+    parser.add_argument("--ticks", type=int, default=60)
+    args = parser.parse_args()
+
+    interval = RACE_TICK_INTERVAL_MS / 1000
+    ticks = _ticks(args.cars, args.ticks)
+    print(f"{args.cars} cars, {len(ticks)} ticks at {RACE_TICK_INTERVAL_MS}ms, protocol 3; {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'spectators':>11} {'p50':>8} {'p99':>8} {'ticks sent':>11} {'dropped':>8}  keeps up")
+    for n_workers in (int(w) for w in args.workers.split(",")):
+        for total in (int(s) for s in args.spectators.split(",")):
+            r = _run(n_workers, total, ticks, interval)
+            ok = r["p99"] < RACE_TICK_INTERVAL_MS and r["dropped"] == 0 and r["complete"] == 1
+            print(f"{n_workers:>8} {total:>11} {r['p50']:>6.1f}ms {r['p99']:>6.1f}ms"
+                  f" {r['complete'] * 100:>10.0f}% {r['dropped']:>8}  {'yes' if ok else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
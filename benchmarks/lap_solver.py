@@ -0,0 +1,60 @@
+"""
+Lap-time solver vs stepping the tick stream: time to learn every car's finish
+tick, and time to answer "where is everyone at tick N".
+
+Also checks that the solver's snapshot of every tick equals the stream's.
+
+Usage:
+  python -m benchmarks.lap_solver [--laps 10] [--grids 12,24,36,60] [--cars 6,40]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from backend.simulation.engine import generate_tick_stream
+from backend.simulation.solver import RaceSolution
+from backend.track_gen import generate_track
+from benchmarks.tick_engines import _results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--laps", type=int, default=10)
+    parser.add_argument("--grids", default="12,24,36,60", help="comma-separated grid sizes")
+    parser.add_argument("--cars", default="6,40", help="comma-separated field sizes")
+    args = parser.parse_args()
+
+    print(f"{args.laps} laps; 'step' generates the whole stream (python engine) to find the finish ticks")
+    print(f"{'grid':>5} {'cars':>5} {'ticks':>6} {'step':>9} {'solve':>9} {'speedup':>8}"
+          f" {'tick N (step)':>14} {'tick N (solve)':>15}  match")
+    for grid in (int(g) for g in args.grids.split(",")):
+        track = generate_track(n=grid, seed=1)
+        for n_cars in (int(c) for c in args.cars.split(",")):
+            results = _results(n_cars)
+            t0 = time.perf_counter()
+            ticks = list(generate_tick_stream(results, lap_count=args.laps, track=track, engine="python"))
+            step_time = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            solution = RaceSolution(results, args.laps, track)
+            solve_time = time.perf_counter() - t0
+
+            # Jump to the middle of the race: stepping has to get there, the solver looks it up
+            mid = len(ticks) // 2
+            t0 = time.perf_counter()
+            for tick in generate_tick_stream(results, lap_count=args.laps, track=track, engine="python"):
+                if tick["tick"] == mid:
+                    break
+            seek_step = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            solution.snapshot(mid)
+            seek_solve = time.perf_counter() - t0
+
+            match = solution.n_ticks == len(ticks) and all(solution.snapshot(t["tick"]) == t for t in ticks)
+            print(f"{grid:>5} {n_cars:>5} {len(ticks):>6} {step_time * 1000:>7.0f}ms {solve_time * 1000:>7.0f}ms"
+                  f" {step_time / solve_time:>7.1f}x {seek_step * 1000:>12.1f}ms {seek_solve * 1000:>13.2f}ms  {match}")
+
+
+if __name__ == "__main__":
+    main()
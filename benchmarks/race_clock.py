@@ -0,0 +1,78 @@
+"""
+Race pacing: one broadcast + asyncio.sleep(interval) loop per race (the
+original run_race_job) vs the shared RaceClock, with several races running
+at once and a fixed cost per broadcast standing in for encode + fan-out.
+
+Reports wall-clock duration against the nominal n_ticks × interval.
+
+Usage:
+  python -m benchmarks.race_clock [--races 1,10,20] [--ticks 200] [--interval-ms 62] [--work-ms 1]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import backend.broadcast.race_clock as race_clock_module
+from backend.broadcast.race_clock import RaceClock
+
+
+class _BusyBroadcaster:
+    """Blocks the event loop for ``work`` seconds per message, like a real fan-out."""
+
+    def __init__(self, work: float):
+        self.work = work
+        self.messages = 0
+
+    async def broadcast(self, race_id: str, message: dict) -> None:
+        end = time.perf_counter() + self.work
+        while time.perf_counter() < end:
+            pass
+        self.messages += 1
+
+
+async def _sleep_loop(fake: _BusyBroadcaster, race_id: str, n_ticks: int, interval: float) -> None:
+    for tick in range(1, n_ticks + 1):
+        await fake.broadcast(race_id, {"type": "tick", "tick": tick})
+        await asyncio.sleep(interval)
+
+
+async def _run(mode: str, n_races: int, n_ticks: int, interval_ms: int, work_ms: float) -> tuple[float, int, dict]:
+    fake = _BusyBroadcaster(work_ms / 1000)
+    race_clock_module.broadcaster = fake
+    clock = RaceClock(interval_ms=interval_ms)
+    ticks = lambda: ({"type": "tick", "tick": t} for t in range(1, n_ticks + 1))  # noqa: E731
+    t0 = time.monotonic()
+    if mode == "sleep":
+        await asyncio.gather(*(_sleep_loop(fake, f"r{i}", n_ticks, interval_ms / 1000) for i in range(n_races)))
+    else:
+        await asyncio.gather(*(clock.run(f"r{i}", ticks()) for i in range(n_races)))
+    return time.monotonic() - t0, fake.messages, clock.stats()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--races", default="1,10,20", help="comma-separated counts of concurrent races")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--interval-ms", type=int, default=62)
+    parser.add_argument("--work-ms", type=float, default=1.0, help="event-loop time per broadcast")
+    args = parser.parse_args()
+
+    nominal = args.ticks * args.interval_ms / 1000
+    print(f"{args.ticks} ticks at {args.interval_ms}ms = {nominal:.2f}s nominal; {args.work_ms}ms per broadcast")
+    print(f"{'races':>6} {'mode':>6} {'duration':>9} {'drift':>7} {'sent':>7} {'skipped':>8}")
+    original = race_clock_module.broadcaster
+    try:
+        for n_races in (int(r) for r in args.races.split(",")):
+            for mode in ("sleep", "clock"):
+                duration, sent, stats = asyncio.run(_run(mode, n_races, args.ticks, args.interval_ms, args.work_ms))
+                skipped = stats["ticks_skipped"] if mode == "clock" else 0
+                print(f"{n_races:>6} {mode:>6} {duration:>8.2f}s {(duration / nominal - 1) * 100:>6.1f}%"
+                      f" {sent:>7} {skipped:>8}")
+    finally:
+        race_clock_module.broadcaster = original
+
+
+if __name__ == "__main__":
+    main()
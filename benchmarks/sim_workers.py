@@ -0,0 +1,80 @@
+"""
+Simulating races on a thread vs on SIM_WORKERS processes: wall time to build
+a batch of replays, and how late the event loop runs a 10ms timer meanwhile
+(the delay every HTTP request, WebSocket frame and race tick sees).
+
+Usage:
+  python -m benchmarks.sim_workers [--races 8] [--laps 25] [--grid 36] [--workers 0,1,2,4]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="carracingsim-bench-")
+
+from backend import replay  # noqa: E402  (env must be set first)
+from backend.bots import generate_bot_entries  # noqa: E402
+from backend.config import REPLAYS_DIR  # noqa: E402
+from backend.models import Race  # noqa: E402
+from backend.track_gen import generate_track  # noqa: E402
+
+
+def _races(n: int, laps: int) -> list[Race]:
+    return [
+        Race(
+            id=f"2026-01-01_{i:03d}", scheduled_time="2026-01-01T00:00:00Z", event_type="sprint",
+            status="locked", lap_count=laps, entries=generate_bot_entries(f"2026-01-01_{i:03d}", 0),
+        )
+        for i in range(n)
+    ]
+
+
+async def _run(races: list[Race], tracks: list) -> tuple[float, float, float]:
+    """(wall seconds, mean and max timer lateness in ms) while building every replay."""
+    lateness: list[float] = []
+    done = False
+
+    async def ticker() -> None:
+        while not done:
+            t0 = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lateness.append(time.perf_counter() - t0 - 0.01)
+
+    task = asyncio.create_task(ticker())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(replay.simulate_replay(race, track) for race, track in zip(races, tracks)))
+    wall = time.perf_counter() - t0
+    done = True
+    await task
+    return wall, sum(lateness) / len(lateness) * 1000, max(lateness) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--races", type=int, default=8)
+    parser.add_argument("--laps", type=int, default=25)
+    parser.add_argument("--grid", type=int, default=36)
+    parser.add_argument("--workers", default="0,1,2,4", help="comma-separated SIM_WORKERS values (0 = thread)")
+    args = parser.parse_args()
+
+    REPLAYS_DIR.mkdir(parents=True, exist_ok=True)
+    races = _races(args.races, args.laps)
+    tracks = [generate_track(n=args.grid, seed=i) for i in range(args.races)]
+    print(f"{args.races} races, {args.laps} laps, {args.grid}x{args.grid} grid, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'wall':>8} {'loop lag avg':>13} {'loop lag max':>13}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        replay.SIM_WORKERS = workers
+        if workers:  # start the processes outside the timed run
+            asyncio.run(replay.simulate_replay(races[0], tracks[0]))
+        wall, lag_avg, lag_max = asyncio.run(_run(races, tracks))
+        replay.shutdown_sim_workers()
+        label = f"{workers}" if workers else "thread"
+        print(f"{label:>8} {wall:>7.2f}s {lag_avg:>11.1f}ms {lag_max:>11.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Speed-profile construction: the original iterative relaxation vs the exact
+two-sweep solution (pure Python and NumPy), and the memoized call the tick
+stream actually makes.
+
+Also reports the largest difference from the iterative result (ft/s).
+
+Usage:
+  python -m benchmarks.speed_profile [--tracks 50]
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import time
+
+from backend.config import ACCEL_FPS2, BRAKE_FPS2, TILE_FEET, TOP_SPEED_FPS
+from backend.simulation.engine import (
+    _RAW_SPEED_FPS, _constrain_profile, _constrain_profile_numpy, build_speed_profile,
+)
+from backend.track_gen import generate_track
+
+GRID_SIZES = (12, 18, 24, 36, 48, 60)
+
+
+def _iterative(raw: list[float]) -> list[float]:
+    """The pre-memoization build_speed_profile: alternating passes, 0.01 ft/s tolerance, ≤ 10 rounds."""
+    speed = list(raw)
+    n = len(speed)
+    for _ in range(10):
+        changed = False
+        for i in range(n):
+            limit = math.sqrt(speed[(i + 1) % n] ** 2 + 2.0 * BRAKE_FPS2 * TILE_FEET)
+            if speed[i] > limit + 0.01:
+                speed[i] = limit
+                changed = True
+        for i in range(n):
+            limit = math.sqrt(speed[(i - 1) % n] ** 2 + 2.0 * ACCEL_FPS2 * TILE_FEET)
+            if speed[i] > limit + 0.01:
+                speed[i] = limit
+                changed = True
+        if not changed:
+            break
+    return speed
+
+
+def _time_us(fn, inputs) -> float:
+    t0 = time.perf_counter()
+    for x in inputs:
+        fn(x)
+    return (time.perf_counter() - t0) / len(inputs) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=50, help="seeded tracks per grid size")
+    args = parser.parse_args()
+
+    _constrain_profile_numpy([TOP_SPEED_FPS])  # keep NumPy's import out of the first row
+    print(f"{'grid':>5} {'tiles':>6} {'iterative':>10} {'two-sweep':>10} {'numpy':>10} {'memoized':>10} {'max diff':>9}")
+    for n in GRID_SIZES:
+        tracks = [generate_track(n=n, seed=seed) for seed in range(args.tracks)]
+        raws = [[_RAW_SPEED_FPS.get(t, TOP_SPEED_FPS) for t in track.tile_types] for track in tracks]
+        for track in tracks:
+            build_speed_profile(track)  # warm the cache
+        diff = max(
+            max(abs(a - b) for a, b in zip(_iterative(raw), _constrain_profile(raw))) for raw in raws
+        )
+        tiles = sum(len(raw) for raw in raws) / len(raws)
+        print(f"{n:>5} {tiles:>6.0f} {_time_us(_iterative, raws):>8.0f}us {_time_us(_constrain_profile, raws):>8.0f}us"
+              f" {_time_us(_constrain_profile_numpy, raws):>8.0f}us {_time_us(build_speed_profile, tracks):>8.1f}us"
+              f" {diff:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
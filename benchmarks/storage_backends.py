@@ -0,0 +1,105 @@
+"""
+Compare the JSON-file and SQLite storage backends.
+
+Runs against a throwaway data directory with the entity cache disabled, so
+every load hits the backend.
+
+Usage:
+  python -m benchmarks.storage_backends [--players 2000] [--races 300] [--grid 40]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="carracingsim-bench-")
+os.environ["STORAGE_CACHE_MAX_ENTRIES"] = "0"
+
+from backend import storage  # noqa: E402  (env must be set first)
+from backend.models import Player, Race, RaceEntry  # noqa: E402
+from backend.storage_sqlite import SQLiteBackend  # noqa: E402
+from backend.track_gen import generate_track  # noqa: E402
+
+
+def _fixtures(n_players: int, n_races: int, grid: int) -> tuple[list[Player], list[Race]]:
+    players = [Player(username=f"player{i}", hashed_password="x" * 60) for i in range(n_players)]
+    track = generate_track(n=grid, seed=1)
+    races = []
+    for i in range(n_races):
+        entries = [
+            RaceEntry(player_id=p.id, username=p.username, entered_at="2026-01-01T00:00:00Z")
+            for p in players[i % 50:i % 50 + 6]
+        ]
+        races.append(Race(
+            id=f"2026-01-{1 + i // 144:02d}_{i % 144:03d}",
+            scheduled_time=f"2026-01-{1 + i // 144:02d}T{i % 144:03d}",
+            event_type="sprint",
+            status="open",
+            track=track,
+            entries=entries,
+        ))
+    return players, races
+
+
+async def _timed(label: str, coro, results: dict) -> None:
+    t0 = time.perf_counter()
+    await coro
+    results[label] = time.perf_counter() - t0
+
+
+async def _run(backend, players: list[Player], races: list[Race]) -> dict:
+    storage.use_backend(backend)
+    storage.ensure_dirs()
+    results: dict[str, float] = {}
+
+    async def save_all():
+        for p in players:
+            await storage.save_player(p)
+        for r in races:
+            await storage.save_race(r)
+        await storage.flush_pending()
+
+    async def load_races():
+        for r in races:
+            await storage.load_race(r.id)
+
+    async def find_players():
+        for p in players[:500]:
+            await storage.find_player_by_username(p.username)
+
+    await _timed("save all (batched)", save_all(), results)
+    await _timed("load_race x all", load_races(), results)
+    await _timed("list_races", storage.list_races(), results)
+    await _timed("find_player_by_username x500", find_players(), results)
+    await _timed("rebuild_username_index", storage.rebuild_username_index(), results)
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--races", type=int, default=300)
+    parser.add_argument("--grid", type=int, default=40)
+    args = parser.parse_args()
+
+    players, races = _fixtures(args.players, args.races, args.grid)
+    root = Path(os.environ["DATA_DIR"])
+    backends = {
+        "json": storage.JsonFileBackend({"players": root / "json" / "players", "races": root / "json" / "races"}),
+        "sqlite": SQLiteBackend(root / "bench.db"),
+    }
+    timings = {name: await _run(b, players, races) for name, b in backends.items()}
+
+    print(f"{args.players} players, {args.races} races, {args.grid}x{args.grid} tracks, cache off")
+    print(f"{'operation':34} {'json':>10} {'sqlite':>10}")
+    for label in timings["json"]:
+        print(f"{label:34} {timings['json'][label] * 1000:>8.1f}ms {timings['sqlite'][label] * 1000:>8.1f}ms")
+    storage.shutdown_storage()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
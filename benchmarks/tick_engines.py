@@ -0,0 +1,58 @@
+"""
+Compare tick-stream engines: time to generate a whole race, per field size.
+
+Also checks that the NumPy engine's ticks equal the reference engine's.
+
+Usage:
+  python -m benchmarks.tick_engines [--laps 10] [--grid 40] [--fields 6,20,60,120]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from backend.models import EntryResult
+from backend.simulation.engine import generate_tick_stream
+from backend.track_gen import generate_track
+
+
+def _results(n_cars: int, seed: int = 1) -> list[EntryResult]:
+    rng = random.Random(seed)
+    return [
+        EntryResult(
+            player_id=f"car{i}", username=f"Car {i}", position=i + 1,
+            result_score=rng.uniform(40.0, 100.0), build_quality=70.0, event_fit=1.0,
+            readiness_score=1.0, luck_delta=0.0, counterfactual_position=i + 1,
+            per_slot={}, luck_tag="", dnf=rng.random() < 0.1,
+        )
+        for i in range(n_cars)
+    ]
+
+
+def _run(engine: str, results: list[EntryResult], laps: int, track) -> tuple[float, list[dict]]:
+    t0 = time.perf_counter()
+    ticks = list(generate_tick_stream(results, lap_count=laps, track=track, engine=engine))
+    return time.perf_counter() - t0, ticks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--laps", type=int, default=10)
+    parser.add_argument("--grid", type=int, default=40)
+    parser.add_argument("--fields", default="6,20,60,120", help="comma-separated car counts")
+    args = parser.parse_args()
+
+    track = generate_track(n=args.grid, seed=1)
+    print(f"{args.laps} laps on a {args.grid}x{args.grid} track ({len(track.directions)} tiles)")
+    print(f"{'cars':>5} {'ticks':>6} {'python':>9} {'numpy':>9} {'speedup':>8} {'car-ticks/s (numpy)':>20}  match")
+    for n_cars in (int(f) for f in args.fields.split(",")):
+        results = _results(n_cars)
+        py_time, py_ticks = _run("python", results, args.laps, track)
+        np_time, np_ticks = _run("numpy", results, args.laps, track)
+        print(f"{n_cars:>5} {len(py_ticks):>6} {py_time * 1000:>7.0f}ms {np_time * 1000:>7.0f}ms"
+              f" {py_time / np_time:>7.1f}x {n_cars * len(np_ticks) / np_time:>20,.0f}  {py_ticks == np_ticks}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Tick wire protocols: bytes per tick, server encode time and decode time.
+
+Encode is what one WebSocket connection costs the server per tick (the
+protocol's encoder plus the JSON text Starlette's send_json would build).
+Decode is parsing those frames back into per-car values in Python — a
+stand-in for the browser, whose real figure the viewer logs after each race.
+
+Usage:
+  python -m benchmarks.tick_protocols [--laps 5] [--fields 6,40,120]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import time
+from array import array
+
+from backend.broadcast.tick_codec import BinaryTickEncoder, DeltaTickEncoder
+from backend.simulation.engine import generate_tick_stream
+from backend.track_gen import generate_track
+from benchmarks.tick_engines import _results
+
+
+def _dumps(frame: dict) -> str:
+    return json.dumps(frame, separators=(",", ":"), ensure_ascii=False)  # as send_json does
+
+
+def _encode(protocol: int, ticks: list[dict], car_ids: list[str]) -> tuple[float, list]:
+    t0 = time.perf_counter()
+    if protocol == 1:
+        wire = [_dumps(t) for t in ticks]
+    else:
+        encoder = DeltaTickEncoder(car_ids) if protocol == 2 else BinaryTickEncoder(car_ids)
+        wire = [
+            f if isinstance(f, bytes) else _dumps(f)
+            for t in ticks for f in encoder.encode(t)
+        ]
+    return time.perf_counter() - t0, wire
+
+
+def _decode(wire: list) -> float:
+    t0 = time.perf_counter()
+    for frame in wire:
+        if isinstance(frame, bytes):
+            _, _, n, _ = struct.unpack_from("<BBHI", frame)
+            array("H", frame[8:8 + 2 * n])
+            array("H", frame[8 + 2 * n:8 + 4 * n])
+        else:
+            json.loads(frame)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--laps", type=int, default=5)
+    parser.add_argument("--fields", default="6,40,120", help="comma-separated car counts")
+    args = parser.parse_args()
+
+    track = generate_track(n=36, seed=1)
+    print(f"{'cars':>5} {'protocol':>9} {'bytes/tick':>11} {'encode/tick':>12} {'decode/tick':>12}")
+    for n_cars in (int(f) for f in args.fields.split(",")):
+        results = _results(n_cars)
+        ticks = [{"type": "tick", **t} for t in generate_tick_stream(results, lap_count=args.laps, track=track)]
+        car_ids = [r.player_id for r in results]
+        for protocol in (1, 2, 3):
+            encode_time, wire = _encode(protocol, ticks, car_ids)
+            decode_time = _decode(wire)
+            size = sum(len(f) if isinstance(f, bytes) else len(f.encode()) for f in wire)
+            print(f"{n_cars:>5} {protocol:>9} {size / len(ticks):>11.0f} {encode_time / len(ticks) * 1e6:>10.1f}us"
+                  f" {decode_time / len(ticks) * 1e6:>10.1f}us")
+
+
+if __name__ == "__main__":
+    main()
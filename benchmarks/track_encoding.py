@@ -0,0 +1,76 @@
+"""
+Compare the expanded track format ({tiles, path_order}) with the compact
+start + directions encoding: JSON size, parse time, and the one-off cost of
+deriving tile types (what the simulation reads) on first use.
+
+Usage:
+  python -m benchmarks.track_encoding [--tracks 20] [--repeat 50]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from pydantic import BaseModel
+
+from backend.models import TileData, TrackData
+from backend.track_gen import generate_track
+
+
+class _ExpandedTrack(BaseModel):
+    """The pre-compact TrackData schema, for comparison."""
+    grid_width: int
+    grid_height: int
+    tiles: list[TileData]
+    path_order: list[list[int]]
+
+
+def _expanded_json(track: TrackData) -> str:
+    return _ExpandedTrack(
+        grid_width=track.grid_width,
+        grid_height=track.grid_height,
+        tiles=track.tiles,
+        path_order=track.path_order,
+    ).model_dump_json()
+
+
+def _per_call(fn, docs: list[str], repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for doc in docs:
+            fn(doc)
+    return (time.perf_counter() - t0) / (repeat * len(docs))
+
+
+def _parse_and_expand(doc: str) -> None:
+    TrackData.model_validate_json(doc).tile_types
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=20, help="tracks per grid size")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'grid':>5} {'tiles':>6} {'expanded':>10} {'compact':>9} {'size':>6}"
+          f" {'parse old':>10} {'parse new':>10} {'+types':>9} {'legacy→new':>11}")
+    for n in (12, 20, 40, 60):
+        tracks = [generate_track(n=n, seed=seed) for seed in range(args.tracks)]
+        expanded = [_expanded_json(t) for t in tracks]
+        compact = [t.model_dump_json() for t in tracks]
+        tiles = sum(len(t.directions) for t in tracks) / len(tracks)
+        old_bytes = sum(map(len, expanded)) / len(tracks)
+        new_bytes = sum(map(len, compact)) / len(tracks)
+
+        parse_old = _per_call(_ExpandedTrack.model_validate_json, expanded, args.repeat)
+        parse_new = _per_call(TrackData.model_validate_json, compact, args.repeat)
+        parse_expand = _per_call(_parse_and_expand, compact, args.repeat)
+        legacy = _per_call(TrackData.model_validate_json, expanded, args.repeat)
+
+        print(f"{n:>5} {tiles:>6.0f} {old_bytes:>9.0f}B {new_bytes:>8.0f}B {new_bytes / old_bytes:>6.1%}"
+              f" {parse_old * 1e6:>8.1f}us {parse_new * 1e6:>8.1f}us {parse_expand * 1e6:>7.1f}us"
+              f" {legacy * 1e6:>9.1f}us")
+
+
+if __name__ == "__main__":
+    main()
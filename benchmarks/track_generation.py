@@ -0,0 +1,38 @@
+"""
+Compare the track generators: time per track, loop length, share of straight
+tiles, and how often the random walk gives up and returns the oval.
+
+Usage:
+  python -m benchmarks.track_generation [--tracks 200]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from backend.track_gen import _oval_fallback, generate_track
+
+GRID_SIZES = (12, 18, 24, 36, 48, 60)  # the range schedule.json uses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=200, help="seeded tracks per grid size")
+    args = parser.parse_args()
+
+    print(f"{'grid':>5} {'generator':>9} {'ms/track':>9} {'tiles':>6} {'straight':>9} {'fallback':>9}")
+    for n in GRID_SIZES:
+        oval = _oval_fallback(n).directions
+        for generator in ("walk", "grow"):
+            t0 = time.perf_counter()
+            tracks = [generate_track(n=n, seed=seed, generator=generator) for seed in range(args.tracks)]
+            elapsed = time.perf_counter() - t0
+            tiles = sum(len(t.directions) for t in tracks)
+            straight = sum(t.tile_types.count("straight") for t in tracks)
+            fallbacks = sum(t.directions == oval for t in tracks)
+            print(f"{n:>5} {generator:>9} {elapsed / len(tracks) * 1000:>9.2f} {tiles / len(tracks):>6.0f}"
+                  f" {straight / tiles:>9.0%} {fallbacks / len(tracks):>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -34,6 +34,7 @@ export const api = {
 
   // Races
   race:     (id) => request('GET', `/races/${id}`),
+  track:    (id) => request('GET', `/tracks/${id}`),  // immutable — served from the HTTP cache after the first fetch
 
   // Car
   car:           ()            => request('GET',  '/car'),
@@ -49,7 +50,8 @@ export const api = {
   adminResetSchedule: () => request('POST', '/admin/reset-schedule'),
 }
 
-export function wsUrl(raceId) {
+export function wsUrl(raceId, protocol = 1) {
   const proto = location.protocol === 'https:' ? 'wss' : 'ws'
-  return `${proto}://${location.host}/ws/races/${raceId}`
+  const query = protocol === 1 ? '' : `?protocol=${protocol}`
+  return `${proto}://${location.host}/ws/races/${raceId}${query}`
 }
@@ -0,0 +1,38 @@
+/**
+ * Compact track decoding — mirrors backend/track_codec.py.
+ *
+ * The server sends a track as { grid_width, grid_height, start: [x, y],
+ * directions: "EESS…" }: one compass letter per step around the loop, the
+ * last one leading back to start. expandTrack() rebuilds the path_order and
+ * per-tile type/orientation the viewer draws from.
+ */
+
+const STEPS = { E: [1, 0], W: [-1, 0], S: [0, 1], N: [0, -1] }
+
+const CURVES = { EN: 'NE', NE: 'NE', NW: 'NW', WN: 'NW', ES: 'SE', SE: 'SE', SW: 'SW', WS: 'SW' }
+
+function tileShape(cameFrom, goingTo) {
+  if (cameFrom === goingTo) {
+    return ['straight', cameFrom === 'E' || cameFrom === 'W' ? 'horizontal' : 'vertical']
+  }
+  const orientation = CURVES[cameFrom + goingTo]
+  return orientation ? ['curve', orientation] : ['straight', 'horizontal']
+}
+
+/** Return { grid_width, grid_height, path_order, tiles } for a compact or expanded track. */
+export function expandTrack(track) {
+  if (!track.directions) return track  // already expanded (old format)
+  const { directions } = track
+  let [x, y] = track.start
+  const path_order = new Array(directions.length)
+  const tiles = new Array(directions.length)
+  for (let i = 0; i < directions.length; i++) {
+    const [type, orientation] = tileShape(directions[(i || directions.length) - 1], directions[i])
+    path_order[i] = [x, y]
+    tiles[i] = { x, y, type, orientation }
+    const [dx, dy] = STEPS[directions[i]]
+    x += dx
+    y += dy
+  }
+  return { grid_width: track.grid_width, grid_height: track.grid_height, path_order, tiles }
+}
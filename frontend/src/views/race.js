@@ -14,6 +14,7 @@ import * as THREE from 'three'
 import { GLTFLoader } from 'three/examples/jsm/loaders/GLTFLoader.js'
 import { mergeGeometries } from 'three/examples/jsm/utils/BufferGeometryUtils.js'
 import { api, wsUrl } from '../api.js'
+import { expandTrack } from '../track.js'
 import { navigate } from '../router.js'
 
 // ── Central config ──────────────────────────────────────────────────────────────
@@ -675,32 +676,215 @@ function initScene(container, raceId, canvas, overlay, log, lapCounter, speedEl)
     }
   }
 
+  // ── Entrants ─────────────────────────────────────────────────────────────────
+
+  function setEntrants(list) {
+    entrants = list
+    entrantIndexByCarId.clear()
+    carIds.length = 0
+    carIdToIndex.clear()
+    entrants.forEach((e, i) => {
+      entrantIndexByCarId.set(e.car_id, i)
+      carIds.push(e.car_id)
+      carIdToIndex.set(e.car_id, i)
+    })
+    resetWireState()
+  }
+
+  // The grid changed after race_init (bots fill it at lock time): re-spawn the cars
+  function applyRoster(list) {
+    setEntrants(list)
+    if (carMesh) {
+      scene.remove(carMesh)
+      carMesh.material.dispose()
+      carMesh.dispose()
+      carMesh = null
+      carsSpawned = false
+    }
+    spawnCars()
+    buildLeaderboardRows(entrants.length)
+    renderEntrants(null)
+  }
+
+  // ── Tick protocol 2/3 decoding ───────────────────────────────────────────────
+  //
+  // Cars arrive by index into `entrants`. Protocol 2: a "key" frame carries
+  // every car, a "delta" frame only the cars that changed, as
+  // [index, progress × 10⁴, mph]. Protocol 3: each tick is one binary frame of
+  // packed arrays. Decoded ticks have the same shape as protocol 1 ticks — see
+  // backend/broadcast/tick_codec.py.
+
+  // 1 = JSON (default), 2 = JSON keyframes + deltas, 3 = binary ticks. Opt in
+  // per page load with ?protocol=N, or per build with VITE_WIRE_PROTOCOL.
+  const WIRE_PROTOCOL = (() => {
+    const requested = new URLSearchParams(location.search).get('protocol') ?? import.meta.env.VITE_WIRE_PROTOCOL
+    return [1, 2, 3].includes(Number(requested)) ? Number(requested) : 1
+  })()
+  const PROGRESS_SCALE = 10000
+  const INCIDENT_CODES = [null, 'dnf_start', 'dnf']
+  const BINARY_TICK = 1
+
+  let wireCars = []       // reused protocol-1-shaped car objects, one per entrant
+  let wireKeyed = false   // deltas only apply on top of a keyframe
+
+  // Bytes received for ticks vs what the same ticks cost as protocol 1 JSON,
+  // and time spent parsing + decoding them. The protocol 1 size is sampled:
+  // re-serializing every tick would cost what protocols 2 and 3 save.
+  const V1_SAMPLE_EVERY = 64
+  const wireStats = { ticks: 0, bytes: 0, v1Bytes: 0, v1Samples: 0, parseMs: 0 }
+
+  function resetWireState() {
+    wireCars = entrants.map(e => ({
+      car_id: e.car_id, username: e.username, progress: 0, speed: 0, incident: null,
+    }))
+    wireKeyed = false
+  }
+
+  function decodeTickFrame(msg) {
+    if (msg.type === 'key') {
+      for (let i = 0; i < wireCars.length; i++) {
+        wireCars[i].progress = msg.p[i] / PROGRESS_SCALE
+        wireCars[i].speed = msg.s[i]
+        wireCars[i].incident = null
+      }
+      wireKeyed = true
+    } else {
+      if (!wireKeyed) return null  // joined mid-stream: wait for the next keyframe
+      for (const [i, p, s] of msg.cars) {
+        wireCars[i].progress = p / PROGRESS_SCALE
+        wireCars[i].speed = s
+      }
+    }
+    if (msg.inc) for (const [i, incident] of msg.inc) wireCars[i].incident = incident
+    return { type: 'tick', tick: msg.tick, lap_count: lapCount, cars: wireCars }
+  }
+
+  function decodeBinaryTick(buf) {
+    const view = new DataView(buf)
+    if (view.getUint8(0) !== BINARY_TICK) return null
+    const n = view.getUint16(2, true)
+    const tick = view.getUint32(4, true)
+    if (n !== wireCars.length) return null  // roster out of step; a roster frame fixes it
+    const sOffset = 8 + 2 * n
+    const incOffset = 8 + 4 * n
+    for (let i = 0; i < n; i++) {
+      const car = wireCars[i]
+      car.progress = view.getUint16(8 + 2 * i, true) / PROGRESS_SCALE
+      car.speed = view.getUint16(sOffset + 2 * i, true)
+      car.incident = INCIDENT_CODES[view.getUint8(incOffset + i)] ?? null
+    }
+    return { type: 'tick', tick, lap_count: lapCount, cars: wireCars }
+  }
+
+  function countTickBytes(frameBytes, tick, parseMs) {
+    if (wireStats.ticks % V1_SAMPLE_EVERY === 0) {
+      wireStats.v1Bytes += JSON.stringify(tick).length
+      wireStats.v1Samples++
+    }
+    wireStats.ticks++
+    wireStats.bytes += frameBytes
+    wireStats.parseMs += parseMs
+  }
+
+  function reportWireStats() {
+    if (wireStats.ticks === 0) return
+    const perTick = wireStats.bytes / wireStats.ticks
+    const v1PerTick = wireStats.v1Bytes / wireStats.v1Samples
+    const parseUs = 1000 * wireStats.parseMs / wireStats.ticks
+    addLog(`Tick data (protocol ${WIRE_PROTOCOL}): ${perTick.toFixed(0)} B/tick vs ${v1PerTick.toFixed(0)} B `
+      + `as protocol 1 (\u2212${(100 * (1 - perTick / v1PerTick)).toFixed(0)}%), ${parseUs.toFixed(1)} \u00b5s/tick to parse`)
+  }
+
+  // ── Ticks ────────────────────────────────────────────────────────────────────
+
+  function handleTick(msg) {
+    if (msg.lap_count) {
+      lapCount = msg.lap_count
+      visualLapCount = lapCount
+    }
+    if (msg.tick === 1) {
+      overlay.style.display = 'none'
+      lapCounter.style.display = 'block'
+      addLog(`Race started \u2014 ${msg.cars.length} cars on track`)
+    }
+
+    let leaderProgress = -1
+    for (const car of msg.cars) {
+      const totalT = car.progress * visualLapCount
+      if (carTargetT[car.car_id] === undefined) {
+        carRenderT[car.car_id] = totalT
+      }
+      carTargetT[car.car_id] = totalT
+      if (car.progress > leaderProgress) leaderProgress = car.progress
+      if (car.incident === 'dnf_start') {
+        carIncident[car.car_id] = 20
+        addLog(`\u26a0 ${car.username} \u2014 DNF incident`)
+      }
+    }
+
+    if (leaderProgress >= 0) {
+      const visualT = leaderProgress * visualLapCount
+      const visualLap = Math.min(visualLapCount, Math.floor(visualT) + 1)
+      lapCounter.textContent = `Lap ${visualLap} / ${visualLapCount}`
+    }
+
+    if (msg.tick & 1) updateLeaderboard(msg.cars)
+    updateMySpeed(msg.cars)
+  }
+
   // ── WebSocket ─────────────────────────────────────────────────────────────────
 
   function connectWs() {
-    ws = new WebSocket(wsUrl(raceId))
+    ws = new WebSocket(wsUrl(raceId, WIRE_PROTOCOL))
+    ws.binaryType = 'arraybuffer'
 
     ws.onmessage = (evt) => {
+      const t0 = performance.now()
+
+      if (evt.data instanceof ArrayBuffer) {
+        const tick = decodeBinaryTick(evt.data)
+        if (tick) {
+          const parseMs = performance.now() - t0
+          countTickBytes(evt.data.byteLength, tick, parseMs)
+          handleTick(tick)
+        }
+        return
+      }
+
       const msg = JSON.parse(evt.data)
 
-      if (msg.type === 'race_init') {
-        entrants       = msg.entrants || []
+      if (msg.type === 'key' || msg.type === 'delta') {
+        const tick = decodeTickFrame(msg)
+        if (tick) {
+          const parseMs = performance.now() - t0
+          countTickBytes(evt.data.length, tick, parseMs)
+          handleTick(tick)
+        }
+      }
+
+      else if (msg.type === 'roster') {
+        applyRoster(msg.entrants)
+      }
+
+      else if (msg.type === 'race_init') {
         lapCount       = msg.lap_count ?? 1
         visualLapCount = lapCount
         myPlayerId     = msg.your_id ?? null
-
-        entrantIndexByCarId.clear()
-        carIds.length = 0
-        carIdToIndex.clear()
-        entrants.forEach((e, i) => {
-          entrantIndexByCarId.set(e.car_id, i)
-          carIds.push(e.car_id)
-          carIdToIndex.set(e.car_id, i)
-        })
+        setEntrants(msg.entrants || [])
 
         overlay.textContent = `${msg.event_type.replace('_', ' ')} \u2014 ${msg.status}`
         if (msg.status === 'running') overlay.style.display = 'none'
-        if (msg.track) buildTrack(msg.track)
+        if (msg.track) {
+          buildTrack(expandTrack(msg.track))
+        } else if (msg.track_id) {
+          api.track(msg.track_id)
+            .then(track => {
+              if (destroyed) return
+              buildTrack(expandTrack(track))
+              if (gltfReady && entrants.length > 0) spawnCars()
+            })
+            .catch(err => addLog(`Track failed to load: ${err.message}`))
+        }
         if (gltfReady && entrants.length > 0 && curveLUT) spawnCars()
         buildLeaderboardRows(entrants.length)
         renderEntrants(null)
@@ -714,43 +898,14 @@ function initScene(container, raceId, canvas, overlay, log, lapCounter, speedEl)
       }
 
       else if (msg.type === 'tick') {
-        if (msg.lap_count) {
-          lapCount = msg.lap_count
-          visualLapCount = lapCount
-        }
-        if (msg.tick === 1) {
-          overlay.style.display = 'none'
-          lapCounter.style.display = 'block'
-          addLog(`Race started \u2014 ${msg.cars.length} cars on track`)
-        }
-
-        let leaderProgress = -1
-        for (const car of msg.cars) {
-          const totalT = car.progress * visualLapCount
-          if (carTargetT[car.car_id] === undefined) {
-            carRenderT[car.car_id] = totalT
-          }
-          carTargetT[car.car_id] = totalT
-          if (car.progress > leaderProgress) leaderProgress = car.progress
-          if (car.incident === 'dnf_start') {
-            carIncident[car.car_id] = 20
-            addLog(`\u26a0 ${car.username} \u2014 DNF incident`)
-          }
-        }
-
-        if (leaderProgress >= 0) {
-          const visualT = leaderProgress * visualLapCount
-          const visualLap = Math.min(visualLapCount, Math.floor(visualT) + 1)
-          lapCounter.textContent = `Lap ${visualLap} / ${visualLapCount}`
-        }
-
-        if (msg.tick & 1) updateLeaderboard(msg.cars)
-        updateMySpeed(msg.cars)
+        countTickBytes(evt.data.length, msg, performance.now() - t0)
+        handleTick(msg)
       }
 
       else if (msg.type === 'finished') {
         finished = true
         addLog('Race finished!')
+        reportWireStats()
         lapCounter.textContent = `Lap ${visualLapCount} / ${visualLapCount}`
         renderEntrants(msg.results)
         overlay.style.display = 'none'
@@ -0,0 +1,5 @@
+"""Shared test setup. Backend modules read DATA_DIR at import, so it is set here first."""
+import os
+import tempfile
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="carracingsim-test-")
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend import auth
+
+
+@pytest.fixture
+def one_hash_thread(monkeypatch):
+    auth.shutdown_hash_workers()
+    monkeypatch.setattr(auth, "AUTH_HASH_WORKERS", 1)
+    monkeypatch.setattr(auth, "AUTH_HASH_QUEUE_TIMEOUT_MS", 50)
+    yield
+    auth.shutdown_hash_workers()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_its_slot_until_the_hash_finishes(one_hash_thread):
+    release = threading.Event()
+    try:
+        call = asyncio.create_task(auth._run_hash(release.wait))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+        # The thread is still busy, so the next caller is turned away
+        assert auth.hash_stats()["in_flight"] == 1
+        with pytest.raises(HTTPException) as exc:
+            await auth._run_hash(lambda: None)
+        assert exc.value.status_code == 503
+    finally:
+        release.set()
+
+    await asyncio.sleep(0.05)
+    assert auth.hash_stats()["in_flight"] == 0
+    assert await auth._run_hash(lambda: "ok") == "ok"
+
+
+@pytest.mark.asyncio
+async def test_timeouts_never_leak_slots(one_hash_thread):
+    release = threading.Event()
+    try:
+        busy = asyncio.create_task(auth._run_hash(release.wait))
+        await asyncio.sleep(0.01)
+        # Release the thread at about the moment the waiters time out
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        results = await asyncio.gather(*(auth._run_hash(lambda: 1) for _ in range(20)), return_exceptions=True)
+        await busy
+    finally:
+        release.set()
+    await asyncio.sleep(0.05)
+
+    _, slots = auth._get_hash_executor()
+    assert slots._value == 1
+    assert all(r == 1 or isinstance(r, HTTPException) for r in results)
+    assert await auth._run_hash(lambda: 2) == 2
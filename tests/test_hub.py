@@ -0,0 +1,44 @@
+import asyncio
+import fcntl
+import os
+
+import pytest
+
+from backend.broadcast.hub import HubBroadcaster, encode_frame
+from backend.broadcast.race_broadcaster import RaceBroadcaster
+
+
+@pytest.mark.asyncio
+async def test_peer_reconnects_after_a_corrupt_frame(tmp_path):
+    path = tmp_path / "broadcast.sock"
+    # Someone else is the hub: hold its lock and play the hub's side of the socket
+    lock_fd = os.open(path.with_name(path.name + ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    fcntl.flock(lock_fd, fcntl.LOCK_EX)
+    connections = 0
+
+    async def garbage_hub(reader, writer):
+        nonlocal connections
+        connections += 1
+        if connections == 1:
+            writer.write(b"\xff\xff\xff\xff")  # a length far past the frame limit
+        else:
+            writer.write(encode_frame("r1", {"type": "status", "status": "running"}))
+        await writer.drain()
+        await reader.read()  # until the peer hangs up
+        writer.close()
+
+    server = await asyncio.start_unix_server(garbage_hub, path=str(path))
+    peer = HubBroadcaster(RaceBroadcaster(), path)
+    await peer.start()
+    try:
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if peer.stats()["hub"]["received"]:
+                break
+        assert connections == 2
+        assert peer.stats()["hub"]["role"] == "peer"
+        assert peer.stats()["hub"]["received"] == 1
+    finally:
+        await peer.stop()
+        server.close()
+        os.close(lock_fd)
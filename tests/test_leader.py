@@ -0,0 +1,75 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from backend.scheduler.leader import LeaderElection
+
+# Takes the leader lock, writes one heartbeat, then hangs without refreshing it
+_HUNG_LEADER = """
+import fcntl, json, os, sys, time
+fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT, 0o644)
+fcntl.flock(fd, fcntl.LOCK_EX)
+os.pwrite(fd, json.dumps({"pid": os.getpid(), "heartbeat": time.time()}).encode(), 0)
+print("locked", flush=True)
+time.sleep(60)
+"""
+
+# Same, but keeps its heartbeat fresh
+_LIVE_LEADER = _HUNG_LEADER.replace(
+    "time.sleep(60)",
+    "for _ in range(1200):\n"
+    "    time.sleep(0.05)\n"
+    "    os.pwrite(fd, json.dumps({'pid': os.getpid(), 'heartbeat': time.time()}).encode(), 0)",
+)
+
+
+@pytest.mark.asyncio
+async def test_standby_kills_a_hung_leader_and_takes_over(tmp_path):
+    lock = tmp_path / "scheduler.lock"
+    hung = subprocess.Popen([sys.executable, "-c", _HUNG_LEADER, str(lock)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert hung.stdout.readline().strip() == "locked"
+        elected = asyncio.Event()
+
+        async def on_elected():
+            elected.set()
+
+        standby = LeaderElection(on_elected, path=lock, poll_seconds=0.05, stale_seconds=0.3)
+        await standby.start()
+        try:
+            assert not standby.is_leader
+            await asyncio.wait_for(elected.wait(), 5)
+            assert standby.is_leader
+            assert standby.stats()["takeovers"] == 1
+            assert hung.wait(5) < 0  # killed by a signal
+        finally:
+            await standby.stop()
+    finally:
+        hung.kill()
+        hung.wait()
+
+
+@pytest.mark.asyncio
+async def test_standby_leaves_a_live_leader_alone(tmp_path):
+    lock = tmp_path / "scheduler.lock"
+    live = subprocess.Popen([sys.executable, "-c", _LIVE_LEADER, str(lock)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert live.stdout.readline().strip() == "locked"
+
+        async def nothing():
+            pass
+
+        standby = LeaderElection(nothing, path=lock, poll_seconds=0.05, stale_seconds=0.3)
+        await standby.start()
+        try:
+            await asyncio.sleep(1)
+            assert not standby.is_leader
+            assert standby.takeovers == 0
+            assert live.poll() is None
+        finally:
+            await standby.stop()
+    finally:
+        live.kill()
+        live.wait()
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from backend.broadcast import race_broadcaster
+from backend.broadcast.race_broadcaster import Frame, RaceBroadcaster, Subscription
+from backend.config import WS_BUFFER_FRAMES
+
+
+def _tick(n, cars=("a", "b")):
+    return {
+        "type": "tick", "tick": n, "lap_count": 3,
+        "cars": [
+            {"car_id": c, "username": c, "progress": round(n * 0.001 * (i + 1), 4), "speed": float(100 + i), "incident": None}
+            for i, c in enumerate(cars)
+        ],
+    }
+
+
+async def _drain_async(sub):
+    return [await sub.get() for _ in range(sub.depth)]
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_the_oldest_tick_and_keeps_control_frames():
+    sub = Subscription(protocol=1, roster=(), max_ticks=3)
+    sub.put(Frame("status", tick=False))
+    for n in range(1, 6):
+        sub.put(Frame(f"t{n}", tick=True))
+    frames = await _drain_async(sub)
+    assert [f.data for f in frames] == ["status", "t3", "t4", "t5"]
+    assert sub.dropped == 2
+    assert sub.behind == 0  # caught up once the buffer ran empty
+
+
+@pytest.mark.asyncio
+async def test_protocol_2_resyncs_from_a_key_frame_after_a_drop():
+    broadcaster = RaceBroadcaster()
+    sub = broadcaster.subscribe("r1", protocol=2, roster=["a", "b"])
+    for n in range(1, WS_BUFFER_FRAMES + 2):  # one more tick than the buffer holds
+        await broadcaster.broadcast("r1", _tick(n))
+    assert sub.needs_key and sub.depth == 0  # every buffered delta went
+    assert broadcaster.stats()["resyncs"] == 1
+
+    await broadcaster.broadcast("r1", _tick(WS_BUFFER_FRAMES + 2))
+    (frame,) = await _drain_async(sub)
+    key = json.loads(frame.data)
+    assert key["type"] == "key" and key["tick"] == WS_BUFFER_FRAMES + 2
+    assert key["p"] == [round(c["progress"] * 10_000) for c in _tick(WS_BUFFER_FRAMES + 2)["cars"]]
+
+    await broadcaster.broadcast("r1", _tick(WS_BUFFER_FRAMES + 3))
+    (frame,) = await _drain_async(sub)
+    assert json.loads(frame.data)["type"] == "delta"
+
+
+@pytest.mark.asyncio
+async def test_a_client_that_never_catches_up_is_disconnected(monkeypatch):
+    monkeypatch.setattr(race_broadcaster, "WS_LAG_LIMIT_FRAMES", 10)
+    broadcaster = RaceBroadcaster()
+    slow = broadcaster.subscribe("r1")
+    fast = broadcaster.subscribe("r1")
+    for n in range(1, WS_BUFFER_FRAMES + 11):
+        await broadcaster.broadcast("r1", _tick(n))
+        await _drain_async(fast)
+    assert broadcaster.subscriber_count("r1") == 1
+    assert broadcaster.stats()["lag_disconnects"] == 1
+    frame = await slow.get()
+    assert frame.final and json.loads(frame.data)["type"] == "error"
+    assert slow.depth == 0
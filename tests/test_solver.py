@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from backend.models import EntryResult
+from backend.simulation.engine import generate_tick_stream
+from backend.simulation.solver import RaceSolution
+from backend.track_gen import generate_track
+
+
+def _results(n_cars, seed):
+    rng = random.Random(seed)
+    return [
+        EntryResult(
+            player_id=f"car{i}", username=f"Car {i}", position=i + 1,
+            result_score=rng.uniform(40.0, 100.0), build_quality=70.0, event_fit=1.0,
+            readiness_score=1.0, luck_delta=0.0, counterfactual_position=i + 1,
+            per_slot={}, luck_tag="", dnf=i == 2,  # one DNF car in every field
+        )
+        for i in range(n_cars)
+    ]
+
+
+@pytest.mark.parametrize("grid,seed", [(12, 1), (24, 2), (36, 3)])
+def test_solver_matches_the_tick_stream(grid, seed):
+    track = generate_track(n=grid, seed=seed)
+    results = _results(6, seed)
+    ticks = list(generate_tick_stream(results, lap_count=3, track=track, engine="python"))
+    solution = RaceSolution(results, 3, track)
+
+    assert solution.n_ticks == len(ticks)
+    for tick in ticks:
+        assert solution.snapshot(tick["tick"]) == tick
+
+    for i, car in enumerate(solution.cars):
+        streamed = [t["tick"] for t in ticks if t["cars"][i]["progress"] >= 1.0]
+        # The stream ends TRAILING_GRACE_TICKS after the leader; the solver still
+        # knows when the cars cut off by that would have finished
+        if car.finish_tick is not None and car.finish_tick <= len(ticks):
+            # progress is rounded to 4 places, so it can read 1.0 a tick early
+            assert car.finish_tick - 1 <= streamed[0] <= car.finish_tick
+        else:
+            assert not streamed
+        if car.finish_tick is not None:
+            assert len(car.lap_ticks) == 3 and car.lap_ticks[-1] == car.finish_tick
+
+
+def test_solver_matches_without_a_track():
+    results = _results(4, 9)
+    ticks = list(generate_tick_stream(results, lap_count=2, track=None, engine="python"))
+    solution = RaceSolution(results, 2, None)
+    assert solution.n_ticks == len(ticks)
+    assert all(solution.snapshot(t["tick"]) == t for t in ticks)
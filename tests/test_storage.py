@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from backend.storage import _EntityLocks, _Journal
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# One server process: adds 1 credit to the player N times, each as a locked
+# load → change → save cycle
+_INCREMENTER = """
+import asyncio, sys
+from backend import storage
+from backend.models import Player
+
+async def main(n):
+    storage.ensure_dirs()
+    for _ in range(n):
+        async with storage.locked(("players", "p1")):
+            player = await storage.load_player("p1")
+            if player is None:
+                player = Player(id="p1", username="racer", hashed_password="x", credits=0)
+            await storage.save_player(player.model_copy(update={"credits": player.credits + 1}))
+    await storage.flush_pending()
+    storage.shutdown_storage()
+
+asyncio.run(main(int(sys.argv[1])))
+"""
+
+
+def test_locked_updates_from_several_processes_are_never_lost(tmp_path):
+    env = {**os.environ, "DATA_DIR": str(tmp_path), "STORAGE_MULTI_PROCESS": "1", "PYTHONPATH": str(ROOT)}
+    procs = [
+        subprocess.Popen([sys.executable, "-c", _INCREMENTER, "50"], env=env, cwd=ROOT, stderr=subprocess.PIPE)
+        for _ in range(4)
+    ]
+    for proc in procs:
+        _, err = proc.communicate(timeout=60)
+        assert proc.returncode == 0, err.decode()
+
+    player = json.loads((tmp_path / "players" / "p1.json").read_text(encoding="utf-8"))
+    assert player["credits"] == 200
+
+
+def _journals(tmp_path, max_bytes):
+    locks = _EntityLocks(tmp_path / "storage.lock")
+    locks.open()
+    path = tmp_path / "storage.journal"
+    writer, follower = _Journal(path, locks, max_bytes), _Journal(path, locks, max_bytes)
+    writer.open()
+    follower.open()
+    return writer, follower
+
+
+def _entries(first, count):
+    # Another process's writes (poll() skips this process's own pid)
+    return [{"pid": 1, "kind": "players", "id": f"p{i}"} for i in range(first, first + count)]
+
+
+def test_follower_reads_across_a_rotation(tmp_path):
+    writer, follower = _journals(tmp_path, max_bytes=400)
+    writer.append(_entries(0, 3))
+    assert [e["id"] for e in follower.poll()] == ["p0", "p1", "p2"]
+
+    writer.append(_entries(3, 10))  # past max_bytes: the writer starts generation 1
+    assert writer.rotations == 1
+    writer.append(_entries(13, 2))
+    assert [e["id"] for e in follower.poll()] == [f"p{i}" for i in range(3, 15)]
+    assert not follower.resync
+    assert follower.stats()["generation"] == 1
+
+
+def test_follower_that_missed_a_whole_file_resyncs(tmp_path):
+    writer, follower = _journals(tmp_path, max_bytes=400)
+    writer.append(_entries(0, 12))   # generation 0 → 1
+    writer.append(_entries(12, 12))  # generation 1 → 2, never seen by the follower
+    writer.append(_entries(24, 1))
+    assert writer.rotations == 2
+
+    ids = [e["id"] for e in follower.poll()]
+    assert follower.resync
+    assert follower.stats()["resyncs"] == 1
+    assert "p12" not in ids and ids[-1] == "p24"
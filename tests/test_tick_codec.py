@@ -0,0 +1,171 @@
+import json
+import random
+import struct
+from array import array
+
+from backend.broadcast.tick_codec import INCIDENT_CODES, PROGRESS_SCALE, BinaryTickEncoder, DeltaTickEncoder
+
+
+def _ticks(car_ids, n_ticks, seed=1, first_tick=1):
+    """Protocol 1 ticks: some cars stall (unchanged), one DNFs, at emitted precision."""
+    rng = random.Random(seed)
+    progress = {c: 0.0 for c in car_ids}
+    ticks = []
+    for tick in range(first_tick, first_tick + n_ticks):
+        cars = []
+        for i, car_id in enumerate(car_ids):
+            moving = rng.random() < 0.7
+            if moving:
+                progress[car_id] = min(1.0, progress[car_id] + rng.uniform(0, 0.002))
+            incident = None
+            if i == 1 and tick >= first_tick + n_ticks // 2:
+                incident = "dnf_start" if tick < first_tick + n_ticks // 2 + 3 else "dnf"
+            cars.append({
+                "car_id": car_id, "username": f"user_{car_id}", "progress": round(progress[car_id], 4),
+                "speed": float(rng.randint(0, 190)) if moving else 0.0, "incident": incident,
+            })
+        ticks.append({"tick": tick, "lap_count": 3, "cars": cars})
+    return ticks
+
+
+class _Decoder:
+    """What the viewer does with protocol 2/3 frames (race.js), rebuilding protocol 1 cars."""
+
+    def __init__(self, car_ids):
+        self.roster = [(c, f"user_{c}") for c in car_ids]
+        self.cars = None
+
+    def _blank(self):
+        return [{"car_id": c, "username": u, "progress": 0.0, "speed": 0.0, "incident": None} for c, u in self.roster]
+
+    def feed(self, frame):
+        if isinstance(frame, bytes):
+            return self._binary(frame)
+        frame = json.loads(json.dumps(frame))  # as it would cross the wire
+        if frame["type"] == "roster":
+            self.roster = [(e["car_id"], e["username"]) for e in frame["entrants"]]
+            self.cars = None
+            return None
+        if frame["type"] == "tick":
+            return {"tick": frame["tick"], "cars": frame["cars"]}
+        if frame["type"] == "key":
+            self.cars = self._blank()
+            for car, p, s in zip(self.cars, frame["p"], frame["s"]):
+                car["progress"], car["speed"] = p / PROGRESS_SCALE, float(s)
+        else:
+            assert self.cars is not None, "delta before any key frame"
+            for i, p, s in frame["cars"]:
+                self.cars[i]["progress"], self.cars[i]["speed"] = p / PROGRESS_SCALE, float(s)
+        for i, inc in frame.get("inc", []):
+            self.cars[i]["incident"] = inc
+        return {"tick": frame["tick"], "cars": [dict(c) for c in self.cars]}
+
+    def _binary(self, data):
+        kind, _, n, tick = struct.unpack_from("<BBHI", data)
+        assert kind == 1 and n == len(self.roster)
+        p = array("H", data[8:8 + 2 * n])
+        s = array("H", data[8 + 2 * n:8 + 4 * n])
+        cars = self._blank()
+        for i, car in enumerate(cars):
+            car["progress"], car["speed"], car["incident"] = p[i] / PROGRESS_SCALE, float(s[i]), INCIDENT_CODES[data[8 + 4 * n + i]]
+        return {"tick": tick, "cars": cars}
+
+
+def _decode_all(encoder, roster, ticks):
+    decoder = _Decoder(roster)
+    decoded = []
+    for msg in ticks:
+        out = [decoder.feed(f) for f in encoder.encode(msg)]
+        assert all(o is None for o in out[:-1])  # only a roster frame may precede the tick
+        decoded.append(out[-1])
+    return decoded
+
+
+def _by_car(tick):
+    return {c["car_id"]: (c["progress"], c["speed"], c["incident"]) for c in tick["cars"]}
+
+
+def test_delta_frames_rebuild_every_tick():
+    roster = ["a", "b", "c", "d"]
+    ticks = _ticks(roster, 100)
+    encoder = DeltaTickEncoder(roster, keyframe_interval=8)
+    decoded = _decode_all(encoder, roster, ticks)
+    for msg, got in zip(ticks, decoded):
+        assert got["tick"] == msg["tick"]
+        assert _by_car(got) == _by_car(msg)
+
+
+def test_key_frames_come_every_interval_and_deltas_skip_unchanged_cars():
+    roster = ["a", "b", "c"]
+    ticks = _ticks(roster, 20)
+    encoder = DeltaTickEncoder(roster, keyframe_interval=8)
+    frames = [encoder.encode(msg)[-1] for msg in ticks]
+    assert [f["tick"] for f in frames if f["type"] == "key"] == [1, 9, 17]
+    for prev, msg, frame in zip(ticks, ticks[1:], frames[1:]):
+        if frame["type"] == "delta":
+            changed = {i for i, (a, b) in enumerate(zip(prev["cars"], msg["cars"]))
+                       if (a["progress"], a["speed"]) != (b["progress"], b["speed"])}
+            assert {i for i, _, _ in frame["cars"]} == changed
+
+
+def test_keyframe_for_late_joiner_leaves_delta_state_alone():
+    roster = ["a", "b"]
+    ticks = _ticks(roster, 6)
+    encoder = DeltaTickEncoder(roster, keyframe_interval=100)
+    reference = DeltaTickEncoder(roster, keyframe_interval=100)
+    for msg in ticks[:3]:
+        encoder.encode(msg)
+        reference.encode(msg)
+    joiner = _Decoder(roster)
+    got = joiner.feed(encoder.keyframe(ticks[2]))
+    assert _by_car(got) == _by_car(ticks[2])
+    for msg in ticks[3:]:
+        assert encoder.encode(msg) == reference.encode(msg)
+
+
+def test_binary_frames_pack_every_field():
+    roster = ["a", "b", "c"]
+    ticks = _ticks(roster, 40)
+    encoder = BinaryTickEncoder(roster)
+    frames = [encoder.encode(msg) for msg in ticks]
+    assert all(len(f) == 1 and isinstance(f[0], bytes) and len(f[0]) == 8 + 5 * len(roster) for f in frames)
+    for msg, got in zip(ticks, _decode_all(BinaryTickEncoder(roster), roster, ticks)):
+        assert got["tick"] == msg["tick"]
+        assert _by_car(got) == _by_car(msg)
+
+
+def test_binary_falls_back_to_json_for_an_unknown_incident():
+    msg = _ticks(["a", "b"], 1)[0]
+    msg["cars"][0]["incident"] = "spun_out"
+    (frame,) = BinaryTickEncoder(["a", "b"]).encode(msg)
+    assert frame == {"type": "tick", **msg}
+
+
+def test_cars_are_indexed_by_roster_order_not_arrival_order():
+    roster = ["a", "b", "c"]
+    msg = _ticks(roster, 1)[0]
+    msg["cars"].reverse()
+    for encoder in (DeltaTickEncoder(roster), BinaryTickEncoder(roster)):
+        frames = encoder.encode(msg)
+        assert len(frames) == 1  # same cars: no roster frame
+        got = _Decoder(roster).feed(frames[0])
+        assert _by_car(got) == _by_car(msg)
+
+
+def test_roster_change_reindexes_and_is_announced():
+    roster = ["a", "b"]
+    before = _ticks(roster, 5)
+    after = _ticks(["c", "a", "b"], 10, seed=2, first_tick=6)  # a bot joined
+    for make in (lambda: DeltaTickEncoder(roster, keyframe_interval=4), lambda: BinaryTickEncoder(roster)):
+        encoder = make()
+        decoder = _Decoder(roster)
+        for msg in before + after:
+            frames = encoder.encode(msg)
+            if msg["tick"] == 6:
+                assert frames[0]["type"] == "roster"
+                assert [e["car_id"] for e in frames[0]["entrants"]] == ["c", "a", "b"]
+            else:
+                assert len(frames) == 1
+            for frame in frames:
+                got = decoder.feed(frame)
+            assert _by_car(got) == _by_car(msg)